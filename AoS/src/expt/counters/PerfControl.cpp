@@ -0,0 +1,39 @@
+#include <cstdlib>
+#include <cstring>
+#include <string>
+
+#include "PerfControl.h"
+
+#ifdef __linux__
+#include <unistd.h>
+#endif
+
+namespace {
+    /**
+     * Sends a command to the perf control descriptor and waits for its acknowledgement.
+     */
+    void sendCommand(const char* command) {
+#ifdef __linux__
+        static const char* envCtlFd = std::getenv("PERF_CTL_FD");
+        static const char* envAckFd = std::getenv("PERF_ACK_FD");
+        if (envCtlFd == nullptr)
+            return;
+
+        if (write(std::stoi(envCtlFd), command, std::strlen(command)) < 0)
+            return;
+        if (envAckFd != nullptr) {
+            char ack[5];
+            if (read(std::stoi(envAckFd), ack, sizeof(ack)) < 0)
+                return;
+        }
+#endif
+    }
+}
+
+void counters::resume() {
+    sendCommand("enable\n");
+}
+
+void counters::pause() {
+    sendCommand("disable\n");
+}
@@ -14,6 +14,7 @@
 #include "kernel/KernelFactory.h"
 #include "timer/SteadyTimer.h"
 #include "timer/Timer.h"
+#include "runtime/RuntimeConfig.h"
 
 namespace KernelInfos {
     enum KernelTypes {
@@ -46,6 +47,9 @@ int main() {
 #endif
         std::cout << "Using " << numThreads << " thread(s)." << std::endl << std::endl;
 
+        // setup OpenMP schedule of ImageProcessing::convolution
+        runtime::setDefaultSchedule();
+
         // setup timer
         std::unique_ptr<Timer> timer;
         if constexpr (std::chrono::high_resolution_clock::is_steady)
@@ -8,6 +8,7 @@
 #include "image/reader/STBImageReader.h"
 #include "processing/ImageProcessing.h"
 #include "kernel/KernelFactory.h"
+#include "runtime/RuntimeConfig.h"
 
 #ifdef _OPENMP
 #include <omp.h>
@@ -31,6 +32,9 @@ int main() {
 #endif
         std::cout << "Using " << numThreads << " thread(s)." << std::endl << std::endl;
 
+        // setup OpenMP schedule of ImageProcessing::convolution
+        runtime::setDefaultSchedule();
+
         // setup image reader
         STBImageReader imageReader{};
         std::stringstream fullPathStream;
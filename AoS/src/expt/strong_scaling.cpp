@@ -1,4 +1,5 @@
 #include <array>
+#include <cstdlib>
 #include <iostream>
 #include <sstream>
 #include <fstream>
@@ -12,32 +13,48 @@
 #include "kernel/KernelFactory.h"
 #include "timer/SteadyTimer.h"
 #include "timer/Timer.h"
+#include "runtime/RuntimeConfig.h"
+#include "counters/PerfControl.h"
 
 #ifdef _OPENMP
 #include <omp.h>
 #endif
 
 
-int main() {
+/**
+ * Optional arguments (useful to sweep the experiment without recompiling):
+ *   argv[1] image quality (default 4), argv[2] kernel order (default 7),
+ *   argv[3] number of repetitions (default 3), argv[4] number of physical cores (default 0, detected by Python),
+ *   argv[5] 0 to skip drawing the graphics with Python (default 1).
+ */
+int main(int argc, char* argv[]) {
 #ifdef _OPENMP
     const int maxNumThreads = omp_get_max_threads();
 #else
     const int maxNumThreads = 1;
 #endif
-    constexpr unsigned int imageQuality = 4; // 4, 5, 6, 7
+    unsigned int imageQuality = 4; // 4, 5, 6, 7
     constexpr unsigned int numImageQuality = 3;
-    constexpr unsigned int order = 7; // 7, 13, 19, 25
-    constexpr unsigned int numReps = 3;
+    unsigned int order = 7; // 7, 13, 19, 25
+    unsigned int numReps = 3;
     const std::string cvsNameRadix = "kip_openMP_strongScaling";
 
     const std::string python = PYTHON_EXE;
     const std::string script = PY_AMDHAL_SCRIPT;
-    constexpr unsigned int phys_cores = 10;
+    unsigned int phys_cores = 0; // 0: detected by Python
+    bool drawGraphics = true;
     constexpr float min_relative_time = 0.05;
     constexpr float min_marginal_speedup = 0.2;
     constexpr float min_efficiency = 0.7;
 
     try {
+        // setup parameters
+        if (argc > 1) imageQuality = std::stoul(argv[1]);
+        if (argc > 2) order = std::stoul(argv[2]);
+        if (argc > 3) numReps = std::stoul(argv[3]);
+        if (argc > 4) phys_cores = std::stoul(argv[4]);
+        if (argc > 5) drawGraphics = std::stoi(argv[5]) != 0;
+
         // setup timer
         std::unique_ptr<Timer> timer;
         if constexpr (std::chrono::high_resolution_clock::is_steady)
@@ -45,23 +62,40 @@ int main() {
         else
             timer = std::make_unique<SteadyTimer>();
 
+        // setup OpenMP schedule (recorded in every csv row)
+        runtime::setDefaultSchedule();
+        const std::string runtimeConfig = runtime::csvRecord();
+
         // setup csv
         std::string cvsName = cvsNameRadix + "_" + std::to_string(imageQuality) + "K_" + std::to_string(order) + ".csv";
         std::ofstream csvFile(cvsName);
-        csvFile << "ImageName,ImageDimension,KernelName,KernelDimension,TimePerRep_s,NumThreads,SpeedUp,Efficiency" << "\n";
+        csvFile << "ImageName,ImageDimension,KernelName,KernelDimension,TimePerRep_s,NumThreads,SpeedUp,Efficiency,"
+                << runtime::csvHeader << "\n";
 
         // setup image reader
         STBImageReader imageReader{};
         std::stringstream fullPathStream;
 
         std::array<double, numImageQuality> sequentialTimes = {};
-        for (int numThreads = 1; numThreads <= maxNumThreads; numThreads<<=1) {
+        for (const int numThreads : runtime::threadCounts(maxNumThreads)) {
+            if (runtime::stopRequested()) {
+                std::cerr << "Stop requested: skipping " << numThreads << " threads and more" << std::endl;
+                break;
+            }
 #ifdef _OPENMP
             omp_set_num_threads(numThreads);
 #endif
             std::cerr << "Using: " << numThreads << " threads" << std::endl;
 
+            // rows of the thread count, written only once all its images are processed
+            std::ostringstream rows;
+            bool completed = true;
             for (unsigned int imageNum = 1; imageNum <= numImageQuality; imageNum++) {
+                // a stop can arrive during a long thread count too: its rows are then dropped
+                if (numThreads > 1 && runtime::stopRequested()) {
+                    completed = false;
+                    break;
+                }
                 const std::string imageName = std::to_string(imageQuality) + "K-" + std::to_string(imageNum);
 
                 // load img
@@ -82,10 +116,12 @@ int main() {
                     " created." << std::endl;
 
                 // transform
+                counters::resume();
                 const std::chrono::duration<double> wall_clock_time_start = timer->now();
                 for (unsigned int rep = 0; rep < numReps; rep++)
                     ImageProcessing::convolution(*extendedImage, *kernel);
                 const std::chrono::duration<double> wall_clock_time_end = timer->now();
+                counters::pause();
                 const std::chrono::duration<double> wall_clock_time_duration = wall_clock_time_end - wall_clock_time_start;
                 const auto timePerRep = wall_clock_time_duration.count() / numReps;
                 std::cout << "Image processed " << numReps << " times in " << wall_clock_time_duration.count() <<
@@ -97,30 +133,40 @@ int main() {
                 const double speedUp = sequentialTimes[imageNum - 1] / timePerRep;
 
                 // csv record
-                csvFile << imageName << ","
-                        << img->getWidth() << "x" << img->getHeight() << ","
-                        << kernel->getName() << ","
-                        << order << ","
-                        << timePerRep << ","
-                        << numThreads << ","
-                        << speedUp << ","
-                        << speedUp / numThreads
-                        << "\n";
+                rows << imageName << ","
+                     << img->getWidth() << "x" << img->getHeight() << ","
+                     << kernel->getName() << ","
+                     << order << ","
+                     << timePerRep << ","
+                     << numThreads << ","
+                     << speedUp << ","
+                     << speedUp / numThreads << ","
+                     << runtimeConfig
+                     << "\n";
             }
+            if (!completed) {
+                std::cerr << "Stop requested: dropping the incomplete " << numThreads << " threads" << std::endl;
+                break;
+            }
+            // rows of every thread count are readable as soon as it ends (see py_script/live.py)
+            csvFile << rows.str();
+            csvFile.flush();
         }
         csvFile.close();
         std::cout << "Data saved at " << CMAKE_BINARY_DIR << "/" << cvsName << std::endl;
 
-        std::cout << "Drawing Amdhal's graphics (using Python)." << std::endl;
-        const std::string command = python + " " +
-                                        script + " " +
-                                            // args
-                                            cvsName + " " +
-                                            std::to_string(phys_cores) + " " +
-                                            std::to_string(min_relative_time) + " " +
-                                            std::to_string(min_marginal_speedup) + " " +
-                                            std::to_string(min_efficiency);
-        system(command.c_str());
+        if (drawGraphics) {
+            std::cout << "Drawing Amdhal's graphics (using Python)." << std::endl;
+            const std::string command = python + " " +
+                                            script + " " +
+                                                // args
+                                                cvsName + " " +
+                                                std::to_string(phys_cores) + " " +
+                                                std::to_string(min_relative_time) + " " +
+                                                std::to_string(min_marginal_speedup) + " " +
+                                                std::to_string(min_efficiency);
+            system(command.c_str());
+        }
 
     } catch (const std::exception& ex) {
         std::cerr << ex.what() << std::endl;
@@ -26,7 +26,9 @@ std::unique_ptr<Image> ImageProcessing::convolution(const Image &image, const Ke
     std::vector pixels(outputHeight, std::vector<Pixel>(outputWidth));
 
 // #pragma omp parallel collapse(2) schedule(guided)     > prestazioni simili poiché collapse(2) rimuove la località spaziale
-#pragma omp parallel for schedule(dynamic) default(none) \
+// schedule(runtime): dynamic unless OMP_SCHEDULE says otherwise (runtime::setDefaultSchedule, called by
+// every executable and by the tests: without it the default schedule of the OpenMP implementation)
+#pragma omp parallel for schedule(runtime) default(none) \
     shared(pixels, originalData, outputHeight) \
     firstprivate(outputWidth, order, kernelWeights)
 //{
@@ -0,0 +1,104 @@
+#include <gtest/gtest.h>
+#include <filesystem>
+#include <fstream>
+#include "expt/workload/Workload.h"
+
+/**
+ * testWorkload.kip (interleaved) and testWorkloadPlanar.kip (planar) are 5x3 "gradient"
+ * workloads written by py_script/workload.py:
+ * python -c "from workload import writeWorkload; writeWorkload('testWorkload.kip', 5, 3, 'AoS', pattern='gradient')"
+ */
+class WorkloadTest : public ::testing::Test {
+protected:
+    static constexpr unsigned int width = 5;
+    static constexpr unsigned int height = 3;
+
+    static std::string inputFilePath(const std::string& fileName) {
+        std::stringstream inputFilePathStream;
+        inputFilePathStream << TEST_IMAGES_INPUT_DIRPATH << fileName;
+        return inputFilePathStream.str();
+    }
+
+    static std::string outputFilePath(const std::string& fileName) {
+        std::stringstream outputFilePathStream;
+        outputFilePathStream << TEST_IMAGES_OUTPUT_DIRPATH << fileName;
+        return outputFilePathStream.str();
+    }
+
+    // copy of the first numBytes bytes of the interleaved workload, with the first byte replaced by firstByte
+    static std::string writeAlteredCopy(const std::string& fileName, const std::streamsize numBytes, const char firstByte) {
+        std::ifstream input(inputFilePath("testWorkload.kip"), std::ios::binary);
+        std::vector<char> bytes(numBytes);
+        input.read(bytes.data(), numBytes);
+        bytes[0] = firstByte;
+
+        const std::string filePath = outputFilePath(fileName);
+        std::ofstream output(filePath, std::ios::binary);
+        output.write(bytes.data(), numBytes);
+        return filePath;
+    }
+
+    // pixel (x, y) of workload.py "gradient" pattern
+    static Pixel gradientPixel(const unsigned int x, const unsigned int y) {
+        const unsigned int red = x * 255 / (width - 1);
+        const unsigned int green = y * 255 / (height - 1);
+        return Pixel(red, green, (red + green) / 2);
+    }
+
+    static void expectGradient(const std::unique_ptr<Image>& img, const unsigned int numLoads) {
+        ASSERT_NE(img, nullptr);
+        EXPECT_EQ(img->getWidth(), width);
+        EXPECT_EQ(img->getHeight(), numLoads * height);
+        ASSERT_EQ(img->getData().size(), numLoads * height);
+        ASSERT_EQ(img->getData()[0].size(), width);
+        for (unsigned int y = 0; y < numLoads * height; ++y) {
+            for (unsigned int x = 0; x < width; ++x) {
+                const Pixel expected = gradientPixel(x, y % height);
+                EXPECT_EQ(img->getData()[y][x].getR(), expected.getR());
+                EXPECT_EQ(img->getData()[y][x].getG(), expected.getG());
+                EXPECT_EQ(img->getData()[y][x].getB(), expected.getB());
+            }
+        }
+    }
+};
+
+
+TEST_F(WorkloadTest, testLoadExpandedRawImageWhenInterleaved) {
+    const auto img = workload::loadExpandedRawImage(inputFilePath("testWorkload.kip"), 1);
+
+    expectGradient(img, 1);
+}
+
+TEST_F(WorkloadTest, testLoadExpandedRawImageWhenPlanar) {
+    const auto img = workload::loadExpandedRawImage(inputFilePath("testWorkloadPlanar.kip"), 1);
+
+    expectGradient(img, 1);
+}
+
+TEST_F(WorkloadTest, testLoadExpandedRawImageRepeatsTheImage) {
+    constexpr unsigned int numLoads = 3;
+
+    const auto img = workload::loadExpandedRawImage(inputFilePath("testWorkload.kip"), numLoads);
+
+    expectGradient(img, numLoads);
+}
+
+TEST_F(WorkloadTest, testLoadExpandedRawImageWhenFileDoesntExist) {
+    const std::string inputFilePath = "this/path/doesnt/exist/testWorkload.kip";
+    std::filesystem::remove_all(inputFilePath);
+
+    EXPECT_THROW(workload::loadExpandedRawImage(inputFilePath, 1), std::runtime_error);
+}
+
+TEST_F(WorkloadTest, testLoadExpandedRawImageWhenFileIsTruncated) {
+    // header and the first row only
+    const std::string filePath = writeAlteredCopy("truncatedWorkload.kip", 32 + width * 3, 'K');
+
+    EXPECT_THROW(workload::loadExpandedRawImage(filePath, 1), std::runtime_error);
+}
+
+TEST_F(WorkloadTest, testLoadExpandedRawImageWhenHeaderIsBad) {
+    const std::string filePath = writeAlteredCopy("badHeaderWorkload.kip", 32 + width * height * 3, 'X');
+
+    EXPECT_THROW(workload::loadExpandedRawImage(filePath, 1), std::runtime_error);
+}
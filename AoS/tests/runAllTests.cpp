@@ -1,7 +1,11 @@
 #include <gtest/gtest.h>
 
+#include "expt/runtime/RuntimeConfig.h"
+
 
 int main(int argc, char **argv) {
     ::testing::InitGoogleTest(&argc, argv);
+    // the convolution tests run with the schedule of the executables
+    runtime::setDefaultSchedule();
     return RUN_ALL_TESTS();
 }
\ No newline at end of file
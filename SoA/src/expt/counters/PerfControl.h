@@ -0,0 +1,23 @@
+#ifndef PERFCONTROL_H
+#define PERFCONTROL_H
+
+
+namespace counters {
+    /**
+     * Enables the hardware counters of a "perf stat -D -1 --control fd:ctl,ack" session whose
+     * file descriptors are given by the PERF_CTL_FD and PERF_ACK_FD environment variables
+     * (as py_script/perf.py does), so that only the bracketed code is counted.
+     * Does nothing when the executable does not run under such a session.
+     */
+    void resume();
+
+    /**
+     * Disables the hardware counters enabled by resume.
+     */
+    void pause();
+
+};
+
+
+
+#endif //PERFCONTROL_H
@@ -0,0 +1,62 @@
+#include <cstdlib>
+#include <filesystem>
+
+#include "RuntimeConfig.h"
+
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
+void runtime::setDefaultSchedule() {
+#ifdef _OPENMP
+    if (std::getenv("OMP_SCHEDULE") == nullptr)
+        omp_set_schedule(omp_sched_dynamic, 0);
+#endif
+}
+
+std::string runtime::csvRecord() {
+    std::string procBind = "false";
+    std::string schedule = "static";
+    int chunkSize = 0;
+#ifdef _OPENMP
+    switch (omp_get_proc_bind()) {
+        case omp_proc_bind_true: procBind = "true"; break;
+        case omp_proc_bind_master: procBind = "primary"; break;
+        case omp_proc_bind_close: procBind = "close"; break;
+        case omp_proc_bind_spread: procBind = "spread"; break;
+        default: procBind = "false";
+    }
+
+    omp_sched_t kind;
+    omp_get_schedule(&kind, &chunkSize);
+    // ignore the monotonic modifier
+    switch (kind & ~omp_sched_monotonic) {
+        case omp_sched_static: schedule = "static"; break;
+        case omp_sched_dynamic: schedule = "dynamic"; break;
+        case omp_sched_guided: schedule = "guided"; break;
+        case omp_sched_auto: schedule = "auto"; break;
+        default: schedule = "unknown";
+    }
+#endif
+
+    // places are reported as written in OMP_PLACES (quoted: they may contain commas)
+    const char* envPlaces = std::getenv("OMP_PLACES");
+    const std::string places = envPlaces != nullptr ? envPlaces : "unset";
+
+    return procBind + ",\"" + places + "\"," + schedule + "," + std::to_string(chunkSize);
+}
+
+std::vector<int> runtime::threadCounts(const int maxNumThreads) {
+    if (const char* envNumThreads = std::getenv("KIP_NUM_THREADS"); envNumThreads != nullptr)
+        return {std::stoi(envNumThreads)};
+
+    std::vector<int> counts;
+    for (int numThreads = 1; numThreads <= maxNumThreads; numThreads<<=1)
+        counts.push_back(numThreads);
+    return counts;
+}
+
+bool runtime::stopRequested() {
+    const char* envStopFile = std::getenv("KIP_STOP_FILE");
+    return envStopFile != nullptr && std::filesystem::exists(envStopFile);
+}
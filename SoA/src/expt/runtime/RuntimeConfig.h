@@ -0,0 +1,44 @@
+#ifndef RUNTIMECONFIG_H
+#define RUNTIMECONFIG_H
+#include <string>
+#include <vector>
+
+
+namespace runtime {
+    /**
+     * Header of the csv columns describing the OpenMP runtime configuration.
+     */
+    inline const std::string csvHeader = "ProcBind,Places,Schedule,ChunkSize";
+
+    /**
+     * ImageProcessing::convolution uses schedule(runtime): set the dynamic schedule
+     * (default chunk size) unless the OMP_SCHEDULE environment variable chooses another one.
+     */
+    void setDefaultSchedule();
+
+    /**
+     * Retrieves the thread affinity policy, the places and the loop schedule
+     * of the OpenMP runtime as the csv values of csvHeader.
+     */
+    std::string csvRecord();
+
+    /**
+     * Thread counts of the scaling experiments: the powers of two up to maxNumThreads,
+     * or only the count given by the KIP_NUM_THREADS environment variable
+     * (e.g. to measure a single thread count under an external profiler).
+     */
+    std::vector<int> threadCounts(int maxNumThreads);
+
+    /**
+     * Whether the file named by the KIP_STOP_FILE environment variable exists:
+     * a live analysis (py_script/live.py) creates it to skip the remaining thread counts.
+     * The scaling drivers write the rows of a thread count once it completes, so a stop
+     * in the middle of a thread count drops its rows.
+     */
+    bool stopRequested();
+
+};
+
+
+
+#endif //RUNTIMECONFIG_H
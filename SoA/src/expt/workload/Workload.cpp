@@ -1,8 +1,17 @@
 #include "stb_image.h"
 
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <fstream>
+
 #include "Workload.h"
 
 #define RGB_CHANNELS 3
+#define RAW_HEADER_SIZE 32
+#define RAW_VERSION 1
+#define RAW_LAYOUT_INTERLEAVED 0
+#define RAW_LAYOUT_PLANAR 1
 
 std::unique_ptr<Image> workload::loadExpandedRGBImage(const std::filesystem::path &filePath, const unsigned int numLoads) {
     int width, height, channels;
@@ -34,3 +43,61 @@ std::unique_ptr<Image> workload::loadExpandedRGBImage(const std::filesystem::pat
     stbi_image_free(imgData);
     return std::make_unique<Image>(width, expandedHeight, reds, greens, blues);
 }
+
+std::unique_ptr<Image> workload::loadExpandedRawImage(const std::filesystem::path &filePath, const unsigned int numLoads) {
+    std::ifstream file(filePath, std::ios::binary);
+    unsigned char header[RAW_HEADER_SIZE];
+    if (!file.read(reinterpret_cast<char*>(header), RAW_HEADER_SIZE) || std::memcmp(header, "KIPR", 4) != 0) {
+        throw std::runtime_error("Workload loading fails.");
+    }
+
+    // header fields (little endian)
+    const uint16_t version = header[4] | header[5] << 8;
+    const uint8_t layout = header[6];
+    const uint8_t channels = header[7];
+    uint32_t width = 0, height = 0;
+    for (int b = 3; b >= 0; b--) {
+        width = width << 8 | header[8 + b];
+        height = height << 8 | header[12 + b];
+    }
+    if (version != RAW_VERSION || channels != RGB_CHANNELS ||
+        (layout != RAW_LAYOUT_INTERLEAVED && layout != RAW_LAYOUT_PLANAR)) {
+        throw std::runtime_error("Unsupported workload format.");
+    }
+
+    // a single read of the whole image
+    const size_t planeSize = static_cast<size_t>(width) * height;
+    std::vector<uint8_t> data(planeSize * RGB_CHANNELS);
+    if (!file.read(reinterpret_cast<char*>(data.data()), static_cast<std::streamsize>(data.size()))) {
+        throw std::runtime_error("Workload loading fails.");
+    }
+
+    // channel c of the pixel at position pos (y * width + x)
+    const auto channel = [&](const size_t pos, const unsigned int c) {
+        return layout == RAW_LAYOUT_INTERLEAVED ? data[pos * RGB_CHANNELS + c] : data[c * planeSize + pos];
+    };
+
+    // expand only in high
+    const unsigned int expandedHeight = numLoads * height;
+
+    // conversion
+    std::vector<uint8_t> reds (width * expandedHeight);
+    std::vector<uint8_t> greens (width * expandedHeight);
+    std::vector<uint8_t> blues (width * expandedHeight);
+    for (int w = 0; w < numLoads; w++) {
+        if (layout == RAW_LAYOUT_PLANAR) {
+            // planes are already in the image layout
+            std::copy_n(data.begin(), planeSize, reds.begin() + w * planeSize);
+            std::copy_n(data.begin() + planeSize, planeSize, greens.begin() + w * planeSize);
+            std::copy_n(data.begin() + 2 * planeSize, planeSize, blues.begin() + w * planeSize);
+            continue;
+        }
+        for (size_t pos = 0; pos < planeSize; ++pos) {
+            reds[w * planeSize + pos] = channel(pos, 0);
+            greens[w * planeSize + pos] = channel(pos, 1);
+            blues[w * planeSize + pos] = channel(pos, 2);
+        }
+    }
+
+    return std::make_unique<Image>(width, expandedHeight, reds, greens, blues);
+}
@@ -12,6 +12,14 @@ namespace workload {
      */
     std::unique_ptr<Image> loadExpandedRGBImage(const std::filesystem::path& filePath, unsigned int numLoads);
 
+    /**
+     * Do the same thing of loadExpandedRGBImage method, but from a raw workload file
+     * written by py_script/workload.py (no decoding):
+     * a 32 bytes little endian header ("KIPR", version, layout, channels, width, height)
+     * followed by the interleaved (layout 0) or planar (layout 1) 8 bits RGB channels.
+     */
+    std::unique_ptr<Image> loadExpandedRawImage(const std::filesystem::path& filePath, unsigned int numLoads);
+
 };
 
 
@@ -0,0 +1,108 @@
+#include <gtest/gtest.h>
+#include <filesystem>
+#include <fstream>
+#include "expt/workload/Workload.h"
+
+/**
+ * testWorkload.kip (interleaved) and testWorkloadPlanar.kip (planar) are 5x3 "gradient"
+ * workloads written by py_script/workload.py:
+ * python -c "from workload import writeWorkload; writeWorkload('testWorkload.kip', 5, 3, 'AoS', pattern='gradient')"
+ */
+class WorkloadTest : public ::testing::Test {
+protected:
+    static constexpr unsigned int width = 5;
+    static constexpr unsigned int height = 3;
+
+    static std::string inputFilePath(const std::string& fileName) {
+        std::stringstream inputFilePathStream;
+        inputFilePathStream << TEST_IMAGES_INPUT_DIRPATH << fileName;
+        return inputFilePathStream.str();
+    }
+
+    static std::string outputFilePath(const std::string& fileName) {
+        std::stringstream outputFilePathStream;
+        outputFilePathStream << TEST_IMAGES_OUTPUT_DIRPATH << fileName;
+        return outputFilePathStream.str();
+    }
+
+    // copy of the first numBytes bytes of the interleaved workload, with the first byte replaced by firstByte
+    static std::string writeAlteredCopy(const std::string& fileName, const std::streamsize numBytes, const char firstByte) {
+        std::ifstream input(inputFilePath("testWorkload.kip"), std::ios::binary);
+        std::vector<char> bytes(numBytes);
+        input.read(bytes.data(), numBytes);
+        bytes[0] = firstByte;
+
+        const std::string filePath = outputFilePath(fileName);
+        std::ofstream output(filePath, std::ios::binary);
+        output.write(bytes.data(), numBytes);
+        return filePath;
+    }
+
+    // channels of the pixel (x, y) of workload.py "gradient" pattern
+    static uint8_t gradientRed(const unsigned int x) {
+        return x * 255 / (width - 1);
+    }
+
+    static uint8_t gradientGreen(const unsigned int y) {
+        return y * 255 / (height - 1);
+    }
+
+    static void expectGradient(const std::unique_ptr<Image>& img, const unsigned int numLoads) {
+        ASSERT_NE(img, nullptr);
+        EXPECT_EQ(img->getWidth(), width);
+        EXPECT_EQ(img->getHeight(), numLoads * height);
+        ASSERT_EQ(img->getReds().size(), width * numLoads * height);
+        ASSERT_EQ(img->getGreens().size(), width * numLoads * height);
+        ASSERT_EQ(img->getBlues().size(), width * numLoads * height);
+        for (unsigned int y = 0; y < numLoads * height; ++y) {
+            for (unsigned int x = 0; x < width; ++x) {
+                const unsigned int red = gradientRed(x);
+                const unsigned int green = gradientGreen(y % height);
+                EXPECT_EQ(img->getReds()[y * width + x], red);
+                EXPECT_EQ(img->getGreens()[y * width + x], green);
+                EXPECT_EQ(img->getBlues()[y * width + x], (red + green) / 2);
+            }
+        }
+    }
+};
+
+
+TEST_F(WorkloadTest, testLoadExpandedRawImageWhenInterleaved) {
+    const auto img = workload::loadExpandedRawImage(inputFilePath("testWorkload.kip"), 1);
+
+    expectGradient(img, 1);
+}
+
+TEST_F(WorkloadTest, testLoadExpandedRawImageWhenPlanar) {
+    const auto img = workload::loadExpandedRawImage(inputFilePath("testWorkloadPlanar.kip"), 1);
+
+    expectGradient(img, 1);
+}
+
+TEST_F(WorkloadTest, testLoadExpandedRawImageRepeatsTheImage) {
+    constexpr unsigned int numLoads = 3;
+
+    const auto img = workload::loadExpandedRawImage(inputFilePath("testWorkload.kip"), numLoads);
+
+    expectGradient(img, numLoads);
+}
+
+TEST_F(WorkloadTest, testLoadExpandedRawImageWhenFileDoesntExist) {
+    const std::string inputFilePath = "this/path/doesnt/exist/testWorkload.kip";
+    std::filesystem::remove_all(inputFilePath);
+
+    EXPECT_THROW(workload::loadExpandedRawImage(inputFilePath, 1), std::runtime_error);
+}
+
+TEST_F(WorkloadTest, testLoadExpandedRawImageWhenFileIsTruncated) {
+    // header and the first row only
+    const std::string filePath = writeAlteredCopy("truncatedWorkload.kip", 32 + width * 3, 'K');
+
+    EXPECT_THROW(workload::loadExpandedRawImage(filePath, 1), std::runtime_error);
+}
+
+TEST_F(WorkloadTest, testLoadExpandedRawImageWhenHeaderIsBad) {
+    const std::string filePath = writeAlteredCopy("badHeaderWorkload.kip", 32 + width * height * 3, 'X');
+
+    EXPECT_THROW(workload::loadExpandedRawImage(filePath, 1), std::runtime_error);
+}
@@ -0,0 +1,161 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from matplotlib import colormaps
+
+from analysis import (analyseStrongScaling, analyseWeakScaling, configurationLabel,
+                      CONFIG_COLUMNS, STRONG_GROUP, WEAK_GROUP)
+from hostinfo import resolvePhysicalCores
+from rendering import FigureRenderer
+
+
+# (column, axis label) of the panels of the configuration figures
+STRONG_PANELS = [("TimePerRep_s", "Time (s)"), ("SpeedUp", "SpeedUp")]
+WEAK_PANELS = [("WeakEfficiency", "Weak Efficiency"), ("Throughput_Mpix_s", "Throughput (Mpix/s)")]
+
+
+def numConfigurations(results):
+    return len(results[CONFIG_COLUMNS].drop_duplicates())
+
+
+# Rank the configurations of every (group, NumThreads) by mean time.
+#
+# results   frame returned by analyseStrongScaling or analyseWeakScaling.
+# kind      "strong" or "weak".
+#
+# Returns one row per (group, NumThreads, configuration) with its Rank
+# (1 is the fastest) and RelativeTime (time / best time).
+#
+def rankConfigurations(results, kind = "strong"):
+    keys = (STRONG_GROUP if kind == "strong" else WEAK_GROUP) + ["NumThreads"]
+    ranking = results[keys + CONFIG_COLUMNS + ["TimePerRep_s"]].copy()
+    ranking["Configuration"] = ranking[CONFIG_COLUMNS].apply(configurationLabel, axis=1)
+    ranking["Rank"] = ranking.groupby(keys)["TimePerRep_s"].rank(method="min").astype(int)
+    ranking["RelativeTime"] = ranking["TimePerRep_s"] / ranking.groupby(keys)["TimePerRep_s"].transform("min")
+    return ranking.sort_values(keys + ["Rank"], ignore_index=True)
+
+
+# Best configuration of every (group, NumThreads), with the gain over the
+# slowest configuration.
+#
+def bestConfigurations(ranking, kind = "strong"):
+    keys = (STRONG_GROUP if kind == "strong" else WEAK_GROUP) + ["NumThreads"]
+    best = ranking[ranking["Rank"] == 1].drop_duplicates(keys).copy()
+    worst = ranking.groupby(keys)["RelativeTime"].max().rename("WorstRelativeTime")
+    return best.join(worst, on=keys).drop(columns=["Rank", "RelativeTime"]).reset_index(drop=True)
+
+
+# One figure per group with one curve per configuration.
+#
+# results       frame returned by analyseStrongScaling or analyseWeakScaling.
+# kind          "strong" or "weak".
+# phys_cores    number of physical cores (None means detected on this host).
+# output_dir    directory where the images are saved.
+# show          whether to open every figure in a blocking window.
+# prefix        prefix of the image names (e.g. the layout).
+# renderer      FigureRenderer drawing the figures (see rendering.py), closed
+#               by the caller; None means png files in output_dir.
+#
+# Returns the paths of the saved images.
+#
+def plotConfigurationCurves(results, kind = "strong", phys_cores = None,
+                            output_dir = ".", show = True, prefix = "", renderer = None):
+    phys_cores = resolvePhysicalCores(phys_cores)
+    own_renderer = renderer is None
+    if own_renderer:
+        renderer = FigureRenderer(output_dir, show=show)
+    group = STRONG_GROUP if kind == "strong" else WEAK_GROUP
+    panels = STRONG_PANELS if kind == "strong" else WEAK_PANELS
+    images = []
+    for (group_dim, kernel_dim), subgroup in results.groupby(group):
+        configurations = subgroup.groupby(CONFIG_COLUMNS)
+        if configurations.ngroups < 2:
+            continue
+
+        fig = renderer.figure((14, 6))
+        axes = fig.subplots(1, 2, sharex=True)
+        colors = colormaps["tab10"](np.arange(configurations.ngroups) % 10)
+        for ax, (column, ylabel) in zip(axes, panels):
+            ax.axvline(x=phys_cores, color="black", linestyle="--",
+                       linewidth=1.5, alpha=0.6, label="Max physical threads")
+            ax.axvspan(phys_cores, subgroup["NumThreads"].max(),
+                       color="black", alpha=0.1, label="Logical threads zone")
+            for color, (config, values) in zip(colors, configurations):
+                values = values.sort_values("NumThreads")
+                ax.plot(values["NumThreads"], values[column], marker="o", linestyle="-",
+                        color=color, markersize=5, label=configurationLabel(config))
+            if column == "SpeedUp":
+                threads = sorted(subgroup["NumThreads"].unique())
+                ax.plot(threads, threads, "--", color="green", alpha=0.4, label="ideal speedup")
+            ax.set_xlabel("Threads number (p)")
+            ax.set_ylabel(ylabel)
+            ax.grid(True, linestyle="--", alpha=0.6)
+        axes[-1].legend(loc="best", fontsize=8)
+
+        title = "Strong Scaling" if kind == "strong" else "Weak Scaling: W₀ ="
+        fig.suptitle(f"OpenMP configurations - {title} {group_dim} images | {kernel_dim}x{kernel_dim} kernels")
+        fig.tight_layout()
+
+        filename = renderer.save(fig, f"{prefix}{kind}_configurations_{group_dim}_{kernel_dim}")
+        if filename is not None:
+            images.append(filename)
+    if own_renderer:
+        renderer.close()
+    return images
+
+
+# Draw the configuration curves (through renderer, if given) and save the
+# ranking of analysed results (no-op with a single configuration).
+#
+def reportConfigurations(results, kind = "strong", phys_cores = None,
+                         output_dir = ".", show = True, prefix = "", renderer = None):
+    if numConfigurations(results) < 2:
+        return None
+    plotConfigurationCurves(results, kind, phys_cores, output_dir, show, prefix, renderer)
+    best = bestConfigurations(rankConfigurations(results, kind), kind)
+    print(f"\nBest OpenMP configuration ({kind} scaling):")
+    print(best.drop(columns=CONFIG_COLUMNS).to_string(index=False, float_format="%.4f"))
+    filename = os.path.join(output_dir, f"{prefix}{kind}_configuration_ranking.csv")
+    best.to_csv(filename, index=False)
+    print(f"\nTable saved at {os.path.realpath(filename)}")
+    return best
+
+
+# Csv files of the arguments: files are kept, directories are explored.
+def _csvFiles(paths):
+    # imported here: batch imports amdahl, which imports this module
+    from batch import findScalingCsv
+    files = [p for p in paths if os.path.isfile(p)]
+    return files + findScalingCsv([p for p in paths if os.path.isdir(p)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the scaling curves of the OpenMP configurations "
+                    "(proc_bind, places, schedule, chunk size).")
+    parser.add_argument("paths", nargs="+",
+                        help="scaling csv files (also experiments.py datasets) or directories")
+    parser.add_argument("--phys-cores", type=int, default=None,
+                        help="number of physical cores (default: detected on this host)")
+    parser.add_argument("-o", "--output-dir", default=".")
+    args = parser.parse_args()
+
+    frames = [pd.read_csv(f) for f in _csvFiles(args.paths)]
+    for kind, column in [("strong", "SpeedUp"), ("weak", "WeakEfficiency")]:
+        kind_frames = [df for df in frames if column in df.columns]
+        if not kind_frames:
+            continue
+        df = pd.concat(kind_frames, ignore_index=True)
+        # experiments.py datasets can mix the layouts
+        layouts = df.groupby("Layout") if "Layout" in df.columns else [("", df)]
+        for layout, data in layouts:
+            if kind == "strong":
+                results = analyseStrongScaling(data, args.phys_cores)
+            else:
+                results = analyseWeakScaling(data)
+            prefix = f"{layout}_" if layout else ""
+            if reportConfigurations(results, kind, args.phys_cores, args.output_dir,
+                                    show=False, prefix=prefix) is None:
+                print(f"\nA single OpenMP configuration in the {prefix}{kind} scaling data.")
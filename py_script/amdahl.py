@@ -1,12 +1,19 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
 import numpy as np
 import sys
-import os
+
+from analysis import (analyseStrongScaling, bootstrapStrongScaling, amdahlSpeedUp, withConfiguration,
+                      configurationLabel, configurationSuffix, STRONG_KEYS)
+from affinity import numConfigurations, reportConfigurations
+from cache import ResultCache
+from hostinfo import dataPhysicalCores
+from rendering import FigureRenderer, curveFamily, valueLabels, valueTicks
 
 
 # csv_filename           relative path to the .cvs file to analyze.
+# phys_cores             number of physical cores of the machine of the data (None
+#                        means read from its host.json, see
+#                        hostinfo.dataPhysicalCores).
 # min_relative_time      minimum improvement (as fraction) from the previous
 #                        value to consider it as a good time (bad values are
 #                        printed in red).
@@ -15,26 +22,78 @@ import os
 #                        are printed in red).
 # min_efficiency         minimum weak efficiency value in order to consider it 
 #                        as a good value (bad values are printed in red).
+# output_dir             directory where the images are saved.
+# show                   whether to open every figure in a blocking window
+#                        (disable it for headless/batch runs).
+# use_cache              whether to skip the groups whose rows and thresholds
+#                        are unchanged since the last run (see cache.py).
+# num_resamples          number of bootstrap resamples of the per-image runs used
+#                        to estimate the confidence intervals of f and f_p
+#                        (0 disables them).
+# confidence             confidence level of the bootstrap intervals.
+# df                     rows already loaded (e.g. queried from store.py): the
+#                        csv file is not read and csv_filename only names the cache.
+# renderer               FigureRenderer drawing the figures (e.g. in preview mode
+#                        or into a dashboard, see rendering.py), closed by the
+#                        caller; None means png files in output_dir.
+#
+# With several OpenMP configurations (ProcBind, Places, Schedule, ChunkSize)
+# in the csv file, every configuration gets its own figures, plus one figure
+# per group comparing them and the ranking table (see affinity.py).
 #
 def plotStrongScaling(csv_filename = "../data/kip_openMP_strongScaling.csv", 
-                      phys_cores = 10, min_relative_time = 0.05,
-                      min_marginal_speedup = 0.2, min_efficiency = 0.7):
-    df = pd.read_csv(csv_filename)
+                      phys_cores = None, min_relative_time = 0.05,
+                      min_marginal_speedup = 0.2, min_efficiency = 0.7,
+                      output_dir = ".", show = True, use_cache = True,
+                      num_resamples = 2000, confidence = 0.95, df = None,
+                      renderer = None):
+    phys_cores = dataPhysicalCores(csv_filename if df is None else None, phys_cores)
+    df = withConfiguration(pd.read_csv(csv_filename) if df is None else df)
+    with_ci = num_resamples > 0
+    own_renderer = renderer is None
+    if own_renderer:
+        renderer = FigureRenderer(output_dir, show=show)
     
-    # Group same-size-images-and-kernels and calculate means
-    grouped = (
-        df.groupby(["ImageDimension", "KernelDimension", "NumThreads"])
-          .agg({"TimePerRep_s": "mean", "SpeedUp": "mean", "Efficiency": "mean"})
-          .reset_index()
-    )
+    # a dashboard needs every group drawn, cached or not
+    use_cache = use_cache and renderer.dashboard is None
+    cache = ResultCache.forCsv(csv_filename, output_dir) if use_cache else None
+    cache_params = {
+        "phys_cores": phys_cores,
+        "min_relative_time": min_relative_time,
+        "min_marginal_speedup": min_marginal_speedup,
+        "min_efficiency": min_efficiency,
+        "num_resamples": num_resamples,
+        "confidence": confidence,
+        "mode": renderer.mode,
+    }
+    raw_groups = df.groupby(STRONG_KEYS)
     
-    # Main Loop (group by same data size)
-    for (image_dim, kernel_dim), subgroup in grouped.groupby(["ImageDimension", "KernelDimension"]):
-        subgroup = subgroup.sort_values("NumThreads")        
+    # Group same-size-images-and-kernels, calculate means and fit f for all groups
+    results = analyseStrongScaling(df, phys_cores)
+    if with_ci:
+        # fixed seed: same rows give same intervals (and cache keys stay valid)
+        intervals = bootstrapStrongScaling(df, phys_cores, num_resamples, confidence, seed=0)
+        results = results.merge(intervals, on=STRONG_KEYS + ["NumThreads"], how="left")
+    multiple_configs = numConfigurations(results) > 1
+    
+    # Main Loop (group by same data size and OpenMP configuration)
+    for keys, subgroup in results.groupby(STRONG_KEYS):
+        image_dim, kernel_dim, config = keys[0], keys[1], keys[2:]
+        config_suffix = f"_{configurationSuffix(config)}" if multiple_configs else ""
+        config_title = f" | {configurationLabel(config)}" if multiple_configs else ""
+        subgroup = subgroup.sort_values("NumThreads").reset_index(drop=True)
+        
+        if cache is not None:
+            cache_key = ResultCache.key(raw_groups.get_group(keys), cache_params)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                printCachedStrongResults(image_dim, kernel_dim, phys_cores, confidence, cached, config_title)
+                continue
+        images = []
         
         ### FIRST PART: Amdahl valuation (linear fit)
-        plt.figure(figsize=(7,5))
-        model = LinearRegression(fit_intercept=True)
+        fig = renderer.figure((7, 5))
+        ax = fig.add_subplot()
         
         ### Spiegazione dati ###
         # Col fit lineare (f) vengono usati tutti i punti e riduce il rumore della singola stima.
@@ -46,51 +105,51 @@ def plotStrongScaling(csv_filename = "../data/kip_openMP_strongScaling.csv",
         
         # Discard sequential runs
         multithread_values = subgroup[subgroup["NumThreads"] > 1]
-        x = 1 / multithread_values["NumThreads"].values.reshape(-1, 1)
-        y = 1 / multithread_values["SpeedUp"].values.reshape(-1, 1)
-        plt.scatter(x, y, label="experimental data", color="limegreen", s=60)
+        x = 1 / multithread_values["NumThreads"].values
+        y = 1 / multithread_values["SpeedUp"].values
+        ax.scatter(x, y, label="experimental data", color="limegreen", s=60)
     
-        model.fit(x, y)
-        f_est = model.intercept_[0]  # intersection axis y = estimation of f
-        slope = model.coef_[0][0]
+        f_est = subgroup["f"].iloc[0]  # intersection axis y = estimation of f
+        slope = subgroup["slope"].iloc[0]
         
-        print(f"\nCouple ({image_dim}, kernel={kernel_dim}) with thread > 1:")
+        print(f"\nCouple ({image_dim}, kernel={kernel_dim}{config_title}) with thread > 1:")
         print(f"  f evaluated = {f_est:.4f} (intersection), angular coeff={slope:.4f}")
+        if with_ci:
+            f_ci = [subgroup["f_lo"].iloc[0], subgroup["f_hi"].iloc[0]]
+            print(f"  {confidence:.0%} CI of f = [{f_ci[0]:.4f}, {f_ci[1]:.4f}]")
         
-        x_fit = np.linspace(0, 1, 2).reshape(-1, 1)
-        y_fit = model.predict(x_fit)
-        plt.plot(x_fit, y_fit, "-.", label=f"linear fit (f ≈ {f_est:.3f})")
+        x_fit = np.linspace(0, 1, 2)
+        y_fit = f_est + slope * x_fit
+        ax.plot(x_fit, y_fit, "-.", label=f"linear fit (f ≈ {f_est:.3f})")
         
         # Also discard runs with virtual cores
         phys_multithread_values = multithread_values[multithread_values["NumThreads"] <= phys_cores]
-        phys_x = 1 / phys_multithread_values["NumThreads"].values.reshape(-1, 1)
-        phys_y = 1 / phys_multithread_values["SpeedUp"].values.reshape(-1, 1)
-        plt.scatter(phys_x, phys_y, label="physical core data", facecolors='none',
-                    s=60, edgecolors="darkred")
+        phys_x = 1 / phys_multithread_values["NumThreads"].values
+        phys_y = 1 / phys_multithread_values["SpeedUp"].values
+        ax.scatter(phys_x, phys_y, label="physical core data", facecolors='none',
+                   s=60, edgecolors="darkred")
         
-        model.fit(phys_x, phys_y)
-        phys_f_est = model.intercept_[0]
-        phys_slope = model.coef_[0][0]
+        phys_f_est = subgroup["phys_f"].iloc[0]
+        phys_slope = subgroup["phys_slope"].iloc[0]
         
-        print(f"\nCouple ({image_dim}, kernel={kernel_dim}) with 1 < thread < {phys_cores}:")
+        print(f"\nCouple ({image_dim}, kernel={kernel_dim}{config_title}) with 1 < thread < {phys_cores}:")
         print(f"  f evaluated = {phys_f_est:.4f} (intersection), angular coeff={phys_slope:.4f}")
+        if with_ci:
+            phys_f_ci = [subgroup["phys_f_lo"].iloc[0], subgroup["phys_f_hi"].iloc[0]]
+            print(f"  {confidence:.0%} CI of f = [{phys_f_ci[0]:.4f}, {phys_f_ci[1]:.4f}]")
         
-        phys_y_fit = model.predict(x_fit)
-        plt.plot(x_fit, phys_y_fit, ":", label=f"physical linear fit (f ≈ {phys_f_est:.3f})")
+        phys_y_fit = phys_f_est + phys_slope * x_fit
+        ax.plot(x_fit, phys_y_fit, ":", label=f"physical linear fit (f ≈ {phys_f_est:.3f})")
         
         
-        plt.xlabel("1 / NumThreads")
-        plt.ylabel("1 / SpeedUp")
-        plt.title(f"Estimate f: {image_dim} images | {kernel_dim} kernels")
-        plt.legend(loc="best")
-        plt.grid(True, linestyle="--", alpha=0.6)
-        plt.tight_layout()
+        ax.set_xlabel("1 / NumThreads")
+        ax.set_ylabel("1 / SpeedUp")
+        ax.set_title(f"Estimate f: {image_dim} images | {kernel_dim} kernels{config_title}")
+        ax.legend(loc="best")
+        ax.grid(True, linestyle="--", alpha=0.6)
+        fig.tight_layout()
         
-        filename = f"amdahl_estimate_{image_dim}_{kernel_dim}.png".replace("x", "x")
-        plt.savefig(filename, dpi=150)
-        print(f"\nImage saved at {os.path.realpath(filename)}")
-        plt.show()
-        plt.close()
+        images.append(renderer.save(fig, f"amdahl_estimate_{image_dim}_{kernel_dim}{config_suffix}"))
 
 
         ### Spiegazione dati ###
@@ -100,39 +159,57 @@ def plotStrongScaling(csv_filename = "../data/kip_openMP_strongScaling.csv",
         # se cresce con p, hai overhead/collo di bottiglia che aumentano con i thread 
         # (sync, memoria, false sharing, ecc.).
         
-        f_p_table = []
-        for p, s in zip(multithread_values["NumThreads"], multithread_values["SpeedUp"]):
-            f_p = (1/s - 1/p) / (1 - 1/p)
-            f_p_table.append((p, s, f_p))
-    
-        f_p_df = pd.DataFrame(f_p_table, columns=["NumThreads", "SpeedUp_avg", "f_p"])
+        f_p_columns = ["NumThreads", "SpeedUp", "KarpFlatt"]
+        if with_ci:
+            f_p_columns += ["KarpFlatt_lo", "KarpFlatt_hi"]
+        f_p_df = (
+            multithread_values[f_p_columns]
+              .rename(columns={"SpeedUp": "SpeedUp_avg", "KarpFlatt": "f_p",
+                               "KarpFlatt_lo": "f_p_lo", "KarpFlatt_hi": "f_p_hi"})
+        )
         print("\nTabella f_p (per singolo p):")
         print(f_p_df.to_string(index=False, float_format="%.4f"))
         
         
         # Diagram: linear fit vs f_p vs speedup data
-        plt.figure(figsize=(8,6))
+        fig = renderer.figure((8, 6))
+        ax = fig.add_subplot()
         p_range = np.linspace(1, multithread_values["NumThreads"].max(), 200)
         # speedup data
-        plt.scatter(multithread_values["NumThreads"], multithread_values["SpeedUp"], 
-                    label="experimental speedup", color="limegreen", s=60)
-        # Amdahl curves evaluated by f_p
-        for (p, _, f_p) in f_p_table:
-            p = int(p)
-            f_p_speedup = 1 / (f_p + (1-f_p)/p_range)
-            plt.plot(p_range, f_p_speedup, "-", label=f"p={p} (f ≈ {f_p:.3f})")
+        ax.scatter(multithread_values["NumThreads"], multithread_values["SpeedUp"], 
+                   label="experimental speedup", color="limegreen", s=60)
+        if with_ci:
+            # bootstrap interval of the mean speedup, i.e. of f_p at the same p
+            ax.errorbar(multithread_values["NumThreads"], multithread_values["SpeedUp"],
+                        yerr=[multithread_values["SpeedUp"] - multithread_values["SpeedUp_lo"],
+                              multithread_values["SpeedUp_hi"] - multithread_values["SpeedUp"]],
+                        fmt="none", ecolor="darkgreen", capsize=4)
+        # Amdahl curves evaluated by f_p (a single collection on fine thread grids)
+        f_p_speedups = amdahlSpeedUp(f_p_df["f_p"].values[:, np.newaxis], p_range)
+        curveFamily(ax, p_range, f_p_speedups,
+                    [f"p={p} (f ≈ {f_p:.3f})" for p, f_p in zip(f_p_df["NumThreads"], f_p_df["f_p"])],
+                    f_p_df["NumThreads"], "Amdahl curves of f_p (color: p)")
         # Amdahl curve evaluated by Linear Fit (using both physical and virtual core)
-        lin_fit_speedup = 1 / (f_est + (1-f_est)/p_range)
-        plt.plot(p_range, lin_fit_speedup, "-.",
-                 label=f"linear fit (f ≈ {f_est:.3f})")
+        lin_fit_speedup = amdahlSpeedUp(f_est, p_range)
+        lin_fit_line, = ax.plot(p_range, lin_fit_speedup, "-.",
+                                label=f"linear fit (f ≈ {f_est:.3f})")
+        if with_ci:
+            ax.fill_between(p_range, amdahlSpeedUp(f_ci[1], p_range), amdahlSpeedUp(f_ci[0], p_range),
+                            color=lin_fit_line.get_color(), alpha=0.2,
+                            label=f"linear fit {confidence:.0%} CI")
         # speedup data (using only physical core)
-        plt.scatter(phys_multithread_values["NumThreads"], phys_multithread_values["SpeedUp"], 
-                    label="physical core speedup", facecolors='none', s=60, 
-                    edgecolors="darkred") 
+        ax.scatter(phys_multithread_values["NumThreads"], phys_multithread_values["SpeedUp"], 
+                   label="physical core speedup", facecolors='none', s=60, 
+                   edgecolors="darkred") 
         # Amdahl curve evaluated by Linear Fit (using only physical core)
-        phys_lin_fit_speedup = 1 / (phys_f_est + (1-phys_f_est)/p_range)
-        plt.plot(p_range, phys_lin_fit_speedup, ":", 
-                 label=f"physical linear fit (f ≈ {phys_f_est:.3f})")
+        phys_lin_fit_speedup = amdahlSpeedUp(phys_f_est, p_range)
+        phys_lin_fit_line, = ax.plot(p_range, phys_lin_fit_speedup, ":", 
+                                     label=f"physical linear fit (f ≈ {phys_f_est:.3f})")
+        if with_ci:
+            ax.fill_between(p_range, amdahlSpeedUp(phys_f_ci[1], p_range),
+                            amdahlSpeedUp(phys_f_ci[0], p_range),
+                            color=phys_lin_fit_line.get_color(), alpha=0.2,
+                            label=f"physical linear fit {confidence:.0%} CI")
         
         ### Interpretare il grafico ###
         # - Se f_p oscillano attorno a un valore stabile, vuol dire che la stima 
@@ -159,23 +236,20 @@ def plotStrongScaling(csv_filename = "../data/kip_openMP_strongScaling.csv",
         #   sincronizzazioni, cache misses, false sharing, scheduling, I/O, ecc.
         #   La curva rossa diventa così un “limite superiore ideale”.
         
-        plt.xlabel("NumThreads (p)")
-        plt.ylabel("SpeedUp")
-        plt.title(f"Amdahl curve evaluation: {image_dim} images | {kernel_dim}x{kernel_dim} kernels")
-        plt.legend(loc="best")
-        plt.grid(True, linestyle="--", alpha=0.6)
-        plt.tight_layout()
+        ax.set_xlabel("NumThreads (p)")
+        ax.set_ylabel("SpeedUp")
+        ax.set_title(f"Amdahl curve evaluation: {image_dim} images | {kernel_dim}x{kernel_dim} kernels{config_title}")
+        ax.legend(loc="best")
+        ax.grid(True, linestyle="--", alpha=0.6)
+        fig.tight_layout()
         
-        filename = f"amdahl_evaluation_{image_dim}_{kernel_dim}.png".replace("x", "x")
-        plt.savefig(filename, dpi=150)
-        print(f"\nImage saved at {os.path.realpath(filename)}")
-        plt.show()
-        plt.close()
+        images.append(renderer.save(fig, f"amdahl_evaluation_{image_dim}_{kernel_dim}{config_suffix}"))
         
         
         
         ### SECOND PART: Show strong scaling, i.e. Time vs SpeedUp vs Efficiency
-        fig, ax1 = plt.subplots(figsize=(8,6))
+        fig = renderer.figure((8, 6))
+        ax1 = fig.add_subplot()
     
         ax1.axvline(x=phys_cores, color="black", linestyle="--",
                     linewidth=1.5, alpha=0.6, label="Max physical threads")
@@ -195,13 +269,11 @@ def plotStrongScaling(csv_filename = "../data/kip_openMP_strongScaling.csv",
             label="time",
             markersize=6
         )
-        for i, x, y in zip(range(len(subgroup.index)), subgroup["NumThreads"], subgroup["TimePerRep_s"]):
-            if i > 0 and (subgroup["TimePerRep_s"][i-1] - y) < min_relative_time * subgroup["TimePerRep_s"][i-1]:
-                color = "red"
-            else:
-                color = "black"
-            ax1.annotate(f"{y:.2f}", (x, y), xytext=(-10, -5), textcoords="offset points",
-                ha="center", va="top", fontsize=8, color=color)
+        times = subgroup["TimePerRep_s"].values
+        previous_times = np.roll(times, 1)
+        slow_times = (previous_times - times) < min_relative_time * previous_times
+        slow_times[0] = False
+        valueLabels(ax1, subgroup["NumThreads"], times, slow_times, offset=(-10, -5), va="top")
             
         ax1.set_xlabel("Threads number")
         ax1.set_ylabel("Time (s)", color=ax1_color)
@@ -223,13 +295,9 @@ def plotStrongScaling(csv_filename = "../data/kip_openMP_strongScaling.csv",
             color=ax2_color,
             label="speedup"
         )
-        for i, x, y in zip(range(len(subgroup.index)), subgroup["NumThreads"], subgroup["SpeedUp"]):
-            if i > 0 and (y - subgroup["SpeedUp"][i-1]) < min_marginal_speedup:
-                color = "red"
-            else:
-                color = "black"
-            ax2.annotate(f"{y:.2f}", (x, y), xytext=(-10, 5), textcoords="offset points",
-                ha="center", va="bottom", fontsize=8, color=color)
+        speedups = subgroup["SpeedUp"].values
+        low_speedups = np.diff(speedups, prepend=-np.inf) < min_marginal_speedup
+        valueLabels(ax2, subgroup["NumThreads"], speedups, low_speedups, offset=(-10, 5), va="bottom")
         
         ax2.plot(p_range, lin_fit_speedup, "-.", color=ax2_color, alpha=0.4, 
                  label="theoretical speedup")
@@ -246,32 +314,63 @@ def plotStrongScaling(csv_filename = "../data/kip_openMP_strongScaling.csv",
             subgroup["NumThreads"],
             subgroup["SpeedUp"],
             c="palegoldenrod",
-            s= 150 + 500 * subgroup["Efficiency"].apply(lambda s: s),
+            s=150 + 500 * subgroup["Efficiency"].values,
             label="efficiency"
         )
         
         ax2_opposite = ax2.twiny()
-        xticks = list([round(item,2) for item in subgroup["Efficiency"]])    
         ax2_opposite.set_xlim(ax2.get_xlim())
-        ax2_opposite.set_xticks(list(subgroup["NumThreads"]))
-        ax2_opposite.set_xticklabels(xticks)
-        for label in ax2_opposite.get_xticklabels():
-            if float(label.get_text()) < min_efficiency:
-                label.set_color("red");
+        valueTicks(ax2_opposite, subgroup["NumThreads"], subgroup["Efficiency"],
+                   subgroup["Efficiency"].round(2) < min_efficiency)
         ax2_opposite.set_xlabel("Efficiency")
         ax2_opposite.grid(True, axis="x", linestyle="--", alpha=0.6)
         h2, l2 = ax2.get_legend_handles_labels()
     
     
-        plt.title(f"Strong Scaling: {image_dim} images | {kernel_dim}x{kernel_dim} kernels")
-        plt.legend(h1+h2, l1+l2, loc="best")
-        plt.tight_layout()
-        
-        filename = f"strong_scaling_{image_dim}_{kernel_dim}.png".replace("x", "x")
-        plt.savefig(filename, dpi=150)
-        print(f"\nImage saved at {os.path.realpath(filename)}")
-        plt.show()
-        plt.close()
+        ax2_opposite.set_title(f"Strong Scaling: {image_dim} images | {kernel_dim}x{kernel_dim} kernels{config_title}")
+        ax2_opposite.legend(h1+h2, l1+l2, loc="best")
+        fig.tight_layout()
+        
+        images.append(renderer.save(fig, f"strong_scaling_{image_dim}_{kernel_dim}{config_suffix}"))
+        
+        if cache is not None:
+            cache.put(cache_key, {
+                "f_est": float(f_est),
+                "slope": float(slope),
+                "phys_f_est": float(phys_f_est),
+                "phys_slope": float(phys_slope),
+                "f_ci": [float(v) for v in f_ci] if with_ci else None,
+                "phys_f_ci": [float(v) for v in phys_f_ci] if with_ci else None,
+                "f_p_table": f_p_df.to_dict(orient="list"),
+                "images": images,
+            })
+    
+    if cache is not None:
+        cache.save()
+    
+    if multiple_configs:
+        reportConfigurations(results, "strong", phys_cores, output_dir, show,
+                             renderer=renderer)
+    if own_renderer:
+        renderer.close()
+
+
+# Print the results of a group restored from the cache, in the same format
+# used by plotStrongScaling.
+#
+def printCachedStrongResults(image_dim, kernel_dim, phys_cores, confidence, cached, config_title = ""):
+    print(f"\nCouple ({image_dim}, kernel={kernel_dim}{config_title}) with thread > 1 (cached):")
+    print(f"  f evaluated = {cached['f_est']:.4f} (intersection), angular coeff={cached['slope']:.4f}")
+    if cached["f_ci"] is not None:
+        print(f"  {confidence:.0%} CI of f = [{cached['f_ci'][0]:.4f}, {cached['f_ci'][1]:.4f}]")
+    print(f"\nCouple ({image_dim}, kernel={kernel_dim}{config_title}) with 1 < thread < {phys_cores} (cached):")
+    print(f"  f evaluated = {cached['phys_f_est']:.4f} (intersection), angular coeff={cached['phys_slope']:.4f}")
+    if cached["phys_f_ci"] is not None:
+        print(f"  {confidence:.0%} CI of f = [{cached['phys_f_ci'][0]:.4f}, {cached['phys_f_ci'][1]:.4f}]")
+    print("\nTabella f_p (per singolo p):")
+    print(pd.DataFrame(cached["f_p_table"]).to_string(index=False, float_format="%.4f"))
+    for image in cached["images"]:
+        print(f"\nImage up to date at {image}")
 
 
 
@@ -280,7 +379,8 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         params["csv_filename"] = sys.argv[1]
     if len(sys.argv) > 2:
-        params["phys_cores"] = int(sys.argv[2])
+        # 0 means read from the host.json of the data
+        params["phys_cores"] = int(sys.argv[2]) or None
     if len(sys.argv) > 3:
         params["min_relative_time"] = float(sys.argv[3])
     if len(sys.argv) > 4:
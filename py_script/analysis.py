@@ -0,0 +1,273 @@
+import numpy as np
+import pandas as pd
+import sys
+
+from hostinfo import resolvePhysicalCores
+
+
+STRONG_GROUP = ["ImageDimension", "KernelDimension"]
+WEAK_GROUP = ["UnitOfWork", "KernelDimension"]
+
+# OpenMP runtime configuration of a run (see runtime::csvRecord). The csv
+# files written before these columns existed get the values used at that time.
+CONFIG_COLUMNS = ["ProcBind", "Places", "Schedule", "ChunkSize"]
+DEFAULT_CONFIG = {"ProcBind": "false", "Places": "unset", "Schedule": "dynamic", "ChunkSize": 1}
+
+# Groups are analysed separately for every configuration
+STRONG_KEYS = STRONG_GROUP + CONFIG_COLUMNS
+WEAK_KEYS = WEAK_GROUP + CONFIG_COLUMNS
+
+
+# Add the missing configuration columns with their default values and
+# normalize them (e.g. pandas reads a column of "false" as booleans).
+#
+def withConfiguration(df):
+    df = df.copy()
+    for column, default in DEFAULT_CONFIG.items():
+        if column not in df.columns:
+            df[column] = default
+        df[column] = df[column].fillna(default)
+    for column in ["ProcBind", "Places", "Schedule"]:
+        df[column] = df[column].astype(str).str.lower()
+    df["ChunkSize"] = df["ChunkSize"].astype(int)
+    return df
+
+
+# Short description of a configuration, e.g. "bind=close places=cores dynamic,1".
+#
+# config    values of CONFIG_COLUMNS (tuple, list or dict-like row).
+#
+def configurationLabel(config):
+    if hasattr(config, "keys"):
+        config = [config[column] for column in CONFIG_COLUMNS]
+    proc_bind, places, schedule, chunk_size = config
+    return f"bind={proc_bind} places={places} {schedule},{chunk_size}"
+
+
+# Same description usable in file names.
+def configurationSuffix(config):
+    label = configurationLabel(config).replace(" ", "_").replace(",", "-")
+    return "".join(c for c in label if c.isalnum() or c in "_-=")
+
+
+# Amdahl's law: S(p) = 1 / (f + (1-f)/p).
+# f and p can be scalars or broadcastable arrays.
+#
+def amdahlSpeedUp(f, p):
+    return 1 / (f + (1 - f) / p)
+
+
+# Number of megapixels of "WxH" dimensions (e.g. ImageDimension column).
+#
+def megapixels(dimensions):
+    sizes = pd.Series(dimensions).str.split("x", expand=True).astype(float)
+    return (sizes[0] * sizes[1] * 1e-6).values
+
+
+# Karp–Flatt metric: f(p) = (1/S(p) - 1/p) / (1 - 1/p), undefined (NaN) for p=1.
+#
+def karpFlatt(speedup, p):
+    speedup = np.asarray(speedup, dtype=float)
+    p = np.asarray(p, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f_p = (1 / speedup - 1 / p) / (1 - 1 / p)
+    return np.where(p > 1, f_p, np.nan)
+
+
+# Ordinary least squares y = intercept + slope * x for every group at once,
+# using the closed form on the per-group sums.
+#
+# df        frame containing the keys, x and y columns.
+# keys      list of columns identifying a group.
+#
+# Returns a frame indexed by keys with columns intercept, slope and n.
+#
+def linearFit(df, keys, x, y):
+    sums = (
+        df.assign(_x=df[x], _y=df[y], _xx=df[x] * df[x], _xy=df[x] * df[y])
+          .groupby(keys)
+          .agg(n=("_x", "size"), sx=("_x", "sum"), sy=("_y", "sum"),
+               sxx=("_xx", "sum"), sxy=("_xy", "sum"))
+    )
+    denominator = sums["n"] * sums["sxx"] - sums["sx"] ** 2
+    # a single point (or all points with the same x) does not define a line
+    slope = (sums["n"] * sums["sxy"] - sums["sx"] * sums["sy"]) / denominator.where(denominator != 0)
+    intercept = (sums["sy"] - slope * sums["sx"]) / sums["n"]
+    return pd.DataFrame({"intercept": intercept, "slope": slope, "n": sums["n"]})
+
+
+# Mean over the images of the same group, for every thread count, plus the
+# Karp–Flatt metric of the averaged speedup.
+#
+# df        raw strong scaling frame (as written by strong_scaling.cpp).
+#
+def strongScalingMetrics(df):
+    grouped = (
+        withConfiguration(df).groupby(STRONG_KEYS + ["NumThreads"])
+          .agg({"TimePerRep_s": "mean", "SpeedUp": "mean", "Efficiency": "mean"})
+          .reset_index()
+          .sort_values(STRONG_KEYS + ["NumThreads"], ignore_index=True)
+    )
+    grouped["KarpFlatt"] = karpFlatt(grouped["SpeedUp"], grouped["NumThreads"])
+    return grouped
+
+
+# Estimate the serial fraction f of every group by the linear fit
+# 1/S(p) = f + (1-f) * 1/p, using all runs with p > 1 and only those
+# running on physical cores (1 < p <= phys_cores).
+#
+# metrics       frame returned by strongScalingMetrics.
+# phys_cores    number of physical cores.
+#
+# Returns a frame with one row per group and columns f, slope, phys_f, phys_slope.
+#
+def fitSerialFraction(metrics, phys_cores):
+    multithread = metrics[metrics["NumThreads"] > 1].assign(
+        InvThreads=lambda d: 1 / d["NumThreads"],
+        InvSpeedUp=lambda d: 1 / d["SpeedUp"],
+    )
+    fit = linearFit(multithread, STRONG_KEYS, "InvThreads", "InvSpeedUp")
+    phys_fit = linearFit(multithread[multithread["NumThreads"] <= phys_cores],
+                         STRONG_KEYS, "InvThreads", "InvSpeedUp")
+    return (
+        pd.DataFrame({"f": fit["intercept"], "slope": fit["slope"]})
+          .join(pd.DataFrame({"phys_f": phys_fit["intercept"], "phys_slope": phys_fit["slope"]}))
+          .reset_index()
+    )
+
+
+# Full strong scaling analysis, without drawing anything.
+#
+# phys_cores    number of physical cores (None means detected on this host).
+#
+# Returns a tidy frame with one row per (ImageDimension, KernelDimension,
+# configuration, NumThreads) holding the averaged measures, the throughput,
+# the Karp–Flatt metric, the fitted serial fractions of the group and the
+# speedups they predict.
+#
+def analyseStrongScaling(df, phys_cores = None):
+    phys_cores = resolvePhysicalCores(phys_cores)
+    metrics = strongScalingMetrics(df)
+    metrics["Throughput_Mpix_s"] = megapixels(metrics["ImageDimension"]) / metrics["TimePerRep_s"]
+    results = metrics.merge(fitSerialFraction(metrics, phys_cores), on=STRONG_KEYS, how="left")
+    results["AmdahlSpeedUp"] = amdahlSpeedUp(results["f"], results["NumThreads"])
+    results["PhysAmdahlSpeedUp"] = amdahlSpeedUp(results["phys_f"], results["NumThreads"])
+    return results
+
+
+# Confidence intervals of the strong scaling estimates by bootstrap.
+#
+# For every group and thread count the per-image rows are resampled with
+# replacement (each (p, image) run is an independent measure), the mean
+# speedup is recomputed and both the serial fraction fits and the Karp–Flatt
+# metrics are evaluated on every resample at once as array operations.
+#
+# df                raw strong scaling frame (one row per image and thread count).
+# phys_cores        number of physical cores (None means detected on this host).
+# num_resamples     number of bootstrap resamples.
+# confidence        confidence level of the (percentile) intervals.
+# seed              seed of the random generator, for reproducible intervals.
+#
+# Returns a tidy frame with one row per (ImageDimension, KernelDimension,
+# configuration, NumThreads) and the bounds SpeedUp_lo/hi, KarpFlatt_lo/hi, f_lo/hi and
+# phys_f_lo/hi (the latter two repeated on every row of the group).
+#
+def bootstrapStrongScaling(df, phys_cores = None, num_resamples = 2000,
+                           confidence = 0.95, seed = None):
+    phys_cores = resolvePhysicalCores(phys_cores)
+    rng = np.random.default_rng(seed)
+    quantiles = [(1 - confidence) / 2, (1 + confidence) / 2]
+    
+    intervals = []
+    for keys, group in withConfiguration(df).groupby(STRONG_KEYS):
+        # (threads x images) matrix, missing runs (NaN) sorted last in every row
+        speedups = group.pivot_table(index="NumThreads", columns="ImageName",
+                                     values="SpeedUp", aggfunc="mean")
+        threads = speedups.index.values.astype(float)
+        values = np.sort(speedups.values, axis=1)
+        runs = np.sum(~np.isnan(values), axis=1)
+        
+        # resampled indices: (resamples x threads x runs)
+        draws = rng.random((num_resamples, len(threads), values.shape[1]))
+        idx = np.floor(draws * runs[np.newaxis, :, np.newaxis]).astype(int)
+        mask = np.arange(values.shape[1])[np.newaxis, :] < runs[:, np.newaxis]
+        resampled = np.take_along_axis(np.broadcast_to(values, idx.shape), idx, axis=2)
+        mean_speedups = np.sum(np.where(mask, resampled, 0), axis=2) / runs
+        
+        karp_flatt = karpFlatt(mean_speedups, threads)
+        
+        # vectorized least squares 1/S = f + slope * 1/p, one line per resample
+        def fitIntercepts(selected):
+            x = 1 / threads[selected]
+            y = 1 / mean_speedups[:, selected]
+            n = len(x)
+            if n < 2:
+                return np.full(num_resamples, np.nan)
+            slope = (n * (y @ x) - x.sum() * y.sum(axis=1)) / (n * (x @ x) - x.sum() ** 2)
+            return (y.sum(axis=1) - slope * x.sum()) / n
+        f = fitIntercepts(threads > 1)
+        phys_f = fitIntercepts((threads > 1) & (threads <= phys_cores))
+        
+        speedup_ci = np.quantile(mean_speedups, quantiles, axis=0)
+        karp_flatt_ci = np.full((2, len(threads)), np.nan)
+        karp_flatt_ci[:, threads > 1] = np.quantile(karp_flatt[:, threads > 1], quantiles, axis=0)
+        f_ci = np.quantile(f, quantiles)
+        phys_f_ci = np.quantile(phys_f, quantiles)
+        intervals.append(pd.DataFrame({
+            **dict(zip(STRONG_KEYS, keys)),
+            "NumThreads": speedups.index.values,
+            "SpeedUp_lo": speedup_ci[0],
+            "SpeedUp_hi": speedup_ci[1],
+            "KarpFlatt_lo": karp_flatt_ci[0],
+            "KarpFlatt_hi": karp_flatt_ci[1],
+            "f_lo": f_ci[0],
+            "f_hi": f_ci[1],
+            "phys_f_lo": phys_f_ci[0],
+            "phys_f_hi": phys_f_ci[1],
+        }))
+    return pd.concat(intervals, ignore_index=True)
+
+
+# Full weak scaling analysis, without drawing anything.
+#
+# df        raw weak scaling frame (as written by weak_scaling.cpp).
+#
+# Returns a tidy frame with one row per (UnitOfWork, KernelDimension,
+# configuration, NumThreads) holding the averaged measures and, relative to the sequential
+# run of the same group, the time ratio T(p)/T(1), the ideal throughput
+# p * P(1) and the relative throughput P(p) / (p * P(1)).
+#
+def analyseWeakScaling(df):
+    results = (
+        withConfiguration(df).groupby(WEAK_KEYS + ["NumThreads"])
+          .agg({
+              "TimePerRep_s": "mean",
+              "WeakEfficiency": "mean",
+              "ScaledSpeedUp": "mean",
+              "Throughput_Mpix_s": "mean"
+          })
+          .reset_index()
+          .sort_values(WEAK_KEYS + ["NumThreads"], ignore_index=True)
+    )
+    sequential = (
+        results[results["NumThreads"] == 1]
+          .set_index(WEAK_KEYS)[["TimePerRep_s", "Throughput_Mpix_s"]]
+          .rename(columns={"TimePerRep_s": "SequentialTime_s",
+                           "Throughput_Mpix_s": "SequentialThroughput_Mpix_s"})
+    )
+    results = results.join(sequential, on=WEAK_KEYS)
+    results["RelativeTime"] = results["TimePerRep_s"] / results["SequentialTime_s"]
+    results["IdealThroughput_Mpix_s"] = results["NumThreads"] * results["SequentialThroughput_Mpix_s"]
+    results["RelativeThroughput"] = results["Throughput_Mpix_s"] / results["IdealThroughput_Mpix_s"]
+    return results
+
+
+if __name__ == "__main__":
+    # Print the tidy results of a strong or weak scaling csv file
+    df = pd.read_csv(sys.argv[1])
+    if "SpeedUp" in df.columns:
+        phys_cores = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        results = analyseStrongScaling(df, phys_cores)
+    else:
+        results = analyseWeakScaling(df)
+    print(results.to_string(index=False, float_format="%.4f"))
@@ -0,0 +1,139 @@
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+
+from amdahl import plotStrongScaling
+from gustafson import plotWeakScaling
+from rendering import FigureRenderer, DASHBOARDS, MODES
+
+
+CSV_PATTERN = "kip_openMP_*Scaling_*.csv"
+
+
+# Find every scaling csv file inside the given directories (recursively).
+#
+# data_dirs     list of directories to explore, e.g. "../AoS/data/strong_scaling/#1".
+#
+def findScalingCsv(data_dirs):
+    csv_files = []
+    for data_dir in data_dirs:
+        # "#1" folders: escape glob special chars in the user part of the path
+        pattern = os.path.join(glob.escape(data_dir), "**", CSV_PATTERN)
+        csv_files.extend(glob.glob(pattern, recursive=True))
+    return sorted(set(os.path.realpath(f) for f in csv_files))
+
+
+# Worker initializer: figures are only saved, never shown.
+def useHeadlessBackend():
+    matplotlib.use("Agg")
+
+
+# Draw all the figures of a single csv file (strong or weak scaling is chosen
+# from the file name), saving them next to the csv file.
+#
+# mode              output mode of the figures (see rendering.MODES).
+# dashboard         None, "pdf" or "tiled": also write <csv name>_dashboard.pdf/png
+#                   with all the figures of the csv file.
+# dashboard_only    save only the dashboard, not the single figures.
+#
+def renderCsv(csv_filename, phys_cores, strong_params, weak_params, mode = "png",
+              dashboard = None, dashboard_only = False):
+    output_dir = os.path.dirname(csv_filename)
+    basename = os.path.basename(csv_filename)
+    if "strongScaling" in basename:
+        plot, params = plotStrongScaling, strong_params
+    elif "weakScaling" in basename:
+        plot, params = plotWeakScaling, weak_params
+    else:
+        raise ValueError(f"Unknown scaling kind for {csv_filename}")
+    dashboard_name = f"{os.path.splitext(basename)[0]}_dashboard"
+    with FigureRenderer(output_dir, mode, dashboard=dashboard, dashboard_name=dashboard_name,
+                        save_figures=not dashboard_only) as renderer:
+        plot(csv_filename, phys_cores, output_dir=output_dir, show=False,
+             renderer=renderer, **params)
+    return csv_filename
+
+
+# Render every scaling csv found in data_dirs on a pool of processes.
+#
+# data_dirs     list of directories containing the csv files.
+# phys_cores    number of physical cores of the machine where the data were measured
+#               (None means read from the host.json of the data, see
+#               hostinfo.dataPhysicalCores).
+# max_workers   number of processes (None means one per logical core).
+# strong_params extra thresholds for plotStrongScaling (min_relative_time, ...).
+# weak_params   extra thresholds for plotWeakScaling (min_efficiency, ...).
+# render_params output options of renderCsv (mode, dashboard, dashboard_only).
+#
+def renderAll(data_dirs, phys_cores = None, max_workers = None,
+              strong_params = None, weak_params = None, render_params = None):
+    csv_files = findScalingCsv(data_dirs)
+    if not csv_files:
+        print(f"No {CSV_PATTERN} found in {data_dirs}")
+        return []
+
+    strong_params = strong_params or {}
+    weak_params = weak_params or {}
+    render_params = render_params or {}
+    done, failed = [], []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=useHeadlessBackend) as executor:
+        futures = {
+            executor.submit(renderCsv, f, phys_cores, strong_params, weak_params, **render_params): f
+            for f in csv_files
+        }
+        for future in as_completed(futures):
+            try:
+                done.append(future.result())
+            except Exception as ex:
+                failed.append(futures[future])
+                print(f"\nFailed to render {futures[future]}: {ex}")
+
+    print(f"\nRendered {len(done)}/{len(csv_files)} csv files.")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render all amdahl/gustafson figures of one or more data directories.")
+    parser.add_argument("data_dirs", nargs="+",
+                        help="directories containing kip_openMP_*Scaling_*.csv files")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes (default: logical cores)")
+    parser.add_argument("--phys-cores", type=int, default=None,
+                        help="number of physical cores of the machine of the data "
+                             "(default: PhysicalCores of the host.json of every data directory)")
+    parser.add_argument("--min-relative-time", type=float, default=0.05)
+    parser.add_argument("--min-marginal-speedup", type=float, default=0.2)
+    parser.add_argument("--min-efficiency", type=float, default=0.7)
+    parser.add_argument("--max-relative-time", type=float, default=1.3)
+    parser.add_argument("--mode", choices=list(MODES), default="png",
+                        help="png, low dpi png preview, or vector (svg, pdf) figures")
+    parser.add_argument("--dashboard", choices=DASHBOARDS, default=None,
+                        help="also write one multi-page pdf or tiled png per csv file")
+    parser.add_argument("--dashboard-only", action="store_true",
+                        help="write only the dashboards (requires --dashboard)")
+    args = parser.parse_args()
+    if args.dashboard_only and args.dashboard is None:
+        parser.error("--dashboard-only requires --dashboard")
+
+    failed = renderAll(
+        args.data_dirs, args.phys_cores, args.jobs,
+        strong_params={
+            "min_relative_time": args.min_relative_time,
+            "min_marginal_speedup": args.min_marginal_speedup,
+            "min_efficiency": args.min_efficiency,
+        },
+        weak_params={
+            "min_efficiency": args.min_efficiency,
+            "max_relative_time": args.max_relative_time,
+        },
+        render_params={
+            "mode": args.mode,
+            "dashboard": args.dashboard,
+            "dashboard_only": args.dashboard_only,
+        },
+    )
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,304 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import matplotlib
+# headless: the rendered figures are only timed
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+
+from amdahl import plotStrongScaling
+from analysis import (analyseWeakScaling, bootstrapStrongScaling, fitSerialFraction,
+                      megapixels, strongScalingMetrics)
+from gustafson import plotWeakScaling
+from hostinfo import hostFingerprint, hostId, resolvePhysicalCores
+from models import fitModels
+from rendering import FigureRenderer, MODES
+
+
+# Bump it whenever the stages change meaning: results of different versions
+# are not comparable.
+BENCH_VERSION = 1
+DEFAULT_ROWS = [100, 1000, 10000, 100000, 1000000]
+# Modules imported by the scripts the executables shell out to, timed in a
+# fresh interpreter each ("" is the bare interpreter startup).
+IMPORTS = ["", "numpy", "pandas", "matplotlib.pyplot", "analysis", "amdahl", "gustafson"]
+IMAGE_DIMENSIONS = ["4000x2000", "5000x3000", "6000x4000", "7000x5000"]
+KERNEL_DIMENSIONS = [7, 13, 19, 25]
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+# Synthetic scaling results, as written by the executables, of about
+# num_rows rows: num_groups (ImageDimension, KernelDimension) groups, every
+# thread count from 1 to num_threads and as many images as needed.
+#
+# kind      "strong" (Amdahl times with f = 0.05) or "weak" (time growing
+#           slowly with the threads).
+#
+def syntheticResults(kind, num_rows, num_groups = 4, num_threads = 16, seed = 0):
+    groups = [(image_dim, kernel_dim) for image_dim in IMAGE_DIMENSIONS
+              for kernel_dim in KERNEL_DIMENSIONS][:num_groups]
+    num_images = max(1, -(-num_rows // (len(groups) * num_threads)))
+    group, threads, image = (axis.ravel() for axis in np.meshgrid(
+        np.arange(len(groups)), np.arange(1, num_threads + 1), np.arange(1, num_images + 1),
+        indexing="ij"))
+    rng = np.random.default_rng(seed)
+    image_dims = np.array([image_dim for image_dim, _ in groups])[group]
+    kernel_dims = np.array([kernel_dim for _, kernel_dim in groups])[group]
+    mpix = megapixels([image_dim for image_dim, _ in groups])[group]
+    sequential = mpix * kernel_dims ** 2 * 2e-3 * (1 + 0.05 * rng.random(len(group)))
+    noise = 1 + 0.02 * rng.standard_normal(len(group))
+    df = pd.DataFrame({
+        "ImageName": [f"{d[0]}K-{i}" for d, i in zip(image_dims, image)],
+        "ImageDimension": image_dims,
+        "KernelName": "boxBlur",
+        "KernelDimension": kernel_dims,
+    })
+    if kind == "strong":
+        time_per_rep = sequential * (0.05 + 0.95 / threads) * noise
+        # the sequential run of every image is the reference of its speedups
+        sequential_time = time_per_rep[(threads == 1)][group * num_images + image - 1]
+        df["TimePerRep_s"] = time_per_rep
+        df["NumThreads"] = threads
+        df["SpeedUp"] = sequential_time / time_per_rep
+        df["Efficiency"] = df["SpeedUp"] / threads
+    else:
+        time_per_rep = sequential * (1 + 0.004 * threads) * noise
+        sequential_time = time_per_rep[(threads == 1)][group * num_images + image - 1]
+        df["TimePerRep_s"] = time_per_rep
+        df["NumThreads"] = threads
+        df["UnitOfWork"] = image_dims
+        df["WeakEfficiency"] = sequential_time / time_per_rep
+        df["ScaledSpeedUp"] = df["WeakEfficiency"] * threads
+        df["Throughput_Mpix_s"] = threads * mpix / time_per_rep
+    return df
+
+
+# Wall time (best of repeats) and peak traced memory of stage(); the memory
+# is measured on one more run, under tracemalloc, which would slow down the
+# timed ones.
+#
+# Returns (seconds, peak bytes).
+#
+def measure(stage, repeats = 3):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        stage()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        stage()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+# Wall time (best of repeats) and peak traced memory of importing module in a
+# fresh interpreter started from the scripts directory (module "" times the
+# bare interpreter startup, i.e. the python -c pass of the executables).
+#
+def measureImport(module, repeats = 3):
+    statement = f"import {module}" if module else "pass"
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=SCRIPT_DIR, check=True)
+        times.append(time.perf_counter() - start)
+    probe = f"import tracemalloc\n{statement}\nprint(tracemalloc.get_traced_memory()[1])"
+    output = subprocess.run([sys.executable, "-X", "tracemalloc", "-c", probe], cwd=SCRIPT_DIR,
+                            check=True, capture_output=True, text=True).stdout
+    return min(times), int(output.split()[-1])
+
+
+# Stages of the analysis of a kind, as (name, callable) given the csv file of
+# the synthetic rows and the directory of the rendered figures: csv load,
+# grouping (averages per thread count), fitting (the serial fractions of
+# the strong groups, the Gustafson and USL models of the weak ones) and
+# rendering (which repeats the analysis it needs, without the bootstrap).
+#
+def _stages(kind, csv_filename, output_dir, phys_cores, num_resamples, mode):
+    df = pd.read_csv(csv_filename)
+
+    def render():
+        with FigureRenderer(output_dir, mode) as renderer, contextlib.redirect_stdout(io.StringIO()):
+            if kind == "strong":
+                plotStrongScaling(csv_filename, phys_cores, output_dir=output_dir, show=False,
+                                  use_cache=False, num_resamples=0, df=df, renderer=renderer)
+            else:
+                plotWeakScaling(csv_filename, phys_cores, output_dir=output_dir, show=False,
+                                use_cache=False, df=df, renderer=renderer)
+
+    stages = [("load", lambda: pd.read_csv(csv_filename))]
+    if kind == "strong":
+        metrics = strongScalingMetrics(df)
+        stages += [
+            ("group", lambda: strongScalingMetrics(df)),
+            ("fit", lambda: fitSerialFraction(metrics, phys_cores)),
+            ("bootstrap", lambda: bootstrapStrongScaling(df, phys_cores, num_resamples, seed=0)),
+        ]
+    else:
+        results = analyseWeakScaling(df)
+        stages += [
+            ("group", lambda: analyseWeakScaling(df)),
+            ("fit", lambda: fitModels(results, "weak")),
+        ]
+    return stages + [("render", render)]
+
+
+# Time every stage of the analysis pipeline.
+#
+# rows_list         approximate sizes of the synthetic datasets.
+# kinds             scaling kinds to benchmark ("strong", "weak").
+# num_groups        (ImageDimension, KernelDimension) groups of the datasets.
+# num_threads       thread counts of the datasets (every p from 1).
+# repeats           timed runs of every stage (the best one is kept).
+# num_resamples     bootstrap resamples of the strong scaling stage.
+# mode              rendering mode of the figures (see rendering.MODES).
+# render_max_rows   largest dataset rendered (the figures do not grow with
+#                   the rows, only the analysis they repeat does).
+# phys_cores        number of physical cores of the fits (None means detected
+#                   on this host).
+#
+# Returns a frame with one row per (Kind, Stage, Rows) and columns Groups,
+# Threads, Time_s and Peak_MiB (rows of the "startup" kind time the imports).
+#
+def runBenchmark(rows_list = DEFAULT_ROWS, kinds = ("strong", "weak"), num_groups = 4,
+                 num_threads = 16, repeats = 3, num_resamples = 200, mode = "png",
+                 render_max_rows = None, phys_cores = None):
+    phys_cores = resolvePhysicalCores(phys_cores)
+    results = []
+
+    def record(kind, stage, num_rows, seconds, peak):
+        results.append({"Kind": kind, "Stage": stage, "Rows": num_rows, "Groups": num_groups,
+                        "Threads": num_threads, "Time_s": seconds, "Peak_MiB": peak / 2 ** 20})
+        print(f"[bench] {kind:7s} {stage:22s} {num_rows:>8d} rows: "
+              f"{seconds:9.4f} s, peak {peak / 2 ** 20:9.2f} MiB")
+
+    for module in IMPORTS:
+        record("startup", f"import {module}" if module else "interpreter", 0,
+               *measureImport(module, repeats))
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for kind in kinds:
+            for num_rows in rows_list:
+                df = syntheticResults(kind, num_rows, num_groups, num_threads)
+                csv_filename = os.path.join(work_dir, f"kip_openMP_{kind}Scaling_{num_rows}.csv")
+                df.to_csv(csv_filename, index=False)
+                for stage, run in _stages(kind, csv_filename, work_dir, phys_cores, num_resamples, mode):
+                    if stage == "render" and render_max_rows is not None and num_rows > render_max_rows:
+                        continue
+                    record(kind, stage, len(df), *measure(run, repeats))
+    return pd.DataFrame(results)
+
+
+# Description of the environment of a benchmark, saved with its results.
+def benchmarkMetadata(**params):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=SCRIPT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "version": BENCH_VERSION,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "packages": {"numpy": np.__version__, "pandas": pd.__version__,
+                     "matplotlib": matplotlib.__version__},
+        "host": hostFingerprint(probe_bandwidth=False),
+        "params": params,
+    }
+
+
+# Save the results as json (with the metadata) and as csv, with the same
+# name and the .csv extension.
+#
+def saveBenchmark(results, metadata, filename):
+    with open(filename, "w") as bench_file:
+        json.dump({"metadata": metadata, "results": results.to_dict(orient="records")},
+                  bench_file, indent=2)
+    print(f"\nTable saved at {os.path.realpath(filename)}")
+    csv_filename = os.path.splitext(filename)[0] + ".csv"
+    results.to_csv(csv_filename, index=False)
+    print(f"\nTable saved at {os.path.realpath(csv_filename)}")
+
+
+# Returns (metadata, results) of a json saved by saveBenchmark.
+def loadBenchmark(filename):
+    with open(filename) as bench_file:
+        content = json.load(bench_file)
+    return content["metadata"], pd.DataFrame(content["results"])
+
+
+# Per stage comparison of two benchmarks: TimeRatio and PeakRatio are new /
+# baseline, and a stage is a Regression when its time grew by more than
+# threshold (as fraction).
+#
+def compareBenchmarks(baseline_filename, new_filename, threshold = 0.1):
+    baseline_metadata, baseline = loadBenchmark(baseline_filename)
+    new_metadata, new = loadBenchmark(new_filename)
+    if baseline_metadata["version"] != new_metadata["version"]:
+        raise ValueError(f"Benchmark versions differ ({baseline_metadata['version']} and "
+                         f"{new_metadata['version']}): the stages are not comparable.")
+    # recomputed: the HostId of older benchmarks also hashed the hostname
+    if hostId(baseline_metadata["host"]) != hostId(new_metadata["host"]):
+        print("Warning: the benchmarks were run on different hardware.")
+    keys = ["Kind", "Stage", "Rows"]
+    report = baseline[keys + ["Time_s", "Peak_MiB"]].merge(
+        new[keys + ["Time_s", "Peak_MiB"]], on=keys, suffixes=("_base", "_new"))
+    report["TimeRatio"] = report["Time_s_new"] / report["Time_s_base"]
+    report["PeakRatio"] = report["Peak_MiB_new"] / report["Peak_MiB_base"]
+    report["Regression"] = report["TimeRatio"] > 1 + threshold
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time the stages of the Python analysis pipeline on synthetic datasets.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmark")
+    run_parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    run_parser.add_argument("--kinds", nargs="+", choices=["strong", "weak"], default=["strong", "weak"])
+    run_parser.add_argument("--groups", type=int, default=4,
+                            help=f"groups per dataset (at most {len(IMAGE_DIMENSIONS) * len(KERNEL_DIMENSIONS)})")
+    run_parser.add_argument("--threads", type=int, default=16, help="thread counts per group (1..N)")
+    run_parser.add_argument("--repeats", type=int, default=3)
+    run_parser.add_argument("--num-resamples", type=int, default=200)
+    run_parser.add_argument("--mode", choices=list(MODES), default="png")
+    run_parser.add_argument("--render-max-rows", type=int, default=None,
+                            help="skip the rendering of larger datasets")
+    run_parser.add_argument("-o", "--output", default="bench_results.json")
+
+    compare_parser = commands.add_parser("compare", help="compare two saved benchmarks")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        params = {"rows": args.rows, "kinds": args.kinds, "groups": args.groups,
+                  "threads": args.threads, "repeats": args.repeats,
+                  "num_resamples": args.num_resamples, "mode": args.mode,
+                  "render_max_rows": args.render_max_rows}
+        results = runBenchmark(args.rows, args.kinds, args.groups, args.threads, args.repeats,
+                               args.num_resamples, args.mode, args.render_max_rows)
+        saveBenchmark(results, benchmarkMetadata(**params), args.output)
+    else:
+        report = compareBenchmarks(args.baseline, args.new, args.threshold)
+        print(report.to_string(index=False, float_format="%.4f"))
+        regressions = report[report["Regression"]]
+        if not regressions.empty:
+            print(f"\n{len(regressions)} stages slower by more than {args.threshold:.0%}.")
+        raise SystemExit(1 if not regressions.empty else 0)
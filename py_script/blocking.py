@@ -0,0 +1,316 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from analysis import analyseStrongScaling, CONFIG_COLUMNS, STRONG_KEYS
+from batch import findScalingCsv
+from hostinfo import cacheSizes, loadHostFingerprint, resolvePhysicalCores
+from roofline import CHANNEL_BYTES, RGB_CHANNELS, WEIGHT_BYTES
+
+
+CACHE_LINE_BYTES = 64
+# Fraction of a cache a working set can use before it is considered spilled
+# (associativity conflicts, the output rows and the other data).
+CACHE_USABLE_FRACTION = 0.5
+LEVELS = ["L1d", "L2", "L3"]
+# Level of a working set larger than every cache
+MEMORY_LEVEL = "DRAM"
+# Suggested tile widths are multiples of it (in pixels), when larger.
+TILE_WIDTH_ALIGNMENT = 16
+
+
+### Working set model ###
+#
+# ImageProcessing::convolution computes an output row (y) at a time, every
+# output pixel reading the order x order window of the extended input below
+# it. The runtime schedule gives every thread chunks of tile_rows
+# consecutive output rows (collapse(2) would give it tile_rows = 1 row of
+# tile_width pixels). Inside a chunk:
+#   - the window of an output pixel (and the weights) is reused by the next
+#     pixel of the row (order - 1 of its columns);
+#   - the row set, the order input rows under an output row, is reused by the
+#     next output row of the chunk (order - 1 of its rows) if it is still in
+#     cache: this is the reuse lost when the row set spills;
+#   - the tile, all the input rows of the chunk and its output rows.
+# Both layouts hold 3 bytes per pixel, but a SoA row segment is 3 planes,
+# each rounded to whole cache lines.
+
+
+# Bytes of cache lines touched by a row segment of pixels.
+def rowFootprint(pixels, layout = "AoS"):
+    pixels = np.asarray(pixels, dtype=float)
+    if layout == "AoS":
+        return np.ceil(pixels * RGB_CHANNELS * CHANNEL_BYTES / CACHE_LINE_BYTES) * CACHE_LINE_BYTES
+    if layout == "SoA":
+        return RGB_CHANNELS * np.ceil(pixels * CHANNEL_BYTES / CACHE_LINE_BYTES) * CACHE_LINE_BYTES
+    raise ValueError(f"Unknown layout {layout}: expected AoS or SoA")
+
+
+# Cache bytes available to every thread: the private caches (L1d, L2) of a
+# core are shared by the threads running on it, L3 by all the threads.
+#
+# caches        {"L1d": bytes, "L2": bytes, "L3": bytes} (see hostinfo.cacheSizes).
+#
+def perThreadCaches(caches, threads, phys_cores):
+    threads = np.asarray(threads, dtype=float)
+    threads_per_core = np.ceil(threads / phys_cores)
+    return {level: (caches[level] / (threads if level == "L3" else threads_per_core))
+            for level in LEVELS if level in caches}
+
+
+# Smallest cache level holding working sets of the given bytes.
+def cacheLevel(bytes_needed, thread_caches):
+    bytes_needed = np.asarray(bytes_needed, dtype=float)
+    levels = [level for level in LEVELS if level in thread_caches]
+    if not levels:
+        return np.full(bytes_needed.shape, MEMORY_LEVEL)
+    conditions = [bytes_needed <= CACHE_USABLE_FRACTION * thread_caches[level] for level in levels]
+    return np.select(conditions, levels, default=MEMORY_LEVEL)
+
+
+# Working sets of a thread convolving an image of the given (output) width
+# with an order x order kernel, and the input traffic they imply.
+# Every argument can be an array (broadcast together).
+#
+# tile_rows     output rows of a chunk of a thread.
+# tile_width    output pixels of a tile row (None means the whole width).
+# caches        cache sizes (None means detected on this host).
+# phys_cores    physical cores (None means detected on this host).
+#
+# Returns a frame with the bytes of the window (WindowBytes), of the row set
+# (RowSetBytes) and of the tile (TileBytes), the cache level of the last two,
+# the input bytes loaded beyond that level per output pixel
+# (InputBytesPerPixel) and the Reuse of every loaded byte (kernel taps served
+# per byte loaded, order² when every input pixel is loaded once).
+#
+def workingSet(width, order, layout = "AoS", threads = 1, tile_rows = 1, tile_width = None,
+               caches = None, phys_cores = None):
+    caches = cacheSizes() if caches is None else caches
+    phys_cores = resolvePhysicalCores(phys_cores)
+    tile_width = width if tile_width is None else tile_width
+    width, order, threads, tile_rows, tile_width = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(value, dtype=float))
+          for value in (width, order, threads, tile_rows, tile_width)))
+    tile_width = np.minimum(tile_width, width)
+    thread_caches = perThreadCaches(caches, threads, phys_cores)
+
+    input_width = tile_width + order - 1
+    weights = order ** 2 * WEIGHT_BYTES
+    window = order * rowFootprint(order, layout) + weights
+    row_set = order * rowFootprint(input_width, layout) + weights
+    tile = ((tile_rows + order - 1) * rowFootprint(input_width, layout)
+            + tile_rows * rowFootprint(tile_width, layout) + weights)
+    row_set_level = cacheLevel(row_set, thread_caches)
+
+    pixel_bytes = RGB_CHANNELS * CHANNEL_BYTES
+    horizontal = input_width / tile_width
+    # a cached row set loads every input row of the chunk once, a spilled one
+    # loads the order rows under every output row
+    input_rows = np.where(row_set_level != MEMORY_LEVEL, (tile_rows + order - 1) / tile_rows, order)
+    input_bytes = pixel_bytes * horizontal * input_rows
+    return pd.DataFrame({
+        "WindowBytes": window,
+        "RowSetBytes": row_set,
+        "TileBytes": tile,
+        "RowSetLevel": row_set_level,
+        "TileLevel": cacheLevel(tile, thread_caches),
+        "InputBytesPerPixel": input_bytes,
+        "Reuse": order ** 2 * pixel_bytes / input_bytes,
+    })
+
+
+# Tile sizes keeping the tile of a thread in every private cache level: the
+# rows of a chunk are the kernel order (every input row is then loaded at
+# most twice as in the ideal, untiled reuse), halved until a tile fits, and
+# the tile is the widest one fitting (a multiple of TILE_WIDTH_ALIGNMENT
+# pixels, or the whole image width).
+#
+# Returns a frame with one row per level (Level, TileWidth, TileRows and the
+# workingSet columns of that tile); levels too small for a tile of a single
+# row and TILE_WIDTH_ALIGNMENT pixels are left out.
+#
+def suggestTiles(width, order, layout = "AoS", threads = 1, caches = None, phys_cores = None):
+    caches = cacheSizes() if caches is None else caches
+    phys_cores = resolvePhysicalCores(phys_cores)
+    thread_caches = perThreadCaches(caches, threads, phys_cores)
+    widths = np.append(np.arange(TILE_WIDTH_ALIGNMENT, width, TILE_WIDTH_ALIGNMENT), width)
+    rows = []
+    for level in ("L1d", "L2"):
+        if level not in thread_caches:
+            continue
+        budget = CACHE_USABLE_FRACTION * float(thread_caches[level])
+        tile_rows = order
+        while True:
+            tiles = workingSet(width, order, layout, threads, tile_rows, widths, caches, phys_cores)
+            fitting = np.flatnonzero(tiles["TileBytes"].values <= budget)
+            if len(fitting) or tile_rows == 1:
+                break
+            tile_rows = max(1, tile_rows // 2)
+        if not len(fitting):
+            continue
+        best = fitting[-1]
+        row = {"Level": level, "TileWidth": int(widths[best]), "TileRows": int(tile_rows)}
+        row.update(tiles.iloc[best].to_dict())
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+### Measured data ###
+
+# Rows of the chunk of a thread under the schedule of a run: ChunkSize rows,
+# or an even share of the rows for static/guided without a chunk size (the
+# first, largest, chunk of guided).
+#
+def chunkRows(schedule, chunk_size, height, threads):
+    schedule = np.asarray(schedule).astype(str)
+    chunk_size = np.asarray(chunk_size, dtype=float)
+    share = np.ceil(np.asarray(height, dtype=float) / np.asarray(threads, dtype=float))
+    even = np.isin(schedule, ["static", "guided"]) & (chunk_size <= 0)
+    return np.where(even, share, np.maximum(chunk_size, 1))
+
+
+# Working set of every (group, configuration, thread count) of strong scaling
+# results, with the efficiency drops that happen when it spills.
+#
+# df                raw strong scaling rows.
+# layout            layout of the rows without a Layout column.
+# efficiency_drop   efficiency loss from the previous thread count flagged
+#                   when the row set moves to a slower level.
+#
+# Returns the analysed rows (see analyseStrongScaling) with Layout, TileRows,
+# the workingSet columns, Spilled (the row set level is slower than at the
+# previous thread count), EfficiencyDrop and Flagged.
+#
+def crossReference(df, caches = None, phys_cores = None, layout = "AoS", efficiency_drop = 0.05):
+    caches = cacheSizes() if caches is None else caches
+    phys_cores = resolvePhysicalCores(phys_cores)
+    if "Layout" not in df.columns:
+        df = df.assign(Layout=layout)
+    frames = []
+    for data_layout, data in df.groupby("Layout"):
+        results = analyseStrongScaling(data, phys_cores)
+        results.insert(0, "Layout", data_layout)
+        frames.append(results)
+    results = pd.concat(frames, ignore_index=True)
+
+    sizes = results["ImageDimension"].str.split("x", expand=True).astype(float)
+    results["TileRows"] = chunkRows(results["Schedule"], results["ChunkSize"], sizes[1],
+                                    results["NumThreads"])
+    working_sets = []
+    for data_layout, data in results.groupby("Layout", sort=False):
+        data_sizes = sizes.loc[data.index]
+        working_sets.append(workingSet(data_sizes[0].values, data["KernelDimension"].values,
+                                       data_layout, data["NumThreads"].values,
+                                       data["TileRows"].values, None, caches, phys_cores)
+                            .set_index(data.index))
+    results = results.join(pd.concat(working_sets))
+
+    keys = ["Layout"] + STRONG_KEYS
+    results = results.sort_values(keys + ["NumThreads"], ignore_index=True)
+    ranks = {level: i for i, level in enumerate(LEVELS + [MEMORY_LEVEL])}
+    level_rank = results["RowSetLevel"].map(ranks)
+    grouped = results.assign(LevelRank=level_rank).groupby(keys, sort=False)
+    results["Spilled"] = level_rank > grouped["LevelRank"].shift()
+    results["EfficiencyDrop"] = -grouped["Efficiency"].diff()
+    results["Flagged"] = results["Spilled"] & (results["EfficiencyDrop"] > efficiency_drop)
+    return results
+
+
+# Strong scaling rows of csv files and directories, with their layout when
+# a path component names it (e.g. ../SoA/data/...).
+def loadStrongScaling(sources):
+    files = [path for path in sources if os.path.isfile(path)]
+    files += findScalingCsv([path for path in sources if os.path.isdir(path)])
+    frames = []
+    for csv_filename in files:
+        frame = pd.read_csv(csv_filename)
+        if "SpeedUp" not in frame.columns:
+            continue
+        if "Layout" not in frame.columns:
+            parts = os.path.realpath(csv_filename).split(os.sep)
+            layout = next((part for part in reversed(parts) if part in ("AoS", "SoA")), None)
+            if layout is not None:
+                frame["Layout"] = layout
+        frames.append(frame)
+    if not frames:
+        raise ValueError(f"No strong scaling results in {sources}")
+    return pd.concat(frames, ignore_index=True)
+
+
+# Cache sizes of a host.json (see hostinfo.py), of this host when None.
+def hostCaches(host_filename = None):
+    if host_filename is None:
+        return cacheSizes()
+    host = loadHostFingerprint(host_filename)
+    return {level: host[f"{level}_bytes"] for level in LEVELS if f"{level}_bytes" in host}
+
+
+def _formatBytes(size):
+    for unit in ["B", "KiB", "MiB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Working set of the convolution per thread against the caches, and blocking sizes.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    whatif_parser = commands.add_parser("whatif", help="working set of a configuration and suggested tiles")
+    whatif_parser.add_argument("--width", type=int, required=True, help="image width (pixels)")
+    whatif_parser.add_argument("--order", type=int, required=True, help="kernel order")
+    whatif_parser.add_argument("--layout", choices=["AoS", "SoA"], default="AoS")
+    whatif_parser.add_argument("--threads", type=int, default=1)
+    whatif_parser.add_argument("--tile-rows", type=int, default=1, help="output rows of a chunk")
+    whatif_parser.add_argument("--tile-width", type=int, default=None,
+                               help="output pixels of a tile row (default: the whole width)")
+
+    check_parser = commands.add_parser("check", help="flag efficiency drops where the working set spills")
+    check_parser.add_argument("sources", nargs="+", help="strong scaling csv files or directories")
+    check_parser.add_argument("--layout", choices=["AoS", "SoA"], default="AoS",
+                              help="layout of the rows whose path does not name it")
+    check_parser.add_argument("--efficiency-drop", type=float, default=0.05)
+    check_parser.add_argument("-o", "--output-dir", default=".")
+
+    for sub_parser in (whatif_parser, check_parser):
+        sub_parser.add_argument("--host", default=None,
+                                help="host.json of the machine (default: caches of this host)")
+        sub_parser.add_argument("--phys-cores", type=int, default=None)
+    args = parser.parse_args()
+
+    caches = hostCaches(args.host)
+    if args.host is not None and args.phys_cores is None:
+        args.phys_cores = loadHostFingerprint(args.host).get("PhysicalCores")
+    if caches:
+        print("Caches: " + ", ".join(f"{level} {_formatBytes(size)}" for level, size in caches.items()))
+    else:
+        print("Caches: unknown (every working set is counted in DRAM)")
+
+    if args.command == "whatif":
+        working_set = workingSet(args.width, args.order, args.layout, args.threads, args.tile_rows,
+                                 args.tile_width, caches, args.phys_cores).iloc[0]
+        for name in ["WindowBytes", "RowSetBytes", "TileBytes"]:
+            level = working_set.get(name.replace("Bytes", "Level"), "")
+            print(f"  {name:20s} {_formatBytes(working_set[name]):>10s}  {level}")
+        print(f"  InputBytesPerPixel   {working_set['InputBytesPerPixel']:10.2f}")
+        print(f"  Reuse                {working_set['Reuse']:10.2f} (at most {args.order ** 2})")
+        tiles = suggestTiles(args.width, args.order, args.layout, args.threads, caches, args.phys_cores)
+        print("\nSuggested tiles:")
+        print(tiles.to_string(index=False, float_format="%.2f") if not tiles.empty else "  none")
+    else:
+        results = crossReference(loadStrongScaling(args.sources), caches, args.phys_cores,
+                                 args.layout, args.efficiency_drop)
+        columns = (["Layout"] + STRONG_KEYS + ["NumThreads", "Efficiency", "TileRows",
+                                               "RowSetBytes", "RowSetLevel", "TileLevel",
+                                               "Reuse", "EfficiencyDrop"])
+        flagged = results[results["Flagged"]]
+        print(f"\n{len(flagged)} efficiency drops where the row set spills:")
+        if not flagged.empty:
+            print(flagged[columns].drop(columns=CONFIG_COLUMNS).to_string(index=False, float_format="%.4f"))
+        filename = os.path.join(args.output_dir, "blocking_check.csv")
+        results.to_csv(filename, index=False)
+        print(f"\nTable saved at {os.path.realpath(filename)}")
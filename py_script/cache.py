@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+
+
+# Bump it whenever the cached results change meaning (e.g. a new fit).
+CACHE_VERSION = 2
+
+
+# Content-addressed cache of the per-group results of a scaling csv file.
+#
+# Every (ImageDimension, KernelDimension) group is identified by the hash of
+# its raw csv rows and of the thresholds used to draw it, so a group is fitted
+# and rendered again only when its rows or the thresholds change.
+# Entries whose images have been deleted are considered missing, and entries
+# not requested during the last run are evicted on save().
+#
+# cache_filename    path of the json file backing the cache.
+#
+class ResultCache:
+    def __init__(self, cache_filename):
+        self.cache_filename = cache_filename
+        self.entries = {}
+        self.used_keys = set()
+        if os.path.exists(cache_filename):
+            try:
+                with open(cache_filename) as cache_file:
+                    content = json.load(cache_file)
+                if content.get("version") == CACHE_VERSION:
+                    self.entries = content.get("entries", {})
+            except (OSError, ValueError):
+                # corrupted cache: start from scratch
+                self.entries = {}
+
+    # Default cache file of a csv: a hidden json next to the images.
+    @staticmethod
+    def forCsv(csv_filename, output_dir):
+        name = os.path.splitext(os.path.basename(csv_filename))[0]
+        return ResultCache(os.path.join(output_dir, f".{name}.cache.json"))
+
+    # rows      raw (not averaged) csv rows of the group.
+    # params    dict of the thresholds affecting results and images.
+    @staticmethod
+    def key(rows, params):
+        digest = hashlib.sha256()
+        digest.update(str(CACHE_VERSION).encode())
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        sorted_rows = rows.sort_values(list(rows.columns)).reset_index(drop=True)
+        digest.update(sorted_rows.to_csv(index=False).encode())
+        return digest.hexdigest()
+
+    # Return the stored results of key, or None if missing or if any of its
+    # images does not exist anymore.
+    def get(self, key):
+        self.used_keys.add(key)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if not all(os.path.exists(image) for image in entry.get("images", [])):
+            return None
+        return entry
+
+    def put(self, key, entry):
+        self.used_keys.add(key)
+        self.entries[key] = entry
+
+    # Evict the stale entries and write the cache file.
+    def save(self):
+        self.entries = {k: v for k, v in self.entries.items() if k in self.used_keys}
+        tmp_filename = self.cache_filename + ".tmp"
+        with open(tmp_filename, "w") as cache_file:
+            json.dump({"version": CACHE_VERSION, "entries": self.entries}, cache_file, indent=1)
+        os.replace(tmp_filename, self.cache_filename)
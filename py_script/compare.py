@@ -0,0 +1,160 @@
+import pandas as pd
+import matplotlib.pyplot as plt
+import sys
+import os
+
+from analysis import (analyseStrongScaling, analyseWeakScaling, configurationLabel,
+                      CONFIG_COLUMNS, STRONG_GROUP, WEAK_GROUP)
+from batch import findScalingCsv
+from hostinfo import resolvePhysicalCores
+
+
+LAYOUTS = ["AoS", "SoA"]
+LAYOUT_STYLES = {
+    "AoS": {"color": "#1f77b4", "marker": "o", "linestyle": "-"},
+    "SoA": {"color": "darkorange", "marker": "s", "linestyle": "--"},
+}
+
+# (column, axis label) of every panel of the comparison figures
+STRONG_PANELS = [
+    ("TimePerRep_s", "Time (s)"),
+    ("SpeedUp", "SpeedUp"),
+    ("Efficiency", "Efficiency"),
+    ("Throughput_Mpix_s", "Throughput (Mpix/s)"),
+]
+WEAK_PANELS = [
+    ("TimePerRep_s", "Time (s)"),
+    ("ScaledSpeedUp", "Scaled Speedup"),
+    ("WeakEfficiency", "Weak Efficiency"),
+    ("Throughput_Mpix_s", "Throughput (Mpix/s)"),
+]
+
+
+# Load the csv files of a scaling kind ("strong" or "weak") of both layouts
+# and analyse them, tagging every row with its layout.
+#
+# layout_dirs   dict layout -> data directory (e.g. "../AoS/data").
+#
+def loadLayouts(layout_dirs, kind, phys_cores = None):
+    results = []
+    for layout, data_dir in layout_dirs.items():
+        csv_files = [f for f in findScalingCsv([data_dir])
+                     if f"{kind}Scaling" in os.path.basename(f)]
+        if not csv_files:
+            continue
+        df = pd.concat([pd.read_csv(f) for f in csv_files], ignore_index=True)
+        if kind == "strong":
+            analysed = analyseStrongScaling(df, phys_cores)
+        else:
+            analysed = analyseWeakScaling(df)
+        analysed.insert(0, "Layout", layout)
+        results.append(analysed)
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+
+# Per-thread-count ratio table of the groups measured with both layouts
+# under the same OpenMP configuration.
+# Ratios are AoS / SoA: a time ratio > 1 (throughput ratio < 1) means SoA is faster.
+#
+def layoutRatios(results, group):
+    keys = group + CONFIG_COLUMNS + ["NumThreads"]
+    pivot = results.pivot_table(index=keys, columns="Layout",
+                                values=["TimePerRep_s", "Throughput_Mpix_s"])
+    pivot = pivot.dropna()
+    table = pd.DataFrame({
+        "AoS_Time_s": pivot[("TimePerRep_s", "AoS")],
+        "SoA_Time_s": pivot[("TimePerRep_s", "SoA")],
+        "TimeRatio": pivot[("TimePerRep_s", "AoS")] / pivot[("TimePerRep_s", "SoA")],
+        "ThroughputRatio": pivot[("Throughput_Mpix_s", "AoS")] / pivot[("Throughput_Mpix_s", "SoA")],
+    })
+    table["Faster"] = table["TimeRatio"].map(lambda r: "SoA" if r > 1 else "AoS")
+    return table.reset_index()
+
+
+# Overlay the metrics of both layouts for every (image, kernel) group and
+# save the ratio table.
+#
+# layout_dirs   dict layout -> data directory containing the csv files.
+# kind          "strong" or "weak".
+# phys_cores    number of physical cores (threads zone and f estimation,
+#               None means detected on this host).
+# output_dir    directory where images and tables are saved.
+# show          whether to open every figure in a blocking window.
+#
+def plotLayoutComparison(layout_dirs, kind = "strong", phys_cores = None,
+                         output_dir = ".", show = True):
+    phys_cores = resolvePhysicalCores(phys_cores)
+    results = loadLayouts(layout_dirs, kind, phys_cores)
+    if results.empty:
+        print(f"No {kind} scaling data found in {layout_dirs}")
+        return None
+    if results["Layout"].nunique() < 2:
+        print(f"Only {results['Layout'].iloc[0]} {kind} scaling data found in {layout_dirs}")
+        return None
+    group = STRONG_GROUP if kind == "strong" else WEAK_GROUP
+    panels = STRONG_PANELS if kind == "strong" else WEAK_PANELS
+    multiple_configs = len(results[CONFIG_COLUMNS].drop_duplicates()) > 1
+
+    for (group_dim, kernel_dim), subgroup in results.groupby(group):
+        if subgroup["Layout"].nunique() < 2:
+            # nothing to compare
+            continue
+
+        fig, axes = plt.subplots(2, 2, figsize=(12, 9), sharex=True)
+        for ax, (column, ylabel) in zip(axes.flat, panels):
+            ax.axvline(x=phys_cores, color="black", linestyle="--",
+                       linewidth=1.5, alpha=0.6)
+            ax.axvspan(phys_cores, subgroup["NumThreads"].max(),
+                       color="black", alpha=0.1)
+            for (layout, *config), layout_values in subgroup.groupby(["Layout"] + CONFIG_COLUMNS):
+                layout_values = layout_values.sort_values("NumThreads")
+                label = layout
+                if multiple_configs:
+                    label += f" {configurationLabel(config)}"
+                if kind == "strong" and column == "SpeedUp":
+                    label += f" (f ≈ {layout_values['f'].iloc[0]:.3f})"
+                ax.plot(layout_values["NumThreads"], layout_values[column],
+                        label=label, markersize=6, **LAYOUT_STYLES.get(layout, {}))
+            if column in ("SpeedUp", "ScaledSpeedUp"):
+                threads = sorted(subgroup["NumThreads"].unique())
+                ax.plot(threads, threads, "--", color="green", alpha=0.4, label="ideal speedup")
+            ax.set_ylabel(ylabel)
+            ax.grid(True, linestyle="--", alpha=0.6)
+            ax.legend(loc="best")
+        for ax in axes[-1]:
+            ax.set_xlabel("Threads number (p)")
+
+        title = "Strong Scaling" if kind == "strong" else "Weak Scaling: W₀ ="
+        fig.suptitle(f"AoS vs SoA - {title} {group_dim} images | {kernel_dim}x{kernel_dim} kernels")
+        fig.tight_layout()
+
+        filename = os.path.join(output_dir, f"layout_comparison_{kind}_{group_dim}_{kernel_dim}.png")
+        fig.savefig(filename, dpi=150)
+        print(f"\nImage saved at {os.path.realpath(filename)}")
+        if show:
+            plt.show()
+        plt.close(fig)
+
+    table = layoutRatios(results, group)
+    print(f"\nAoS / SoA ratios ({kind} scaling):")
+    print(table.to_string(index=False, float_format="%.4f"))
+    filename = os.path.join(output_dir, f"layout_comparison_{kind}.csv")
+    table.to_csv(filename, index=False)
+    print(f"\nTable saved at {os.path.realpath(filename)}")
+    return table
+
+
+if __name__ == "__main__":
+    params = {"layout_dirs": {"AoS": "../AoS/data", "SoA": "../SoA/data"}}
+    if len(sys.argv) > 1:
+        params["layout_dirs"]["AoS"] = sys.argv[1]
+    if len(sys.argv) > 2:
+        params["layout_dirs"]["SoA"] = sys.argv[2]
+    if len(sys.argv) > 3:
+        # 0 means detected on this host
+        params["phys_cores"] = int(sys.argv[3]) or None
+    if len(sys.argv) > 4:
+        params["output_dir"] = sys.argv[4]
+
+    for kind in ["strong", "weak"]:
+        plotLayoutComparison(kind=kind, **params)
@@ -0,0 +1,196 @@
+import os
+# Headless backend: figures are only saved
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import argparse
+import itertools
+import json
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from affinity import reportConfigurations
+from amdahl import plotStrongScaling
+from analysis import analyseStrongScaling, analyseWeakScaling
+from gustafson import plotWeakScaling
+from hostinfo import HOST_JSON, saveHostFingerprint
+
+
+# Declarative grid of the sweep. Every combination of the list values is a run;
+# the "omp" entries are exported as environment variables of the run and
+# recorded by the executables in the ProcBind, Places, Schedule, ChunkSize columns
+# (OMP_SCHEDULE drives the schedule(runtime) loop of the AoS convolution).
+# phys_cores None means detected on this host; workload_dir is the directory of
+# the raw workloads of the weak scaling runs (py_script/workload.py), None means
+# the JPEG images.
+DEFAULT_GRID = {
+    "build_dirs": {
+        "AoS": "../AoS/cmake-build-release",
+        "SoA": "../SoA/cmake-build-release",
+    },
+    "layouts": ["AoS", "SoA"],
+    "kinds": ["strong", "weak"],
+    "image_qualities": [4, 5, 6, 7],
+    "orders": [7, 13, 19, 25],
+    "num_reps": 3,
+    "phys_cores": None,
+    "workload_dir": None,
+    "omp": {
+        "OMP_NUM_THREADS": [16],
+        "OMP_PROC_BIND": ["false"],
+        "OMP_PLACES": ["threads"],
+        "OMP_SCHEDULE": ["dynamic"],
+    },
+}
+
+EXECUTABLES = {
+    "strong": "kip_openMP_strong_scaling",
+    "weak": "kip_openMP_weak_scaling",
+}
+
+CSV_RADIX = {
+    "strong": "kip_openMP_strongScaling",
+    "weak": "kip_openMP_weakScaling",
+}
+
+
+# Read a grid from a json file, using DEFAULT_GRID for the missing entries.
+#
+def loadGrid(grid_filename = None):
+    grid = json.loads(json.dumps(DEFAULT_GRID))
+    if grid_filename is not None:
+        with open(grid_filename) as grid_file:
+            grid.update(json.load(grid_file))
+    return grid
+
+
+# Expand the grid in the list of runs to execute, as dicts of parameters.
+#
+def expandGrid(grid):
+    omp_names = list(grid["omp"].keys())
+    omp_values = [grid["omp"][name] for name in omp_names]
+    runs = []
+    for layout, kind, quality, order, omp in itertools.product(
+            grid["layouts"], grid["kinds"], grid["image_qualities"],
+            grid["orders"], itertools.product(*omp_values)):
+        runs.append({
+            "RunId": f"{layout}_{kind}_{quality}K_{order}_{len(runs):03d}",
+            "Layout": layout,
+            "Kind": kind,
+            "ImageQuality": quality,
+            "KernelOrder": order,
+            "NumReps": grid["num_reps"],
+            **{name: str(value) for name, value in zip(omp_names, omp)},
+        })
+    return runs
+
+
+def executablePath(build_dir, kind):
+    exe = os.path.join(build_dir, EXECUTABLES[kind])
+    if sys.platform == "win32":
+        exe += ".exe"
+    return os.path.realpath(exe)
+
+
+# Execute a single run in its own directory (the executable writes its csv
+# in the working directory) and return the csv path.
+#
+def executeRun(run, grid, run_dir):
+    os.makedirs(run_dir, exist_ok=True)
+    exe = executablePath(grid["build_dirs"][run["Layout"]], run["Kind"])
+    command = [exe, str(run["ImageQuality"]), str(run["KernelOrder"]),
+               str(run["NumReps"]), str(grid["phys_cores"] or 0), "0"]
+    if run["Kind"] == "weak" and grid.get("workload_dir"):
+        command.append(os.path.realpath(grid["workload_dir"]))
+    env = dict(os.environ)
+    env.update({name: run[name] for name in grid["omp"]})
+
+    print(f"\n[{run['RunId']}] {' '.join(command)}")
+    print("  with " + " ".join(f"{name}={run[name]}" for name in grid["omp"]))
+    start = time.time()
+    with open(os.path.join(run_dir, "stdout.log"), "w") as out, \
+            open(os.path.join(run_dir, "stderr.log"), "w") as err:
+        completed = subprocess.run(command, cwd=run_dir, env=env, stdout=out, stderr=err)
+    run["ReturnCode"] = completed.returncode
+    run["Duration_s"] = time.time() - start
+    if completed.returncode != 0:
+        print(f"  failed with code {completed.returncode} (see {run_dir})")
+        return None
+
+    return os.path.join(run_dir, f"{CSV_RADIX[run['Kind']]}_{run['ImageQuality']}K_{run['KernelOrder']}.csv")
+
+
+# Execute every run of the grid, gather the csv files into one dataset per
+# scaling kind (with the run metadata as extra columns) and draw the graphics.
+#
+# grid          dict as DEFAULT_GRID.
+# output_dir    root directory of the sweep: one sub-directory per run plus
+#               runs.csv, strong_scaling.csv, weak_scaling.csv and host.json
+#               (the fingerprint of this host, see hostinfo.hostFingerprint,
+#               whose HostId is recorded in every row).
+# draw          whether to call plotStrongScaling/plotWeakScaling on every run.
+#
+def runSweep(grid, output_dir, draw = True):
+    runs = expandGrid(grid)
+    host = saveHostFingerprint(os.path.join(output_dir, HOST_JSON))
+    phys_cores = grid["phys_cores"] or host["PhysicalCores"]
+    datasets = {"strong": [], "weak": []}
+    for run in runs:
+        run_dir = os.path.join(output_dir, run["RunId"])
+        csv_filename = executeRun(run, grid, run_dir)
+        if csv_filename is None:
+            continue
+
+        data = pd.read_csv(csv_filename)
+        for name, value in run.items():
+            data[name] = value
+        data["HostId"] = host["HostId"]
+        datasets[run["Kind"]].append(data)
+
+        if draw:
+            if run["Kind"] == "strong":
+                plotStrongScaling(csv_filename, phys_cores, output_dir=run_dir, show=False)
+            else:
+                plotWeakScaling(csv_filename, phys_cores, output_dir=run_dir, show=False)
+
+    pd.DataFrame(runs).to_csv(os.path.join(output_dir, "runs.csv"), index=False)
+    for kind, frames in datasets.items():
+        if frames:
+            dataset = pd.concat(frames, ignore_index=True)
+            dataset_filename = os.path.join(output_dir, f"{kind}_scaling.csv")
+            dataset.to_csv(dataset_filename, index=False)
+            print(f"\nDataset saved at {os.path.realpath(dataset_filename)}")
+            if draw:
+                # one curve per OpenMP configuration of the grid
+                for layout, data in dataset.groupby("Layout"):
+                    if kind == "strong":
+                        results = analyseStrongScaling(data, phys_cores)
+                    else:
+                        results = analyseWeakScaling(data)
+                    reportConfigurations(results, kind, phys_cores, output_dir,
+                                         show=False, prefix=f"{layout}_")
+    return runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the scaling experiments over a grid of parameters.")
+    parser.add_argument("grid", nargs="?", default=None,
+                        help="json file overriding the entries of DEFAULT_GRID")
+    parser.add_argument("-o", "--output-dir", default=time.strftime("sweep_%Y%m%d_%H%M%S"))
+    parser.add_argument("--no-draw", action="store_true", help="do not draw the graphics")
+    parser.add_argument("--dry-run", action="store_true", help="only list the runs")
+    args = parser.parse_args()
+
+    grid = loadGrid(args.grid)
+    if args.dry_run:
+        print(pd.DataFrame(expandGrid(grid)).to_string(index=False))
+        raise SystemExit(0)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    with open(os.path.join(args.output_dir, "grid.json"), "w") as grid_file:
+        json.dump(grid, grid_file, indent=2)
+    runs = runSweep(grid, args.output_dir, draw=not args.no_draw)
+    raise SystemExit(1 if any(run.get("ReturnCode") != 0 for run in runs) else 0)
@@ -1,48 +1,92 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import sys
-import os
+
+from analysis import (analyseWeakScaling, withConfiguration, configurationLabel,
+                      configurationSuffix, WEAK_KEYS)
+from affinity import numConfigurations, reportConfigurations
+from cache import ResultCache
+from hostinfo import dataPhysicalCores
+from rendering import FigureRenderer, valueLabels, valueTicks
 
 
 # csv_filename              relative path to the .cvs file to analyze.
+# phys_cores                number of physical cores of the machine of the data (None
+#                           means read from its host.json, see
+#                           hostinfo.dataPhysicalCores).
 # min_efficiency            minimum weak efficiency value in order to consider it 
 #                           as a good value (bad values are printed in red).
 # max_relative_time         maximum distance (in fraction) from the sequential time
 #                           in order to consider it as a good time (bad values
 #                           are printed in red).
+# output_dir                directory where the images are saved.
+# show                      whether to open every figure in a blocking window
+#                           (disable it for headless/batch runs).
+# use_cache                 whether to skip the groups whose rows and thresholds
+#                           are unchanged since the last run (see cache.py).
+# df                        rows already loaded (e.g. queried from store.py): the
+#                           csv file is not read and csv_filename only names the cache.
+# renderer                  FigureRenderer drawing the figures (e.g. in preview mode
+#                           or into a dashboard, see rendering.py), closed by the
+#                           caller; None means png files in output_dir.
+#
+# With several OpenMP configurations (ProcBind, Places, Schedule, ChunkSize)
+# in the csv file, every configuration gets its own figures, plus one figure
+# per group comparing them and the ranking table (see affinity.py).
 #
-def plotWeakScaling(csv_filename = "../data/kip_openMP_weakScaling.csv", phys_cores = 10,
-                    min_efficiency = 0.7, max_relative_time = 1.3):
+def plotWeakScaling(csv_filename = "../data/kip_openMP_weakScaling.csv", phys_cores = None,
+                    min_efficiency = 0.7, max_relative_time = 1.3,
+                    output_dir = ".", show = True, use_cache = True, df = None,
+                    renderer = None):
     min_relative_throughput = min_efficiency
     
-    df = pd.read_csv(csv_filename)
+    phys_cores = dataPhysicalCores(csv_filename if df is None else None, phys_cores)
+    df = withConfiguration(pd.read_csv(csv_filename) if df is None else df)
+    own_renderer = renderer is None
+    if own_renderer:
+        renderer = FigureRenderer(output_dir, show=show)
+    
+    # a dashboard needs every group drawn, cached or not
+    use_cache = use_cache and renderer.dashboard is None
+    cache = ResultCache.forCsv(csv_filename, output_dir) if use_cache else None
+    cache_params = {
+        "phys_cores": phys_cores,
+        "min_efficiency": min_efficiency,
+        "max_relative_time": max_relative_time,
+        "mode": renderer.mode,
+    }
+    raw_groups = df.groupby(WEAK_KEYS)
     
-    # Group same-size-images-and-kernels and calculate means
-    grouped = (
-        df.groupby(["UnitOfWork", "KernelDimension", "NumThreads"])
-          .agg({
-              "TimePerRep_s": "mean", 
-              "WeakEfficiency": "mean", 
-              "ScaledSpeedUp": "mean", 
-              "Throughput_Mpix_s": "mean"
-          })
-          .reset_index()
-    )
+    # Group same-size-images-and-kernels, calculate means and ratios to the sequential run
+    results = analyseWeakScaling(df)
+    multiple_configs = numConfigurations(results) > 1
     
-    # Main Loop (group by same data size)
-    for (unit_of_work, kernel_dim), subgroup in grouped.groupby(["UnitOfWork", "KernelDimension"]):
+    # Main Loop (group by same data size and OpenMP configuration)
+    for keys, subgroup in results.groupby(WEAK_KEYS):
+        unit_of_work, kernel_dim, config = keys[0], keys[1], keys[2:]
+        config_suffix = f"_{configurationSuffix(config)}" if multiple_configs else ""
+        config_title = f" | {configurationLabel(config)}" if multiple_configs else ""
         subgroup = subgroup.sort_values("NumThreads")
         
+        if cache is not None:
+            cache_key = ResultCache.key(raw_groups.get_group(keys), cache_params)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                for image in cached["images"]:
+                    print(f"\nImage up to date at {image}")
+                continue
+        images = []
+        
         ### FIRST PART: Gustafson - Scaled Speedup
-        plt.figure(figsize=(7,5))
+        fig = renderer.figure((7, 5))
+        ax = fig.add_subplot()
     
-        plt.axvline(x=phys_cores, color="black", linestyle="--",
-                    linewidth=1.5, alpha=0.6, label="Max physical threads")
-        plt.axvspan(phys_cores, subgroup["NumThreads"].max(),
-                    color="black", alpha=0.1, label="Logical threads zone")
+        ax.axvline(x=phys_cores, color="black", linestyle="--",
+                   linewidth=1.5, alpha=0.6, label="Max physical threads")
+        ax.axvspan(phys_cores, subgroup["NumThreads"].max(),
+                   color="black", alpha=0.1, label="Logical threads zone")
         
         plt_color = "green"
-        plt.plot(
+        ax.plot(
             subgroup["NumThreads"],
             subgroup["NumThreads"],
             linestyle="--",
@@ -51,7 +95,7 @@ def plotWeakScaling(csv_filename = "../data/kip_openMP_weakScaling.csv", phys_co
             label="ideal speedup (y=p)"
         )
         
-        plt.plot(
+        ax.plot(
             subgroup["NumThreads"], 
             subgroup["ScaledSpeedUp"], 
             marker="o",
@@ -60,22 +104,16 @@ def plotWeakScaling(csv_filename = "../data/kip_openMP_weakScaling.csv", phys_co
             label="real speedup",
             markersize=6
         )
-        for x, y in zip(subgroup["NumThreads"], subgroup["ScaledSpeedUp"]):
-            plt.annotate(f"{y:.2f}", (x, y), xytext=(-10, -5), textcoords="offset points",
-                ha="center", va="top", fontsize=8)
-        
-        plt.xlabel("Threads number (p)")
-        plt.ylabel("Scaled Speedup")
-        plt.title(f"Gustafson's law evaluation: W₀ = {unit_of_work} images | {kernel_dim}x{kernel_dim} kernels")
-        plt.legend(loc="best")
-        plt.grid(True, linestyle="--", alpha=0.6)
-        plt.tight_layout()
-        
-        filename = f"gustafson_evaluation_{unit_of_work}_{kernel_dim}.png".replace("x", "x")
-        plt.savefig(filename, dpi=150)
-        print(f"\nImage saved at {os.path.realpath(filename)}")
-        plt.show()
-        plt.close()
+        valueLabels(ax, subgroup["NumThreads"], subgroup["ScaledSpeedUp"])
+        
+        ax.set_xlabel("Threads number (p)")
+        ax.set_ylabel("Scaled Speedup")
+        ax.set_title(f"Gustafson's law evaluation: W₀ = {unit_of_work} images | {kernel_dim}x{kernel_dim} kernels{config_title}")
+        ax.legend(loc="best")
+        ax.grid(True, linestyle="--", alpha=0.6)
+        fig.tight_layout()
+        
+        images.append(renderer.save(fig, f"gustafson_evaluation_{unit_of_work}_{kernel_dim}{config_suffix}"))
         
         ### Interpretazione del grafico
         # Conferma se il programma scala “come dovrebbe” aumentando il problema
@@ -86,7 +124,8 @@ def plotWeakScaling(csv_filename = "../data/kip_openMP_weakScaling.csv", phys_co
         
         
         ### SECOND PART: Show weak scaling, i.e. Efficiency vs Throughput vs Time
-        fig, ax1 = plt.subplots(figsize=(9,6))
+        fig = renderer.figure((9, 6))
+        ax1 = fig.add_subplot()
             
         ax1.axvline(x=phys_cores, color="black", linestyle="--",
                     linewidth=1.5, alpha=0.6, label="Max physical threads")
@@ -107,13 +146,8 @@ def plotWeakScaling(csv_filename = "../data/kip_openMP_weakScaling.csv", phys_co
             label="real efficiency",
             markersize=6
         )
-        for x, y in zip(subgroup["NumThreads"], subgroup["WeakEfficiency"]):
-            if y < min_efficiency:
-                color = "red"
-            else:
-                color = "black"
-            ax1.annotate(f"{y:.2f}", (x, y), xytext=(-10, -5), textcoords="offset points",
-                ha="center", va="top", fontsize=8, color=color)
+        valueLabels(ax1, subgroup["NumThreads"], subgroup["WeakEfficiency"],
+                    subgroup["WeakEfficiency"] < min_efficiency)
         
         ax1.axhline(
             y=1,
@@ -147,17 +181,12 @@ def plotWeakScaling(csv_filename = "../data/kip_openMP_weakScaling.csv", phys_co
             label="real throughput",
             markersize=6
         )
-        for x, y in zip( subgroup["NumThreads"], subgroup["Throughput_Mpix_s"]):
-            if y / (x * subgroup[subgroup["NumThreads"] == 1]["Throughput_Mpix_s"].item()) < min_relative_throughput:
-                color = "red"
-            else:
-                color = "black"
-            ax2.annotate(f"{y:.2f}", (x, y), xytext=(-10, -5), textcoords="offset points",
-                ha="center", va="top", fontsize=8, color=color)
+        valueLabels(ax2, subgroup["NumThreads"], subgroup["Throughput_Mpix_s"],
+                    subgroup["RelativeThroughput"] < min_relative_throughput)
             
         ax2.plot(
             subgroup["NumThreads"],
-            subgroup["NumThreads"] * subgroup[subgroup["NumThreads"] == 1]["Throughput_Mpix_s"].item(),
+            subgroup["IdealThroughput_Mpix_s"],
             linestyle="--",
             color=ax2_color,
             alpha=0.4,
@@ -177,18 +206,14 @@ def plotWeakScaling(csv_filename = "../data/kip_openMP_weakScaling.csv", phys_co
             subgroup["NumThreads"],
             subgroup["Throughput_Mpix_s"],
             c="palegoldenrod",
-            s= (150 + 500 * subgroup["TimePerRep_s"] / subgroup[subgroup["NumThreads"] == 1]["TimePerRep_s"].item()).apply(lambda s: s),
+            s=150 + 500 * subgroup["RelativeTime"].values,
             label="time"
         )
         
         ax2_opposite = ax2.twiny()
-        xticks = list([round(item,2) for item in subgroup["TimePerRep_s"]])    
         ax2_opposite.set_xlim(ax2.get_xlim())
-        ax2_opposite.set_xticks(list(subgroup["NumThreads"]))
-        ax2_opposite.set_xticklabels(xticks)
-        for label in ax2_opposite.get_xticklabels():
-            if float(label.get_text()) > max_relative_time * subgroup[subgroup["NumThreads"] == 1]["TimePerRep_s"].item():
-                label.set_color("red");
+        valueTicks(ax2_opposite, subgroup["NumThreads"], subgroup["TimePerRep_s"],
+                   subgroup["TimePerRep_s"].round(2) > max_relative_time * subgroup["SequentialTime_s"].iloc[0])
         ax2_opposite.set_xlabel("Time (s)")
         ax2_opposite.grid(True, axis="x", linestyle="--", alpha=0.6)
         h2, l2 = ax2.get_legend_handles_labels()
@@ -202,20 +227,27 @@ def plotWeakScaling(csv_filename = "../data/kip_openMP_weakScaling.csv", phys_co
         #   → qualche effetto collaterale (cache locality, schedulazione più efficiente, ecc.),
         #   ma è raro e spesso sospetto.    
     
-        plt.title(f"Weak Scaling: W₀ = {unit_of_work} images | {kernel_dim}x{kernel_dim} kernels")
-        plt.legend(h1+h2, l1+l2, loc="best")
-        plt.tight_layout()
+        ax2_opposite.set_title(f"Weak Scaling: W₀ = {unit_of_work} images | {kernel_dim}x{kernel_dim} kernels{config_title}")
+        ax2_opposite.legend(h1+h2, l1+l2, loc="best")
+        fig.tight_layout()
         
-        filename = f"weak_scaling_{unit_of_work}_{kernel_dim}.png".replace("x", "x")
-        plt.savefig(filename, dpi=150)
-        print(f"\nImage saved at {os.path.realpath(filename)}")
-        plt.show()
-        plt.close()
+        images.append(renderer.save(fig, f"weak_scaling_{unit_of_work}_{kernel_dim}{config_suffix}"))
         
         ### Interpretazione del grafico
         # Mostra quanto lavoro in più puoi trattare aumentando i thread.
         # Se rimane vicino alla retta, significa che il programma scala bene.
         
+        if cache is not None:
+            cache.put(cache_key, {"images": images})
+    
+    if cache is not None:
+        cache.save()
+    
+    if multiple_configs:
+        reportConfigurations(results, "weak", phys_cores, output_dir, show,
+                             renderer=renderer)
+    if own_renderer:
+        renderer.close()
         
 
 
@@ -224,7 +256,8 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         params["csv_filename"] = sys.argv[1]
     if len(sys.argv) > 2:
-        params["phys_cores"] = int(sys.argv[2])
+        # 0 means read from the host.json of the data
+        params["phys_cores"] = int(sys.argv[2]) or None
     if len(sys.argv) > 3:
         params["min_efficiency"] = float(sys.argv[3])
     if len(sys.argv) > 4:
@@ -0,0 +1,239 @@
+import argparse
+import functools
+import glob
+import hashlib
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+
+
+# Fingerprint of the machine of a result set, next to its data (see
+# saveHostFingerprint and dataPhysicalCores).
+HOST_JSON = "host.json"
+
+
+# Number of distinct (package, core) pairs of /proc/cpuinfo, None if the
+# file does not describe them (e.g. some ARM kernels).
+#
+def _coresFromCpuinfo(cpuinfo_filename = "/proc/cpuinfo"):
+    cores = set()
+    physical_id = core_id = None
+    with open(cpuinfo_filename) as cpuinfo:
+        for line in list(cpuinfo) + [""]:
+            if not line.strip():
+                # end of a processor block
+                if core_id is not None:
+                    cores.add((physical_id, core_id))
+                physical_id = core_id = None
+                continue
+            name, _, value = line.partition(":")
+            name = name.strip()
+            if name == "physical id":
+                physical_id = value.strip()
+            elif name == "core id":
+                core_id = value.strip()
+    return len(cores) or None
+
+
+# Same count from the sysfs topology of every cpu.
+def _coresFromSysfs(cpu_dir = "/sys/devices/system/cpu"):
+    cores = set()
+    for topology in glob.glob(os.path.join(cpu_dir, "cpu[0-9]*", "topology")):
+        try:
+            with open(os.path.join(topology, "physical_package_id")) as package_file, \
+                    open(os.path.join(topology, "core_id")) as core_file:
+                cores.add((package_file.read().strip(), core_file.read().strip()))
+        except OSError:
+            continue
+    return len(cores) or None
+
+
+def _coresFromSysctl():
+    try:
+        output = subprocess.run(["sysctl", "-n", "hw.physicalcpu"], capture_output=True,
+                                text=True, check=True).stdout
+        return int(output.strip())
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None
+
+
+# Number of physical cores of this host (SMT siblings are counted once).
+# Falls back to the number of logical cores when the topology is unknown.
+#
+@functools.lru_cache(maxsize=None)
+def physicalCores():
+    cores = None
+    if sys.platform.startswith("linux"):
+        try:
+            cores = _coresFromCpuinfo()
+        except OSError:
+            cores = None
+        if cores is None:
+            cores = _coresFromSysfs()
+    elif sys.platform == "darwin":
+        cores = _coresFromSysctl()
+    return cores or os.cpu_count() or 1
+
+
+# phys_cores if given, the detected physical cores otherwise: only for the
+# runs measured on this host (see dataPhysicalCores for recorded results).
+def resolvePhysicalCores(phys_cores = None):
+    return phys_cores if phys_cores else physicalCores()
+
+
+# Physical cores of the machine where the results of csv_filename were
+# measured: phys_cores if given, else the PhysicalCores of the nearest
+# host.json in the directory of the csv file or in its parents. The cores of
+# the host running the analysis say nothing about recorded results, so
+# without either a ValueError is raised.
+#
+# csv_filename  scaling csv file (None for rows not read from a file, e.g.
+#               queried from store.py: phys_cores is then required).
+#
+def dataPhysicalCores(csv_filename, phys_cores = None):
+    if phys_cores:
+        return phys_cores
+    directory = os.path.dirname(os.path.realpath(csv_filename)) if csv_filename else None
+    while directory:
+        host_filename = os.path.join(directory, HOST_JSON)
+        if os.path.exists(host_filename):
+            cores = loadHostFingerprint(host_filename).get("PhysicalCores")
+            if cores:
+                return int(cores)
+        parent = os.path.dirname(directory)
+        directory = parent if parent != directory else None
+    raise ValueError(f"Unknown physical cores of the machine of {csv_filename or 'the results'}: "
+                     f"pass them (--phys-cores) or save its {HOST_JSON} next to the data "
+                     f"(python hostinfo.py --save <data dir>/{HOST_JSON} on that machine)")
+
+
+def _sysctl(name):
+    try:
+        return subprocess.run(["sysctl", "-n", name], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Model name of the CPU, e.g. "Intel(R) Core(TM) i7-10700 CPU @ 2.90GHz".
+def cpuModel(cpuinfo_filename = "/proc/cpuinfo"):
+    if sys.platform.startswith("linux"):
+        try:
+            with open(cpuinfo_filename) as cpuinfo:
+                for line in cpuinfo:
+                    name, _, value = line.partition(":")
+                    if name.strip() in ("model name", "Model", "Hardware"):
+                        return value.strip()
+        except OSError:
+            pass
+    elif sys.platform == "darwin":
+        model = _sysctl("machdep.cpu.brand_string")
+        if model:
+            return model
+    return platform.processor() or platform.machine() or "unknown"
+
+
+def numaNodes(node_dir = "/sys/devices/system/node"):
+    return len(glob.glob(os.path.join(node_dir, "node[0-9]*"))) or 1
+
+
+# "32K" -> 32768
+def _parseSize(size):
+    size = size.strip().upper()
+    units = {"K": 2**10, "M": 2**20, "G": 2**30}
+    if size and size[-1] in units:
+        return int(size[:-1]) * units[size[-1]]
+    return int(size)
+
+
+# Data and unified cache sizes (bytes) of a core: {"L1d": ..., "L2": ..., "L3": ...}.
+# L3 is the size of the whole cache, shared by the cores of a package.
+#
+def cacheSizes(cache_dir = "/sys/devices/system/cpu/cpu0/cache"):
+    caches = {}
+    for index in sorted(glob.glob(os.path.join(cache_dir, "index[0-9]*"))):
+        try:
+            with open(os.path.join(index, "level")) as level_file, \
+                    open(os.path.join(index, "type")) as type_file, \
+                    open(os.path.join(index, "size")) as size_file:
+                level, kind, size = level_file.read().strip(), type_file.read().strip(), size_file.read()
+        except OSError:
+            continue
+        if kind == "Instruction":
+            continue
+        caches[f"L{level}d" if kind == "Data" else f"L{level}"] = _parseSize(size)
+    if not caches and sys.platform == "darwin":
+        for name, sysctl_name in [("L1d", "hw.l1dcachesize"), ("L2", "hw.l2cachesize"),
+                                  ("L3", "hw.l3cachesize")]:
+            value = _sysctl(sysctl_name)
+            if value and value.isdigit() and int(value) > 0:
+                caches[name] = int(value)
+    return caches
+
+
+# Identifier of the hardware of a fingerprint: a hash of its CPU model, core
+# and NUMA node counts and cache sizes. The hostname and the bandwidth
+# measure are left out, so that machines with the same hardware (e.g. the
+# nodes of a cluster) share it, and it can be recomputed from any saved
+# fingerprint.
+#
+def hostId(fingerprint):
+    hardware = {name: value for name, value in fingerprint.items()
+                if name in ("CpuModel", "PhysicalCores", "LogicalCores", "NumaNodes")
+                or name.endswith("_bytes")}
+    description = json.dumps(hardware, sort_keys=True)
+    return hashlib.sha1(description.encode()).hexdigest()[:12]
+
+
+# Fingerprint of this host, recorded with the runs to compare the machines.
+# HostId identifies the hardware only (see hostId).
+#
+# probe_bandwidth   whether to measure the memory bandwidth of the physical
+#                   cores (a triad of a few seconds, see roofline.py).
+#
+def hostFingerprint(probe_bandwidth = True):
+    caches = cacheSizes()
+    fingerprint = {
+        "Hostname": socket.gethostname(),
+        "CpuModel": cpuModel(),
+        "PhysicalCores": physicalCores(),
+        "LogicalCores": os.cpu_count() or 1,
+        "NumaNodes": numaNodes(),
+        **{f"{name}_bytes": size for name, size in caches.items()},
+    }
+    fingerprint["HostId"] = hostId(fingerprint)
+    if probe_bandwidth:
+        # imported here: roofline imports analysis, which imports this module
+        from roofline import measureBandwidth
+        fingerprint["Bandwidth_GB_s"] = measureBandwidth(fingerprint["PhysicalCores"])
+    return fingerprint
+
+
+def saveHostFingerprint(filename, probe_bandwidth = True):
+    fingerprint = hostFingerprint(probe_bandwidth)
+    with open(filename, "w") as host_file:
+        json.dump(fingerprint, host_file, indent=2)
+    return fingerprint
+
+
+def loadHostFingerprint(filename):
+    with open(filename) as host_file:
+        return json.load(host_file)
+
+
+if __name__ == "__main__":
+    # e.g. python hostinfo.py --save ../AoS/data/host.json (on the machine of the data)
+    parser = argparse.ArgumentParser(description="Fingerprint of this host.")
+    parser.add_argument("--no-probe", action="store_true", help="do not measure the memory bandwidth")
+    parser.add_argument("--save", default=None, help="json file where to save the fingerprint")
+    args = parser.parse_args()
+
+    if args.save is not None:
+        fingerprint = saveHostFingerprint(args.save, not args.no_probe)
+    else:
+        fingerprint = hostFingerprint(not args.no_probe)
+    for name, value in fingerprint.items():
+        print(f"{name}: {value}")
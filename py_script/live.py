@@ -0,0 +1,229 @@
+import argparse
+import io
+import os
+import subprocess
+import time
+
+import matplotlib
+# headless: the figures are only saved, while the experiment runs
+matplotlib.use("Agg")
+import pandas as pd
+
+from amdahl import plotStrongScaling
+from analysis import analyseStrongScaling, analyseWeakScaling
+from experiments import CSV_RADIX
+from gustafson import plotWeakScaling
+from hostinfo import resolvePhysicalCores
+
+
+STOP_FILE = "kip_stop"
+
+
+# New complete lines of a file (a csv being written, or a named pipe) as
+# lists, until the file stops growing and running() is False.
+#
+# running       callable telling whether the writer is still alive.
+#
+def tailLines(filename, poll_interval = 0.5, running = lambda: True):
+    while not os.path.exists(filename):
+        if not running():
+            return
+        time.sleep(poll_interval)
+    with open(filename) as tailed:
+        pending = ""
+        while True:
+            alive = running()
+            chunk = tailed.read()
+            if chunk:
+                pending += chunk
+                *lines, pending = pending.split("\n")
+                if lines:
+                    yield lines
+            elif not alive:
+                if pending:
+                    yield [pending]
+                return
+            else:
+                time.sleep(poll_interval)
+
+
+# Thread counts whose rows are all in the frame: a count is complete when a
+# later one started or when it has as many rows (images) as the first one.
+# Once the run finished every count is complete: the executables write the
+# rows of a thread count only when it completes (a stopped count is dropped).
+#
+def completedThreadCounts(df, finished = False):
+    counts = df.groupby("NumThreads", sort=False).size()
+    threads = list(counts.index)
+    if finished:
+        return threads
+    complete = threads[:-1]
+    if len(threads) > 1 and counts.iloc[-1] == counts.iloc[0]:
+        complete.append(threads[-1])
+    return complete
+
+
+# Analysis of the rows received so far, printed one line per new thread count.
+#
+# Returns the (thread count, efficiency) of the new thread counts.
+#
+def _reportThreadCounts(df, new_threads, kind, phys_cores):
+    if kind == "strong":
+        results = analyseStrongScaling(df, phys_cores)
+        efficiency_column = "Efficiency"
+    else:
+        results = analyseWeakScaling(df)
+        efficiency_column = "WeakEfficiency"
+    reports = []
+    for num_threads in new_threads:
+        rows = results[results["NumThreads"] == num_threads]
+        # the worst group drives the decision
+        efficiency = rows[efficiency_column].min()
+        if kind == "strong":
+            print(f"[live] p={num_threads}: speedup {rows['SpeedUp'].mean():.3f}, "
+                  f"efficiency {efficiency:.3f}, Karp–Flatt {rows['KarpFlatt'].mean():.4f}, "
+                  f"fitted f {rows['f'].mean():.4f}")
+        else:
+            print(f"[live] p={num_threads}: weak efficiency {efficiency:.3f}, "
+                  f"throughput {rows['Throughput_Mpix_s'].mean():.3f} Mpix/s")
+        reports.append((num_threads, efficiency))
+    return reports
+
+
+# Follow a scaling csv while the executable writes it: after every thread
+# count the metrics are updated and the figures re-rendered; once the
+# efficiency stays below min_efficiency for patience thread counts the stop
+# file is created (the executables skip the remaining thread counts, see
+# runtime::stopRequested).
+#
+# csv_filename  csv file being written by strong_scaling or weak_scaling.
+# kind          "strong", "weak" or None (deduced from the header).
+# stop_file     file to create to stop the run (None never stops it).
+# running       callable telling whether the executable is still running.
+# render        whether to re-render the figures after every thread count.
+#
+# Returns the rows received.
+#
+def watchScaling(csv_filename, kind = None, phys_cores = None, min_efficiency = 0.7,
+                 patience = 2, stop_file = None, output_dir = ".", poll_interval = 1.0,
+                 running = lambda: True, render = True):
+    # a live run is measured on this host
+    phys_cores = resolvePhysicalCores(phys_cores)
+    header, rows = None, []
+    done, low_efficiency, stopped = [], 0, False
+    df = pd.DataFrame()
+
+    def update(finished):
+        nonlocal df, low_efficiency, stopped
+        if header is None or not rows:
+            return
+        df = pd.read_csv(io.StringIO("\n".join([header] + rows)))
+        new_threads = [p for p in completedThreadCounts(df, finished) if p not in done]
+        if not new_threads:
+            return
+        done.extend(new_threads)
+        analysed = df[df["NumThreads"].isin(done)]
+        for num_threads, efficiency in _reportThreadCounts(analysed, new_threads, kind, phys_cores):
+            low_efficiency = low_efficiency + 1 if efficiency < min_efficiency else 0
+            if low_efficiency >= patience and stop_file is not None and not stopped:
+                open(stop_file, "w").close()
+                stopped = True
+                print(f"[live] efficiency below {min_efficiency} for {patience} thread counts: "
+                      f"stop requested ({stop_file})")
+        if render:
+            if kind == "strong":
+                plotStrongScaling(csv_filename, phys_cores, min_efficiency=min_efficiency,
+                                  output_dir=output_dir, show=False, use_cache=False, df=analysed)
+            else:
+                plotWeakScaling(csv_filename, phys_cores, min_efficiency=min_efficiency,
+                                output_dir=output_dir, show=False, use_cache=False, df=analysed)
+
+    for lines in tailLines(csv_filename, poll_interval, running):
+        for line in lines:
+            if not line.strip():
+                continue
+            if header is None:
+                header = line
+                if kind is None:
+                    kind = "strong" if "SpeedUp" in header.split(",") else "weak"
+            else:
+                rows.append(line)
+        update(finished=False)
+    update(finished=True)
+    return df
+
+
+# Run a scaling executable and analyse it live (see watchScaling).
+#
+# exe           path of kip_openMP_strong_scaling or kip_openMP_weak_scaling.
+# run_dir       working directory of the run (where the csv is written).
+# workload_dir  raw workloads of the weak scaling runs (see workload.py).
+#
+# Returns the rows received.
+#
+def runLive(exe, image_quality = 4, order = 7, num_reps = 3, phys_cores = None,
+            min_efficiency = 0.7, patience = 2, run_dir = ".", render = True,
+            workload_dir = None):
+    kind = "weak" if "weak" in os.path.basename(exe) else "strong"
+    os.makedirs(run_dir, exist_ok=True)
+    csv_filename = os.path.join(run_dir, f"{CSV_RADIX[kind]}_{image_quality}K_{order}.csv")
+    stop_file = os.path.realpath(os.path.join(run_dir, STOP_FILE))
+    # stale files would be read as the new run
+    for stale in (csv_filename, stop_file):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    command = [os.path.realpath(exe), str(image_quality), str(order), str(num_reps),
+               str(phys_cores or 0), "0"]
+    if kind == "weak" and workload_dir:
+        command.append(os.path.realpath(workload_dir))
+    print(f"[live] {' '.join(command)}")
+    process = subprocess.Popen(command, cwd=run_dir, env=dict(os.environ, KIP_STOP_FILE=stop_file),
+                               stdout=subprocess.DEVNULL)
+    df = watchScaling(csv_filename, kind, phys_cores, min_efficiency, patience, stop_file,
+                      run_dir, running=lambda: process.poll() is None, render=render)
+    if process.wait() != 0:
+        print(f"[live] the executable failed with code {process.returncode}")
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Analyse a scaling experiment while it runs, with early stop.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run a scaling executable and follow it")
+    run_parser.add_argument("exe")
+    run_parser.add_argument("--quality", type=int, default=4)
+    run_parser.add_argument("--order", type=int, default=7)
+    run_parser.add_argument("--num-reps", type=int, default=3)
+    run_parser.add_argument("--workload-dir", default=None)
+    run_parser.add_argument("-o", "--run-dir", default=".")
+
+    watch_parser = commands.add_parser("watch", help="follow a csv written by a running executable")
+    watch_parser.add_argument("csv_filename")
+    watch_parser.add_argument("--stop-file", default=None,
+                              help="file to create to stop the run (its KIP_STOP_FILE)")
+    watch_parser.add_argument("--idle-timeout", type=float, default=600,
+                              help="seconds without new rows after which the run is over")
+    watch_parser.add_argument("-o", "--output-dir", default=".")
+
+    for sub_parser in (run_parser, watch_parser):
+        sub_parser.add_argument("--phys-cores", type=int, default=None)
+        sub_parser.add_argument("--min-efficiency", type=float, default=0.7)
+        sub_parser.add_argument("--patience", type=int, default=2,
+                                help="consecutive thread counts below the efficiency before stopping")
+        sub_parser.add_argument("--no-render", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        runLive(args.exe, args.quality, args.order, args.num_reps, args.phys_cores,
+                args.min_efficiency, args.patience, args.run_dir, not args.no_render,
+                args.workload_dir)
+    else:
+        # the writer is another process: the run is over when the csv stops growing
+        running = lambda: (not os.path.exists(args.csv_filename) or
+                           time.time() - os.path.getmtime(args.csv_filename) < args.idle_timeout)
+        watchScaling(args.csv_filename, None, args.phys_cores, args.min_efficiency,
+                     args.patience, args.stop_file, args.output_dir, running=running,
+                     render=not args.no_render)
@@ -0,0 +1,386 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from analysis import (analyseStrongScaling, analyseWeakScaling, configurationLabel,
+                      configurationSuffix, STRONG_KEYS, WEAK_KEYS)
+from batch import findScalingCsv
+from hostinfo import resolvePhysicalCores
+
+
+### Models: speedup S(p) as a function of the thread count ###
+# Every model returns the prediction and its jacobian with respect to the
+# parameters, for (groups x points) arrays of p and (groups x params) arrays
+# of parameters.
+
+# Amdahl: S = p / (1 + sigma (p - 1)), sigma the serial fraction.
+def _amdahl(params, p):
+    sigma = params[:, [0]]
+    denominator = 1 + sigma * (p - 1)
+    prediction = p / denominator
+    jacobian = (-p * (p - 1) / denominator ** 2)[..., np.newaxis]
+    return prediction, jacobian
+
+
+# Universal Scalability Law (Gunther): S = p / (1 + sigma (p - 1) + kappa p (p - 1)),
+# sigma the contention and kappa the coherency (crosstalk) coefficient.
+def _usl(params, p):
+    sigma, kappa = params[:, [0]], params[:, [1]]
+    denominator = 1 + sigma * (p - 1) + kappa * p * (p - 1)
+    prediction = p / denominator
+    d_denominator = -p / denominator ** 2
+    jacobian = np.stack([d_denominator * (p - 1), d_denominator * p * (p - 1)], axis=-1)
+    return prediction, jacobian
+
+
+# Amdahl capped by a ceiling: S = min(p / (1 + sigma (p - 1)), cap). The cap
+# is a fitted parameter, an empirical ceiling of the speedup (e.g. the
+# threads saturating the memory bandwidth): it is only identified when it
+# binds within the measured thread counts (see optimalThreads).
+def _capped(params, p):
+    amdahl, amdahl_jacobian = _amdahl(params[:, [0]], p)
+    cap = params[:, [1]]
+    capped = amdahl > cap
+    prediction = np.where(capped, cap, amdahl)
+    jacobian = np.stack([np.where(capped, 0, amdahl_jacobian[..., 0]),
+                         np.where(capped, 1, 0).astype(float)], axis=-1)
+    return prediction, jacobian
+
+
+# Gustafson: scaled speedup S = p - alpha (p - 1), alpha the serial fraction
+# of the scaled workload.
+def _gustafson(params, p):
+    alpha = params[:, [0]]
+    return p - alpha * (p - 1), (-(p - 1))[..., np.newaxis]
+
+
+# (function, parameter names, lower bounds) of every model
+MODELS = {
+    "Amdahl": (_amdahl, ["Sigma"], [0.0]),
+    "USL": (_usl, ["Sigma", "Kappa"], [0.0, 0.0]),
+    "Capped": (_capped, ["Sigma", "Cap"], [0.0, 1.0]),
+    "Gustafson": (_gustafson, ["Alpha"], [0.0]),
+}
+STRONG_MODELS = ["Amdahl", "USL", "Capped"]
+WEAK_MODELS = ["Gustafson", "USL"]
+
+
+### Vectorized least squares ###
+
+# Per-group least squares without intercept y = X b, for (groups x points
+# x features) X, masked points excluded.
+def _batchedLinearFit(features, y, mask):
+    features = features * mask[..., np.newaxis]
+    normal = np.einsum("gnk,gnl->gkl", features, features)
+    rhs = np.einsum("gnk,gn->gk", features, np.where(mask, y, 0))
+    # singular systems (too few points) get a tiny ridge
+    normal += 1e-12 * np.eye(normal.shape[-1])
+    return np.linalg.solve(normal, rhs[..., np.newaxis])[..., 0]
+
+
+# Initial parameters of a model from the linearized forms:
+# p/S - 1 = sigma (p - 1) + kappa p (p - 1) (Amdahl, USL) and
+# p - S = alpha (p - 1) (Gustafson).
+def _initialParams(name, p, speedup, mask):
+    if name == "Gustafson":
+        return _batchedLinearFit((p - 1)[..., np.newaxis], p - speedup, mask)
+    y = p / speedup - 1
+    if name == "USL":
+        return _batchedLinearFit(np.stack([p - 1, p * (p - 1)], axis=-1), y, mask)
+    sigma = _batchedLinearFit((p - 1)[..., np.newaxis], y, mask)
+    if name == "Amdahl":
+        return sigma
+    cap = np.nanmax(np.where(mask, speedup, np.nan), axis=1, keepdims=True)
+    return np.concatenate([sigma, cap], axis=1)
+
+
+# Initial parameters of a model nesting Amdahl, from the Amdahl fit: the
+# USL with kappa = 0 and the capped model with a cap above every measured
+# speedup both predict the Amdahl curve, so their fits start from it.
+def _nestedParams(name, amdahl_params, p, mask):
+    if name == "USL":
+        return np.column_stack([amdahl_params[:, 0], np.zeros(len(amdahl_params))])
+    amdahl, _ = _amdahl(amdahl_params, p)
+    cap = np.max(np.where(mask, amdahl, 1), axis=1)
+    return np.column_stack([amdahl_params[:, 0], np.maximum(cap, MODELS[name][2][1])])
+
+
+# Levenberg–Marquardt step of every group, with the parameters at their
+# lower bound that the step would push below it held fixed (active set):
+# the other parameters get the step of the reduced problem instead of a
+# projection of the full step, which stalls on the bound.
+def _boundedStep(normal, gradient, damping, params, lower):
+    diagonal = np.einsum("gkk->gk", normal) + 1e-12
+    damped = normal + damping[:, np.newaxis, np.newaxis] * np.einsum("gk,kl->gkl", diagonal, np.eye(len(lower)))
+    active = np.zeros(params.shape, dtype=bool)
+    for _ in range(len(lower)):
+        free = ~active
+        reduced = damped * (free[:, :, np.newaxis] & free[:, np.newaxis, :])
+        reduced += np.einsum("gk,kl->gkl", active.astype(float), np.eye(len(lower)))
+        step = np.linalg.solve(reduced, np.where(free, gradient, 0)[..., np.newaxis])[..., 0]
+        blocked = free & (params <= lower) & (step < 0)
+        if not blocked.any():
+            break
+        active |= blocked
+    return step
+
+
+# Levenberg–Marquardt on every group at once: each group has its own damping
+# and only accepts the steps that reduce its sum of squared residuals.
+#
+# initial   (groups x params) starting parameters (None means the
+#           linearized fit, see _initialParams).
+#
+# Returns the (groups x params) parameters and the (groups,) sums of squares.
+#
+def fitModel(name, p, speedup, mask, max_iterations = 100, tolerance = 1e-10, initial = None):
+    model, _, lower = MODELS[name]
+    if initial is None:
+        initial = _initialParams(name, p, speedup, mask)
+    params = np.maximum(initial, lower)
+
+    def sse(params):
+        prediction, _ = model(params, p)
+        return np.sum(np.where(mask, speedup - prediction, 0) ** 2, axis=1)
+
+    damping = np.full(len(params), 1e-3)
+    current = sse(params)
+    for _ in range(max_iterations):
+        prediction, jacobian = model(params, p)
+        residuals = np.where(mask, speedup - prediction, 0)
+        jacobian = jacobian * mask[..., np.newaxis]
+        normal = np.einsum("gnk,gnl->gkl", jacobian, jacobian)
+        gradient = np.einsum("gnk,gn->gk", jacobian, residuals)
+        step = _boundedStep(normal, gradient, damping, params, lower)
+
+        candidate = np.maximum(params + step, lower)
+        candidate_sse = sse(candidate)
+        improved = candidate_sse < current
+        params = np.where(improved[:, np.newaxis], candidate, params)
+        converged = np.abs(current - candidate_sse) <= tolerance * (current + tolerance)
+        current = np.where(improved, candidate_sse, current)
+        damping = np.where(improved, damping / 10, damping * 10)
+        if np.all(converged | (damping > 1e10)):
+            break
+    return params, current
+
+
+# Akaike information criterion of least squares fits, with the small sample
+# correction (AICc) when defined: the scaling curves have few points.
+def informationCriterion(sse, n, k):
+    aic = n * np.log(np.maximum(sse, 1e-300) / n) + 2 * k
+    correction = np.where(n - k - 1 > 0, 2 * k * (k + 1) / np.maximum(n - k - 1, 1), 0)
+    return aic + correction
+
+
+# Thread count maximizing the speedup predicted by a model and the speedup
+# there, NaN when unbounded: sqrt((1 - sigma) / kappa) for the USL (NaN
+# when kappa = 0, the peak is then 1 / sigma as for Amdahl), the thread
+# count reaching the cap for the capped model, NaN for Amdahl (its peak is
+# 1 / sigma) and for Gustafson (no peak).
+#
+# max_threads   (groups,) largest measured thread counts: a cap reached
+#               beyond them never bound the fit, so it is not identified and
+#               both values are NaN.
+#
+# Returns (optimal threads, peak speedup, cap identified).
+#
+def optimalThreads(name, params, max_threads):
+    identified = np.ones(len(params), dtype=bool)
+    sigma = params[:, 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        amdahl_peak = np.where(sigma > 0, 1 / sigma, np.nan)
+    if name == "USL":
+        kappa = params[:, 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p_star = np.where(kappa > 0, np.sqrt(np.maximum(1 - sigma, 0) / kappa), np.nan)
+    elif name == "Capped":
+        cap = params[:, 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p_star = np.where(cap * sigma < 1, cap * (1 - sigma) / (1 - cap * sigma), np.nan)
+        identified = p_star <= max_threads
+        p_star = np.where(identified, p_star, np.nan)
+    elif name == "Amdahl":
+        return np.full(len(params), np.nan), amdahl_peak, identified
+    else:
+        return np.full(len(params), np.nan), np.full(len(params), np.nan), identified
+    peak, _ = MODELS[name][0](params, np.where(np.isnan(p_star), 1, p_star)[:, np.newaxis])
+    peak = np.where(np.isnan(p_star), amdahl_peak if name == "USL" else np.nan, peak[:, 0])
+    return p_star, peak, identified
+
+
+### Fitting of the scaling results ###
+
+# Groups of the analysed results as padded (groups x points) arrays.
+def _groupArrays(results, keys, column):
+    groups = list(results.groupby(keys))
+    size = max(len(group) for _, group in groups)
+    p = np.ones((len(groups), size))
+    speedup = np.ones((len(groups), size))
+    mask = np.zeros((len(groups), size), dtype=bool)
+    for g, (_, group) in enumerate(groups):
+        group = group.sort_values("NumThreads")
+        p[g, :len(group)] = group["NumThreads"]
+        speedup[g, :len(group)] = group[column]
+        mask[g, :len(group)] = True
+    return [keys_values for keys_values, _ in groups], p, speedup, mask
+
+
+# Fit every model of a scaling kind to every group of analysed results.
+#
+# results   frame returned by analyseStrongScaling (SpeedUp is fitted) or
+#           analyseWeakScaling (ScaledSpeedUp is fitted).
+# kind      "strong" or "weak".
+#
+# Returns one row per (group, model) with the parameters, the residuals
+# (SSE, RMSE), the AICc and the best model of the group (lowest AICc), the
+# optimal thread count, the peak speedup and the throughput ceiling
+# (sequential throughput times the peak speedup), NaN when unbounded, and
+# whether the cap of the capped model binds within the measured thread
+# counts (CapIdentified).
+#
+def fitModels(results, kind = "strong"):
+    keys = STRONG_KEYS if kind == "strong" else WEAK_KEYS
+    column = "SpeedUp" if kind == "strong" else "ScaledSpeedUp"
+    results = results.dropna(subset=[column])
+    group_keys, p, speedup, mask = _groupArrays(results, keys, column)
+    n = mask.sum(axis=1)
+    max_threads = np.max(np.where(mask, p, 1), axis=1)
+
+    sequential = results[results["NumThreads"] == 1].set_index(keys)["Throughput_Mpix_s"]
+    sequential_throughput = np.array([sequential.get(k, np.nan) for k in group_keys], dtype=float)
+
+    fits = []
+    amdahl_params = None
+    for name in (STRONG_MODELS if kind == "strong" else WEAK_MODELS):
+        _, param_names, _ = MODELS[name]
+        params, sse = fitModel(name, p, speedup, mask)
+        if name == "Amdahl":
+            amdahl_params = params
+        elif amdahl_params is not None:
+            # a model nesting Amdahl never fits worse than it: keep the
+            # better of the fits from the linearized and the Amdahl start
+            nested_params, nested_sse = fitModel(name, p, speedup, mask,
+                                                 initial=_nestedParams(name, amdahl_params, p, mask))
+            better = nested_sse < sse
+            params = np.where(better[:, np.newaxis], nested_params, params)
+            sse = np.where(better, nested_sse, sse)
+        p_star, peak, identified = optimalThreads(name, params, max_threads)
+        fit = pd.DataFrame(list(group_keys), columns=keys)
+        fit["Model"] = name
+        for i, param_name in enumerate(param_names):
+            fit[param_name] = params[:, i]
+        fit["Points"] = n
+        fit["SSE"] = sse
+        fit["RMSE"] = np.sqrt(sse / n)
+        fit["AICc"] = informationCriterion(sse, n, len(param_names))
+        fit["OptimalThreads"] = p_star
+        fit["PeakSpeedUp"] = peak
+        fit["ThroughputCeiling_Mpix_s"] = sequential_throughput * peak
+        if name == "Capped":
+            fit["CapIdentified"] = identified
+        fits.append(fit)
+    fits = pd.concat(fits, ignore_index=True)
+    fits["Best"] = fits["AICc"] == fits.groupby(keys)["AICc"].transform("min")
+    return fits
+
+
+# Speedup predicted by a fitted model (a row of fitModels) at the thread counts p.
+def predictSpeedUp(fit, p):
+    model, param_names, _ = MODELS[fit["Model"]]
+    params = np.array([[fit[name] for name in param_names]], dtype=float)
+    prediction, _ = model(params, np.asarray(p, dtype=float)[np.newaxis, :])
+    return prediction[0]
+
+
+# One figure per group: measured speedups, the fitted curves (the best
+# model in bold) and their optimal thread counts.
+#
+# results       frame returned by analyseStrongScaling or analyseWeakScaling.
+# fits          frame returned by fitModels on the same results.
+# phys_cores    number of physical cores (None means detected on this host).
+#
+def plotModels(results, fits, kind = "strong", phys_cores = None, output_dir = ".",
+               show = True, prefix = ""):
+    phys_cores = resolvePhysicalCores(phys_cores)
+    keys = STRONG_KEYS if kind == "strong" else WEAK_KEYS
+    column = "SpeedUp" if kind == "strong" else "ScaledSpeedUp"
+    fit_groups = fits.groupby(keys)
+    multiple_configs = len(results[keys[2:]].drop_duplicates()) > 1
+    for group_keys, group in results.groupby(keys):
+        group_dim, kernel_dim, config = group_keys[0], group_keys[1], group_keys[2:]
+        group = group.sort_values("NumThreads")
+        threads = np.linspace(1, 2 * group["NumThreads"].max(), 400)
+
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.axvline(x=phys_cores, color="black", linestyle="--",
+                   linewidth=1.5, alpha=0.6, label="Max physical threads")
+        ax.plot(threads, threads, "--", color="green", alpha=0.4, label="ideal speedup")
+        ax.plot(group["NumThreads"], group[column], "o", color="black", label="measured")
+        for _, fit in fit_groups.get_group(group_keys).iterrows():
+            label = f"{fit['Model']} (AICc {fit['AICc']:.1f})"
+            line, = ax.plot(threads, predictSpeedUp(fit, threads),
+                            linewidth=2.5 if fit["Best"] else 1.2, label=label)
+            if np.isfinite(fit["OptimalThreads"]):
+                ax.axvline(x=fit["OptimalThreads"], color=line.get_color(), linestyle=":", alpha=0.8)
+        ax.set_xlabel("Threads number (p)")
+        ax.set_ylabel("SpeedUp" if kind == "strong" else "Scaled SpeedUp")
+        ax.grid(True, linestyle="--", alpha=0.6)
+        ax.legend(loc="best", fontsize=8)
+
+        config_suffix = f"_{configurationSuffix(config)}" if multiple_configs else ""
+        config_title = f" | {configurationLabel(config)}" if multiple_configs else ""
+        title = "Strong Scaling" if kind == "strong" else "Weak Scaling: W₀ ="
+        ax.set_title(f"Scaling models - {title} {group_dim} images | {kernel_dim}x{kernel_dim} kernels{config_title}")
+        fig.tight_layout()
+
+        filename = os.path.join(output_dir, f"{prefix}{kind}_models_{group_dim}_{kernel_dim}{config_suffix}.png")
+        fig.savefig(filename, dpi=150)
+        print(f"\nImage saved at {os.path.realpath(filename)}")
+        if show:
+            plt.show()
+        plt.close(fig)
+
+
+# Fit, print, save and draw the models of analysed results.
+def reportModels(results, kind = "strong", phys_cores = None, output_dir = ".",
+                 show = True, prefix = ""):
+    fits = fitModels(results, kind)
+    keys = STRONG_KEYS if kind == "strong" else WEAK_KEYS
+    print(f"\nBest scaling models ({kind} scaling):")
+    columns = keys[:2] + ["Model", "RMSE", "AICc", "OptimalThreads", "PeakSpeedUp", "ThroughputCeiling_Mpix_s"]
+    print(fits[fits["Best"]][columns].to_string(index=False, float_format="%.4f"))
+    filename = os.path.join(output_dir, f"{prefix}{kind}_models.csv")
+    fits.to_csv(filename, index=False)
+    print(f"\nTable saved at {os.path.realpath(filename)}")
+    plotModels(results, fits, kind, phys_cores, output_dir, show, prefix)
+    return fits
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fit Amdahl, Gustafson, USL and capped models to the scaling results.")
+    parser.add_argument("paths", nargs="+",
+                        help="scaling csv files (also experiments.py datasets) or directories")
+    parser.add_argument("--phys-cores", type=int, default=None,
+                        help="number of physical cores (default: detected on this host)")
+    parser.add_argument("-o", "--output-dir", default=".")
+    args = parser.parse_args()
+
+    files = [path for path in args.paths if os.path.isfile(path)]
+    files += findScalingCsv([path for path in args.paths if os.path.isdir(path)])
+    frames = [pd.read_csv(f) for f in files]
+    for kind, column in [("strong", "SpeedUp"), ("weak", "WeakEfficiency")]:
+        kind_frames = [df for df in frames if column in df.columns]
+        if not kind_frames:
+            continue
+        df = pd.concat(kind_frames, ignore_index=True)
+        # experiments.py datasets can mix the layouts
+        layouts = df.groupby("Layout") if "Layout" in df.columns else [("", df)]
+        for layout, data in layouts:
+            results = analyseStrongScaling(data, args.phys_cores) if kind == "strong" else analyseWeakScaling(data)
+            reportModels(results, kind, args.phys_cores, args.output_dir, show=False,
+                         prefix=f"{layout}_" if layout else "")
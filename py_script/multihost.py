@@ -0,0 +1,192 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from analysis import (analyseStrongScaling, analyseWeakScaling, configurationLabel,
+                      CONFIG_COLUMNS, STRONG_GROUP, WEAK_GROUP)
+from batch import findScalingCsv
+from hostinfo import HOST_JSON, hostId, loadHostFingerprint
+
+
+# Host columns added to every row (from the host.json of the result set):
+# HostId identifies the hardware, so the result sets of identical machines
+# are analysed together
+HOST_COLUMNS = ["HostId", "CpuModel", "PhysicalCores", "LogicalCores", "Bandwidth_GB_s"]
+# Fractions of the physical cores at which the hosts are compared
+CORE_FRACTIONS = [0.25, 0.5, 1.0]
+
+
+# Short name of a host in the legends, e.g. "Intel(R) Xeon(R) Gold 6130 (16 cores)".
+def hostLabel(host):
+    return f"{host['CpuModel']} ({host['PhysicalCores']} cores)"
+
+
+# Rows of a result set of a single host: an experiments.py sweep directory
+# (<kind>_scaling.csv) or any data directory of scaling csv files, with the
+# host.json written on its machine (experiments.py, or python hostinfo.py --save).
+#
+def loadResultSet(result_dir, kind = "strong"):
+    host_filename = os.path.join(result_dir, HOST_JSON)
+    if not os.path.exists(host_filename):
+        raise ValueError(f"Missing {host_filename}: create it on the machine of the results "
+                         f"with python hostinfo.py --save {HOST_JSON}")
+    host = loadHostFingerprint(host_filename)
+
+    dataset_filename = os.path.join(result_dir, f"{kind}_scaling.csv")
+    if os.path.exists(dataset_filename):
+        df = pd.read_csv(dataset_filename)
+    else:
+        column = "SpeedUp" if kind == "strong" else "WeakEfficiency"
+        frames = []
+        for csv_filename in findScalingCsv([result_dir]):
+            frame = pd.read_csv(csv_filename)
+            if column in frame.columns:
+                parts = os.path.realpath(csv_filename).split(os.sep)
+                frame["Layout"] = next((part for part in reversed(parts) if part in ("AoS", "SoA")), "AoS")
+                frames.append(frame)
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    for column in HOST_COLUMNS:
+        df[column] = host.get(column, np.nan)
+    # recomputed: the HostId of older fingerprints also hashed the hostname
+    df["HostId"] = hostId(host)
+    return df
+
+
+# Result sets of several hosts merged in one frame.
+def loadHosts(result_dirs, kind = "strong"):
+    frames = [loadResultSet(result_dir, kind) for result_dir in result_dirs]
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        raise ValueError(f"No {kind} scaling results in {result_dirs}")
+    return pd.concat(frames, ignore_index=True)
+
+
+# Analyse every host with its own number of physical cores and add the
+# normalized measures:
+#   CoreFraction                NumThreads / PhysicalCores
+#   ThroughputPerCore_Mpix_s    throughput per physical core of the host
+#   ThroughputPerUsedCore_Mpix_s    throughput per physical core in use
+#   ThroughputPerBandwidth_Mpix_GB  throughput per GB/s of memory bandwidth
+#
+def compareHosts(df, kind = "strong"):
+    frames = []
+    for (host_id, layout), data in df.groupby(["HostId", "Layout"]):
+        host = data.iloc[0]
+        phys_cores = int(host["PhysicalCores"])
+        if kind == "strong":
+            results = analyseStrongScaling(data, phys_cores)
+        else:
+            results = analyseWeakScaling(data)
+        results["Layout"] = layout
+        for column in HOST_COLUMNS:
+            results[column] = host[column]
+        frames.append(results)
+    results = pd.concat(frames, ignore_index=True)
+    results["CoreFraction"] = results["NumThreads"] / results["PhysicalCores"]
+    results["ThroughputPerCore_Mpix_s"] = results["Throughput_Mpix_s"] / results["PhysicalCores"]
+    results["ThroughputPerUsedCore_Mpix_s"] = (
+        results["Throughput_Mpix_s"] / np.minimum(results["NumThreads"], results["PhysicalCores"]))
+    results["ThroughputPerBandwidth_Mpix_GB"] = results["Throughput_Mpix_s"] / results["Bandwidth_GB_s"]
+    return results
+
+
+def _efficiencyColumn(kind):
+    return "Efficiency" if kind == "strong" else "WeakEfficiency"
+
+
+# One row per (host, layout, group, configuration): the best thread count and
+# its throughput (absolute and normalized) and the efficiency at every
+# fraction of CORE_FRACTIONS (interpolated in log2 of the fraction, NaN
+# outside of the measured thread counts).
+#
+def hostSummary(results, kind = "strong"):
+    group = STRONG_GROUP if kind == "strong" else WEAK_GROUP
+    keys = ["HostId", "Layout"] + group + CONFIG_COLUMNS
+    efficiency = _efficiencyColumn(kind)
+    rows = []
+    for key_values, data in results.groupby(keys):
+        data = data.sort_values("NumThreads")
+        best = data.loc[data["Throughput_Mpix_s"].idxmax()]
+        row = dict(zip(keys, key_values))
+        row.update({
+            "CpuModel": best["CpuModel"],
+            "PhysicalCores": best["PhysicalCores"],
+            "BestThreads": best["NumThreads"],
+            "PeakThroughput_Mpix_s": best["Throughput_Mpix_s"],
+            "PeakThroughputPerCore_Mpix_s": best["ThroughputPerCore_Mpix_s"],
+            "PeakThroughputPerBandwidth_Mpix_GB": best["ThroughputPerBandwidth_Mpix_GB"],
+        })
+        log_fractions = np.log2(data["CoreFraction"].values)
+        for fraction in CORE_FRACTIONS:
+            inside = log_fractions.min() <= np.log2(fraction) <= log_fractions.max()
+            row[f"{efficiency}At{fraction:g}"] = (
+                np.interp(np.log2(fraction), log_fractions, data[efficiency].values) if inside else np.nan)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# One figure per (layout, group) with one curve per host (and configuration):
+# throughput per physical core and efficiency against the core fraction.
+#
+def plotHosts(results, kind = "strong", output_dir = ".", show = True):
+    group = STRONG_GROUP if kind == "strong" else WEAK_GROUP
+    efficiency = _efficiencyColumn(kind)
+    panels = [("ThroughputPerCore_Mpix_s", "Throughput per physical core (Mpix/s)"),
+              (efficiency, "Efficiency" if kind == "strong" else "Weak Efficiency")]
+    multiple_configs = len(results[CONFIG_COLUMNS].drop_duplicates()) > 1
+    for (layout, group_dim, kernel_dim), data in results.groupby(["Layout"] + group):
+        fig, axes = plt.subplots(1, 2, figsize=(14, 6), sharex=True)
+        for ax, (column, ylabel) in zip(axes, panels):
+            ax.axvline(x=1, color="black", linestyle="--", linewidth=1.5, alpha=0.6,
+                       label="All physical cores")
+            for (host_id, *config), curve in data.groupby(["HostId"] + CONFIG_COLUMNS):
+                curve = curve.sort_values("NumThreads")
+                label = hostLabel(curve.iloc[0])
+                if multiple_configs:
+                    label += f" | {configurationLabel(config)}"
+                ax.plot(curve["CoreFraction"], curve[column], marker="o", linestyle="-",
+                        markersize=5, label=label)
+            ax.set_xscale("log", base=2)
+            ax.set_xlabel("Fraction of the physical cores (p / cores)")
+            ax.set_ylabel(ylabel)
+            ax.grid(True, linestyle="--", alpha=0.6)
+        axes[-1].legend(loc="best", fontsize=8)
+
+        title = "Strong Scaling" if kind == "strong" else "Weak Scaling: W₀ ="
+        fig.suptitle(f"Hosts comparison ({layout}) - {title} {group_dim} images | {kernel_dim}x{kernel_dim} kernels")
+        fig.tight_layout()
+
+        filename = os.path.join(output_dir, f"hosts_{kind}_{layout}_{group_dim}_{kernel_dim}.png")
+        fig.savefig(filename, dpi=150)
+        print(f"\nImage saved at {os.path.realpath(filename)}")
+        if show:
+            plt.show()
+        plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Merge the scaling results of several hosts and compare them per physical core.")
+    parser.add_argument("result_dirs", nargs="+",
+                        help="experiments.py sweeps or data directories, each with its host.json")
+    parser.add_argument("--kinds", nargs="+", choices=["strong", "weak"], default=["strong", "weak"])
+    parser.add_argument("-o", "--output-dir", default=".")
+    args = parser.parse_args()
+
+    for kind in args.kinds:
+        try:
+            df = loadHosts(args.result_dirs, kind)
+        except ValueError as error:
+            print(error)
+            continue
+        results = compareHosts(df, kind)
+        summary = hostSummary(results, kind)
+        print(f"\nHosts comparison ({kind} scaling):")
+        print(summary.drop(columns=CONFIG_COLUMNS).to_string(index=False, float_format="%.4f"))
+        filename = os.path.join(args.output_dir, f"hosts_{kind}_summary.csv")
+        summary.to_csv(filename, index=False)
+        print(f"\nTable saved at {os.path.realpath(filename)}")
+        plotHosts(results, kind, args.output_dir, show=False)
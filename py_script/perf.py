@@ -0,0 +1,265 @@
+import argparse
+import os
+import shutil
+import subprocess
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from analysis import analyseStrongScaling, analyseWeakScaling, megapixels, STRONG_KEYS, WEAK_KEYS
+from experiments import CSV_RADIX, executablePath
+from hostinfo import resolvePhysicalCores
+
+
+# Generic perf events: stalled-cycles-backend is not supported by every PMU
+# (e.g. recent Intel cores), unsupported events are simply left empty.
+DEFAULT_EVENTS = ["cycles", "instructions", "cache-references", "cache-misses",
+                  "LLC-loads", "LLC-load-misses", "stalled-cycles-backend"]
+
+COUNTERS_CSV = "counters.csv"
+SCALING_CSV = "scaling.csv"
+PERF_OUTPUT = "perf_stat.txt"
+
+
+# Counters of a "perf stat -x," output file: {event: value}. Values that
+# were not counted or not supported are NaN. Events split over several PMUs
+# (e.g. cpu_core/cycles/ and cpu_atom/cycles/ of hybrid CPUs) are summed and
+# the modifiers (":u") dropped.
+#
+def parsePerfStat(filename):
+    counters = {}
+    with open(filename) as perf_file:
+        for line in perf_file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split(",")
+            if len(fields) < 3:
+                continue
+            value, event = fields[0], fields[2]
+            event = event.split(":")[0]
+            if "/" in event:
+                event = event.strip("/").split("/")[-1]
+            try:
+                value = float(value)
+            except ValueError:
+                # <not counted>, <not supported>
+                value = np.nan
+            previous = counters.get(event, np.nan)
+            counters[event] = value if np.isnan(previous) else previous + np.nan_to_num(value)
+    return counters
+
+
+# perf stat command line of an executable. With bracket the counters start
+# disabled and are enabled by the executable only around the convolutions
+# (see counters::resume in src/expt/counters), through the control pipes.
+#
+def perfCommand(command, events, output_filename, control_fds = None):
+    perf = ["perf", "stat", "-x,", "-o", output_filename, "-e", ",".join(events)]
+    if control_fds is not None:
+        perf += ["-D", "-1", "--control", f"fd:{control_fds[0]},{control_fds[1]}"]
+    return perf + ["--"] + command
+
+
+# Execute one scaling run per thread count under perf stat.
+#
+# build_dir     build directory of a layout (with the scaling executables).
+# kind          "strong" or "weak".
+# thread_counts thread counts to measure (1 is always added: it is the
+#               reference of the speedups).
+# events        perf events to count.
+# output_dir    directory of the runs: one p<threads> sub-directory per count
+#               plus counters.csv and scaling.csv.
+# bracket       count only the convolutions (needs perf >= 5.11); False
+#               counts the whole process, image loading included.
+# workload_dir  raw workloads of the weak scaling runs (see workload.py).
+#
+# Returns the (scaling, counters) frames, also saved in output_dir.
+#
+def runCounters(build_dir, kind = "strong", image_quality = 4, order = 7, num_reps = 3,
+                thread_counts = None, events = DEFAULT_EVENTS, output_dir = "perf",
+                bracket = True, workload_dir = None):
+    if shutil.which("perf") is None:
+        raise RuntimeError("perf is not installed (e.g. linux-tools or linux-perf packages).")
+    if thread_counts is None:
+        thread_counts = [1 << i for i in range((os.cpu_count() or 1).bit_length())]
+    thread_counts = sorted(set(thread_counts) | {1})
+
+    exe = executablePath(build_dir, kind)
+    scaling, counters = [], []
+    for num_threads in thread_counts:
+        run_dir = os.path.join(output_dir, f"p{num_threads}")
+        os.makedirs(run_dir, exist_ok=True)
+        command = [exe, str(image_quality), str(order), str(num_reps), "0", "0"]
+        if kind == "weak" and workload_dir:
+            command.append(os.path.realpath(workload_dir))
+        env = dict(os.environ, OMP_NUM_THREADS=str(num_threads), KIP_NUM_THREADS=str(num_threads))
+
+        # perf reads the commands from ctl and answers on ack
+        ctl_read, ctl_write = os.pipe()
+        ack_read, ack_write = os.pipe()
+        control_fds = (ctl_read, ack_write) if bracket else None
+        if bracket:
+            env.update(PERF_CTL_FD=str(ctl_write), PERF_ACK_FD=str(ack_read))
+        perf_filename = os.path.join(run_dir, PERF_OUTPUT)
+        print(f"\n[p={num_threads}] {' '.join(perfCommand(command, events, perf_filename, control_fds))}")
+        try:
+            with open(os.path.join(run_dir, "stdout.log"), "w") as out, \
+                    open(os.path.join(run_dir, "stderr.log"), "w") as err:
+                completed = subprocess.run(perfCommand(command, events, perf_filename, control_fds),
+                                           cwd=run_dir, env=env, stdout=out, stderr=err,
+                                           pass_fds=(ctl_read, ctl_write, ack_read, ack_write))
+        finally:
+            for fd in (ctl_read, ctl_write, ack_read, ack_write):
+                os.close(fd)
+        if completed.returncode != 0:
+            print(f"  failed with code {completed.returncode} (see {run_dir})")
+            continue
+
+        data = pd.read_csv(os.path.join(run_dir, f"{CSV_RADIX[kind]}_{image_quality}K_{order}.csv"))
+        scaling.append(data)
+        counters.append({"NumThreads": num_threads, "KernelDimension": order, "NumReps": num_reps,
+                         "Pixels": megapixels(data["ImageDimension"]).sum() * 1e6 * num_reps,
+                         **parsePerfStat(perf_filename)})
+
+    if not scaling:
+        raise RuntimeError(f"No successful run in {output_dir}")
+    scaling = rescale(pd.concat(scaling, ignore_index=True), kind)
+    counters = pd.DataFrame(counters)
+    scaling.to_csv(os.path.join(output_dir, SCALING_CSV), index=False)
+    counters.to_csv(os.path.join(output_dir, COUNTERS_CSV), index=False)
+    print(f"\nTable saved at {os.path.realpath(os.path.join(output_dir, COUNTERS_CSV))}")
+    return scaling, counters
+
+
+# Recompute the columns relative to the sequential run: every thread count
+# ran in its own process (KIP_NUM_THREADS), so the executables only knew
+# their own time.
+#
+def rescale(df, kind):
+    df = df.copy()
+    sequential = df[df["NumThreads"] == 1].set_index("ImageName")["TimePerRep_s"]
+    ratio = df["ImageName"].map(sequential) / df["TimePerRep_s"]
+    if kind == "strong":
+        df["SpeedUp"] = ratio
+        df["Efficiency"] = ratio / df["NumThreads"]
+    else:
+        # the unit of work is the image loaded once, stacked p times in height
+        sizes = df["ImageDimension"].str.split("x", expand=True).astype(int)
+        df["UnitOfWork"] = sizes[0].astype(str) + "x" + (sizes[1] // df["NumThreads"]).astype(str)
+        df["WeakEfficiency"] = ratio
+        df["ScaledSpeedUp"] = df["NumThreads"] * ratio
+    return df
+
+
+# Derived hardware metrics of the counters of every thread count:
+# IPC, cycles and LLC misses per pixel and fraction of backend stalled cycles.
+# LLC misses fall back on cache-misses when LLC-load-misses is not available.
+#
+def counterMetrics(counters):
+    metrics = counters.copy()
+    column = lambda event: metrics[event] if event in metrics.columns else pd.Series(np.nan, index=metrics.index)
+    misses = column("LLC-load-misses").fillna(column("cache-misses"))
+    metrics["IPC"] = column("instructions") / column("cycles")
+    metrics["CyclesPerPixel"] = column("cycles") / metrics["Pixels"]
+    metrics["LLCMissesPerPixel"] = misses / metrics["Pixels"]
+    metrics["BackendStallFraction"] = column("stalled-cycles-backend") / column("cycles")
+    return metrics
+
+
+# Join the hardware metrics to the analysed scaling results (one row per
+# thread count of the measured group).
+#
+def analyseCounters(scaling, counters, kind = "strong", phys_cores = None):
+    if kind == "strong":
+        results = analyseStrongScaling(scaling, phys_cores)
+    else:
+        results = analyseWeakScaling(scaling)
+    return results.merge(counterMetrics(counters), on=["KernelDimension", "NumThreads"], how="left")
+
+
+# IPC, LLC misses per pixel and Karp–Flatt metric (strong scaling) or weak
+# efficiency (weak scaling) against the thread count, side by side.
+#
+# results       frame returned by analyseCounters.
+# phys_cores    number of physical cores (None means detected on this host).
+#
+def plotCounters(results, kind = "strong", phys_cores = None, output_dir = ".", show = True):
+    phys_cores = resolvePhysicalCores(phys_cores)
+    keys = STRONG_KEYS if kind == "strong" else WEAK_KEYS
+    last_panel = ("KarpFlatt", "Karp–Flatt f(p)") if kind == "strong" else ("WeakEfficiency", "Weak Efficiency")
+    panels = [("IPC", "Instructions per cycle"), ("LLCMissesPerPixel", "LLC misses per pixel"), last_panel]
+
+    for (group_dim, kernel_dim, *_), group in results.groupby(keys):
+        group = group.sort_values("NumThreads")
+        fig, axes = plt.subplots(1, 3, figsize=(18, 5.5), sharex=True)
+        for ax, (column, ylabel) in zip(axes, panels):
+            ax.axvline(x=phys_cores, color="black", linestyle="--",
+                       linewidth=1.5, alpha=0.6, label="Max physical threads")
+            ax.plot(group["NumThreads"], group[column], marker="o", linestyle="-", markersize=5)
+            ax.set_xscale("log", base=2)
+            ax.set_xlabel("Threads number (p)")
+            ax.set_ylabel(ylabel)
+            ax.grid(True, linestyle="--", alpha=0.6)
+        axes[0].legend(loc="best", fontsize=8)
+
+        title = "Strong Scaling" if kind == "strong" else "Weak Scaling: W₀ ="
+        fig.suptitle(f"Hardware counters - {title} {group_dim} images | {kernel_dim}x{kernel_dim} kernels")
+        fig.tight_layout()
+
+        filename = os.path.join(output_dir, f"{kind}_counters_{group_dim}_{kernel_dim}.png")
+        fig.savefig(filename, dpi=150)
+        print(f"\nImage saved at {os.path.realpath(filename)}")
+        if show:
+            plt.show()
+        plt.close(fig)
+
+
+# Table of the thread counts with the scaling and the hardware metrics.
+def counterTable(results, kind = "strong"):
+    scaling_columns = ["SpeedUp", "KarpFlatt"] if kind == "strong" else ["WeakEfficiency"]
+    columns = ["NumThreads", "TimePerRep_s"] + scaling_columns + \
+              ["IPC", "CyclesPerPixel", "LLCMissesPerPixel", "BackendStallFraction"]
+    return results[columns]
+
+
+def loadCounters(output_dir):
+    return (pd.read_csv(os.path.join(output_dir, SCALING_CSV)),
+            pd.read_csv(os.path.join(output_dir, COUNTERS_CSV)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Hardware counters (perf stat) of the scaling experiments.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the experiment under perf stat")
+    run_parser.add_argument("build_dir")
+    run_parser.add_argument("--kind", choices=["strong", "weak"], default="strong")
+    run_parser.add_argument("--quality", type=int, default=4)
+    run_parser.add_argument("--order", type=int, default=7)
+    run_parser.add_argument("--num-reps", type=int, default=3)
+    run_parser.add_argument("--threads", type=int, nargs="+", default=None)
+    run_parser.add_argument("--events", nargs="+", default=DEFAULT_EVENTS)
+    run_parser.add_argument("--whole-process", action="store_true",
+                            help="count the whole process, not only the convolutions")
+    run_parser.add_argument("--workload-dir", default=None)
+
+    plot_parser = commands.add_parser("plot", help="analyse the runs of an output directory")
+    plot_parser.add_argument("--kind", choices=["strong", "weak"], default="strong")
+
+    for sub_parser in (run_parser, plot_parser):
+        sub_parser.add_argument("--phys-cores", type=int, default=None)
+        sub_parser.add_argument("-o", "--output-dir", default="perf")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        scaling, counters = runCounters(args.build_dir, args.kind, args.quality, args.order,
+                                        args.num_reps, args.threads, args.events, args.output_dir,
+                                        not args.whole_process, args.workload_dir)
+    else:
+        scaling, counters = loadCounters(args.output_dir)
+    results = analyseCounters(scaling, counters, args.kind, args.phys_cores)
+    print(counterTable(results, args.kind).to_string(index=False, float_format="%.4f"))
+    plotCounters(results, args.kind, args.phys_cores, args.output_dir, show=False)
@@ -0,0 +1,224 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from analysis import megapixels
+from batch import findScalingCsv
+from hostinfo import loadHostFingerprint, resolvePhysicalCores
+
+
+# Minimum number of distinct (megapixels, order) points for a thread count to
+# get its own exponents: the others share the exponents of all the data.
+MIN_POINTS_PER_THREADS = 4
+
+
+# Strong scaling rows of the results store (see store.py) or of csv files
+# and directories, as (Megapixels, KernelDimension, NumThreads, TimePerRep_s).
+#
+# sources   csv files or directories (ignored when store_root is given).
+# layout    keep only this layout ("AoS" or "SoA") when the rows record it.
+#
+def loadTimings(sources = (), store_root = None, layout = "AoS"):
+    if store_root is not None:
+        # imported here: the store needs pyarrow
+        from store import ResultStore
+        df = ResultStore(store_root).query("strong", Layout=layout)
+    else:
+        files = [path for path in sources if os.path.isfile(path)]
+        files += findScalingCsv([path for path in sources if os.path.isdir(path)])
+        frames = [pd.read_csv(f) for f in files]
+        frames = [df for df in frames if "SpeedUp" in df.columns]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if layout is not None and "Layout" in df.columns:
+            df = df[df["Layout"] == layout]
+    if df.empty:
+        raise ValueError("No strong scaling results found.")
+    return pd.DataFrame({
+        "Megapixels": megapixels(df["ImageDimension"]),
+        "KernelDimension": df["KernelDimension"].values,
+        "NumThreads": df["NumThreads"].values,
+        "TimePerRep_s": df["TimePerRep_s"].values,
+    })
+
+
+def _features(mpix, order):
+    mpix, order = np.broadcast_arrays(np.asarray(mpix, dtype=float), np.asarray(order, dtype=float))
+    return np.column_stack([np.ones(mpix.size), np.log(mpix.ravel()), np.log(order.ravel())])
+
+
+# Log-linear time model of every measured thread count:
+# log t = a_p + b_p log(megapixels) + c_p log(order).
+# Thread counts with too few distinct points keep the exponents (b, c)
+# fitted on all the data, with their own intercept.
+#
+# timings   frame returned by loadTimings.
+#
+# Returns a frame indexed by NumThreads with columns a, b, c, Points and RMSE
+# (of log t, i.e. the relative error of the prediction).
+#
+def fitTimeModel(timings):
+    timings = timings[timings["TimePerRep_s"] > 0]
+    log_time = np.log(timings["TimePerRep_s"].values)
+    features = _features(timings["Megapixels"].values, timings["KernelDimension"].values)
+
+    # shared exponents: one intercept per thread count
+    threads = np.sort(timings["NumThreads"].unique())
+    intercepts = (timings["NumThreads"].values[:, np.newaxis] == threads).astype(float)
+    shared, *_ = np.linalg.lstsq(np.column_stack([intercepts, features[:, 1:]]), log_time, rcond=None)
+
+    rows = []
+    for t, num_threads in enumerate(threads):
+        selected = timings["NumThreads"].values == num_threads
+        points = len(timings[selected][["Megapixels", "KernelDimension"]].drop_duplicates())
+        if points >= MIN_POINTS_PER_THREADS and np.linalg.matrix_rank(features[selected]) == 3:
+            coefficients, *_ = np.linalg.lstsq(features[selected], log_time[selected], rcond=None)
+        else:
+            coefficients = np.array([shared[t], shared[-2], shared[-1]])
+        residuals = log_time[selected] - features[selected] @ coefficients
+        rows.append({"NumThreads": num_threads, "a": coefficients[0], "b": coefficients[1],
+                     "c": coefficients[2], "Points": points,
+                     "RMSE": float(np.sqrt(np.mean(residuals ** 2)))})
+    return pd.DataFrame(rows).set_index("NumThreads")
+
+
+# Predicted time per repetition of an image of mpix megapixels convolved
+# with an order x order kernel, for every thread count in threads: log t is
+# interpolated linearly in log p between the measured thread counts (NaN
+# outside of them).
+#
+def predictTime(model, mpix, order, threads):
+    measured = model.index.values.astype(float)
+    log_times = model[["a", "b", "c"]].values @ _features(mpix, order)[0]
+    log_threads = np.log(np.asarray(threads, dtype=float))
+    interpolated = np.interp(log_threads, np.log(measured), log_times)
+    outside = (log_threads < np.log(measured.min())) | (log_threads > np.log(measured.max()))
+    return np.where(outside, np.nan, np.exp(interpolated))
+
+
+# Throughput ceiling (Mpix/s) of the memory bandwidth of a node for the
+# convolution of a width x height image (ideal reuse, see roofline.py).
+#
+# bandwidth     memory bandwidth of the node, in GB/s.
+#
+def bandwidthCeiling(bandwidth, width, height, order):
+    # imported here: roofline imports pyplot
+    from roofline import bytesPerPixel
+    return bandwidth * 1e3 / float(bytesPerPixel(width, height, order))
+
+
+# Thread count of a job maximizing the aggregate throughput of a node
+# running floor(cores / p) such jobs at once, under the job constraints.
+# The jobs share the memory of the node: their aggregate throughput can be
+# capped by the memory bandwidth (bandwidth_ceiling) and by the throughput of
+# the fastest single job on the node divided by memory_bound_fraction, and
+# among the thread counts reaching the cap the one with the lowest latency
+# is recommended. Without either cap the jobs are assumed independent.
+#
+# model             frame returned by fitTimeModel.
+# width, height     image size of the job.
+# order             kernel order of the job.
+# cores             cores of the node shared by the jobs (None means the
+#                   physical cores of this host).
+# max_latency       maximum time per convolution of a job, in seconds.
+# min_efficiency    minimum parallel efficiency t(1) / (p t(p)) of a job
+#                   (the model needs a measured sequential time).
+# memory_bound_fraction
+#                   None, or the measured fraction of the time of the fastest
+#                   job spent on the shared resources of the node (1 means
+#                   that a single job already saturates them).
+# bandwidth_ceiling None, or the cap of the aggregate throughput set by the
+#                   memory bandwidth, in Mpix/s (see bandwidthCeiling).
+#
+# Returns (recommendation, candidates): the recommendation is a dict with
+# NumThreads, PredictedTime_s, Efficiency, ConcurrentJobs,
+# AggregateThroughput_Mpix_s, Saturated (True when the throughput is capped)
+# and Feasible (False when no thread count meets the constraints: the
+# fastest one is then recommended); candidates is the frame of every thread
+# count evaluated.
+#
+def recommend(model, width, height, order, cores = None, max_latency = None,
+              min_efficiency = None, memory_bound_fraction = None,
+              bandwidth_ceiling = None):
+    if memory_bound_fraction is not None and not 0 < memory_bound_fraction <= 1:
+        raise ValueError(f"The memory bound fraction must be in (0, 1]: {memory_bound_fraction}")
+    if 1 not in model.index:
+        raise ValueError("No sequential (NumThreads == 1) results: the efficiency is undefined.")
+    cores = resolvePhysicalCores(cores)
+    mpix = width * height * 1e-6
+    threads = np.arange(1, min(cores, int(model.index.max())) + 1)
+    times = predictTime(model, mpix, order, threads)
+
+    candidates = pd.DataFrame({"NumThreads": threads, "PredictedTime_s": times})
+    sequential_time = predictTime(model, mpix, order, [1])[0]
+    candidates["Efficiency"] = sequential_time / (threads * times)
+    candidates["ConcurrentJobs"] = cores // threads
+    ceiling = np.inf
+    if memory_bound_fraction is not None:
+        ceiling = np.nanmax(mpix / times) / memory_bound_fraction
+    if bandwidth_ceiling is not None:
+        ceiling = min(ceiling, bandwidth_ceiling)
+    throughput = candidates["ConcurrentJobs"] * mpix / times
+    candidates["AggregateThroughput_Mpix_s"] = np.minimum(throughput, ceiling)
+    candidates["Saturated"] = throughput >= ceiling
+    feasible = candidates["PredictedTime_s"].notna()
+    if max_latency is not None:
+        feasible &= candidates["PredictedTime_s"] <= max_latency
+    if min_efficiency is not None:
+        feasible &= candidates["Efficiency"] >= min_efficiency
+    candidates["Feasible"] = feasible
+
+    if feasible.any():
+        best = candidates[feasible].sort_values(
+            ["AggregateThroughput_Mpix_s", "PredictedTime_s"], ascending=[False, True]).iloc[0]
+    else:
+        best = candidates.loc[candidates["PredictedTime_s"].idxmin()]
+    return best.to_dict(), candidates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Recommend the thread count of a convolution job from past scaling results.")
+    parser.add_argument("sources", nargs="*", help="strong scaling csv files or directories")
+    parser.add_argument("--store", default=None, help="results store root (see store.py)")
+    parser.add_argument("--layout", choices=["AoS", "SoA"], default="AoS")
+    parser.add_argument("--size", required=True, help="image size of the job, WxH (e.g. 6000x4000)")
+    parser.add_argument("--order", type=int, required=True, help="kernel order of the job")
+    parser.add_argument("--cores", type=int, default=None,
+                        help="cores shared by the jobs (default: physical cores of the --host "
+                             "fingerprint, else of this host)")
+    parser.add_argument("--max-latency", type=float, default=None, help="seconds per convolution")
+    parser.add_argument("--min-efficiency", type=float, default=None)
+    parser.add_argument("--memory-bound-fraction", type=float, default=None,
+                        help="measured fraction of the time of a job using the whole node spent "
+                             "on the shared resources: caps the aggregate throughput")
+    parser.add_argument("--host", default=None,
+                        help="host fingerprint of the node (see hostinfo.py): its Bandwidth_GB_s "
+                             "caps the aggregate throughput")
+    parser.add_argument("--candidates", action="store_true", help="print every thread count")
+    args = parser.parse_args()
+
+    model = fitTimeModel(loadTimings(args.sources, args.store, args.layout))
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    bandwidth_ceiling = None
+    if args.host is not None:
+        host = loadHostFingerprint(args.host)
+        args.cores = args.cores or host.get("PhysicalCores")
+        bandwidth = host.get("Bandwidth_GB_s")
+        if bandwidth is None:
+            print(f"No Bandwidth_GB_s in {args.host}: the memory bandwidth does not cap the node.")
+        else:
+            bandwidth_ceiling = bandwidthCeiling(bandwidth, width, height, args.order)
+    best, candidates = recommend(model, width, height, args.order, args.cores,
+                                 args.max_latency, args.min_efficiency,
+                                 args.memory_bound_fraction, bandwidth_ceiling)
+    if args.candidates:
+        print(candidates.to_string(index=False, float_format="%.4f"))
+    if not best["Feasible"]:
+        print("\nNo thread count meets the constraints: the fastest one is recommended.")
+    print(f"\nRecommended threads: {int(best['NumThreads'])} "
+          f"({int(best['ConcurrentJobs'])} concurrent jobs), "
+          f"predicted time {best['PredictedTime_s']:.4f} s, efficiency {best['Efficiency']:.2f}, "
+          f"aggregate throughput {best['AggregateThroughput_Mpix_s']:.2f} Mpix/s"
+          + (" (node saturated)" if best["Saturated"] else ""))
@@ -0,0 +1,301 @@
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+import matplotlib.image as mpimg
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+MIN_VALUE = 0
+MAX_VALUE = 255
+
+METHODS = ["direct", "separable", "fft"]
+# orders from which "auto" prefers the FFT to the direct convolution
+FFT_MIN_ORDER = 15
+
+# output images of profile.cpp: <imageName>_<kernelName><order>.jpg
+OUTPUT_PATTERN = re.compile(r"^(?P<image>.+)_(?P<kernel>[A-Za-z]+)(?P<order>\d+)\.jpg$")
+
+
+### Kernels (as KernelFactory) ###
+
+def _checkOrderValidity(order):
+    if order % 2 == 0:
+        raise ValueError("Kernel order must be odd.")
+
+
+def createBoxBlurKernel(order):
+    _checkOrderValidity(order)
+    mean = np.float32(1) / np.float32(order * order)
+    return np.full((order, order), mean, dtype=np.float32)
+
+
+def createEdgeDetectionKernel(order):
+    _checkOrderValidity(order)
+    weights = np.full((order, order), -1, dtype=np.float32)
+    core_weight = order * order - 1
+
+    core_point = order // 2
+    for k in range(1, core_point):
+        difference = 1 << (k - 1)
+        weights[k:order - k, k:order - k] -= np.float32(difference)
+        core_weight += difference * ((order - 2 * k) ** 2 - 1)
+    weights[core_point, core_point] = np.float32(core_weight)
+    return weights
+
+
+KERNELS = {
+    "boxBlur": createBoxBlurKernel,
+    "edgeDetection": createEdgeDetectionKernel,
+}
+
+
+### Image processing (as ImageProcessing) ###
+
+# Load a RGB image as a (height, width, 3) uint8 array.
+# Note: the decoder (Pillow) may differ from stb_image by a few levels.
+#
+def loadImage(filename):
+    image = mpimg.imread(filename)
+    if image.dtype != np.uint8:
+        image = np.round(image * MAX_VALUE).astype(np.uint8)
+    return np.ascontiguousarray(image[..., :3])
+
+
+# Replicate the border pixels (and the corners) padding times on every side.
+def extendEdge(image, padding):
+    return np.pad(image, ((padding, padding), (padding, padding), (0, 0)), mode="edge")
+
+
+# Clamp float channels to [0, 255] and truncate them, as getChannelAsUint8.
+def toUint8(channels):
+    return np.clip(channels, MIN_VALUE, MAX_VALUE).astype(np.uint8)
+
+
+# Bit-exact convolution: float32 accumulation of the same products in the
+# same (j, i) order of the C++ loop, one shifted window view per weight.
+#
+def _directConvolution(image, weights):
+    order = weights.shape[0]
+    windows = sliding_window_view(image, (order, order), axis=(0, 1))
+    accumulator = np.zeros(windows.shape[:3], dtype=np.float32)
+    product = np.empty_like(accumulator)
+    for j in range(order):
+        for i in range(order):
+            np.multiply(windows[..., j, i], weights[j, i], out=product, dtype=np.float32)
+            np.add(accumulator, product, out=accumulator)
+    return accumulator
+
+
+# Box blur as two running sums (exact in integers) scaled by the mean weight:
+# O(1) per pixel, within one level of the direct convolution.
+#
+def _separableConvolution(image, weights):
+    order = weights.shape[0]
+    sums = np.cumsum(image, axis=0, dtype=np.int64)
+    sums = np.concatenate([sums[order - 1:order], sums[order:] - sums[:-order]], axis=0)
+    sums = np.cumsum(sums, axis=1)
+    sums = np.concatenate([sums[:, order - 1:order], sums[:, order:] - sums[:, :-order]], axis=1)
+    return sums.astype(np.float32) * weights[0, 0]
+
+
+# Correlation through the FFT (float64): only the valid part of the circular
+# correlation is kept, which is the output of the convolution. Values within
+# rounding noise of an integer are snapped to it, so that the truncation of
+# toUint8 matches the exact sums of integer kernels (edgeDetection).
+#
+def _fftConvolution(image, weights):
+    order = weights.shape[0]
+    height, width = image.shape[:2]
+    flipped = weights[::-1, ::-1].astype(np.float64)
+    kernel_spectrum = np.fft.rfft2(flipped, s=(height, width))
+    result = np.empty((height - order + 1, width - order + 1, image.shape[2]), dtype=np.float64)
+    for channel in range(image.shape[2]):
+        spectrum = np.fft.rfft2(image[..., channel].astype(np.float64)) * kernel_spectrum
+        result[..., channel] = np.fft.irfft2(spectrum, s=(height, width))[order - 1:, order - 1:]
+    rounded = np.rint(result)
+    return np.where(np.abs(result - rounded) < 1e-6, rounded, result)
+
+
+def isBoxKernel(weights):
+    return bool(np.all(weights == weights.flat[0]))
+
+
+# Convolution of an (already extended) image, as ImageProcessing::convolution:
+# the output is (order - 1) pixels smaller in both dimensions.
+#
+# image     (height, width, 3) uint8 array.
+# weights   (order, order) float32 array.
+# method    "direct" (bit-exact), "separable" (box kernels only), "fft" or
+#           "auto" (separable for box kernels, fft for orders >= FFT_MIN_ORDER).
+#
+def convolution(image, weights, method = "direct"):
+    weights = np.asarray(weights, dtype=np.float32)
+    if method == "auto":
+        if isBoxKernel(weights):
+            method = "separable"
+        elif weights.shape[0] >= FFT_MIN_ORDER:
+            method = "fft"
+        else:
+            method = "direct"
+
+    if method == "direct":
+        channels = _directConvolution(image, weights)
+    elif method == "separable":
+        if not isBoxKernel(weights):
+            raise ValueError("The separable convolution supports box kernels only.")
+        channels = _separableConvolution(image, weights)
+    elif method == "fft":
+        channels = _fftConvolution(image, weights)
+    else:
+        raise ValueError(f"Unknown convolution method: {method}")
+    return toUint8(channels)
+
+
+# Extend the image edge and convolve it, as profile.cpp does.
+def process(image, kernel_name, order, method = "direct"):
+    weights = KERNELS[kernel_name](order)
+    return convolution(extendEdge(image, (order - 1) // 2), weights, method)
+
+
+### Validation ###
+
+# Max and mean absolute error between two uint8 images of the same shape,
+# and the fraction of differing channel values.
+#
+def compareImages(expected, actual):
+    if expected.shape != actual.shape:
+        raise ValueError(f"Shape mismatch: {expected.shape} vs {actual.shape}")
+    error = np.abs(expected.astype(np.int16) - actual.astype(np.int16))
+    return {
+        "MaxError": int(error.max()),
+        "MeanError": float(error.mean()),
+        "DifferentFraction": float(np.count_nonzero(error) / error.size),
+    }
+
+
+# Recompute every image saved by profile.cpp and compare it with the
+# reference. The outputs are JPEG files (lossy, and decoded by a different
+# library) so the errors are small but not zero even for correct outputs.
+#
+# output_dir    directory with the <imageName>_<kernelName><order>.jpg files.
+# input_dir     directory with the <imageName>.jpg files.
+#
+def validateOutputs(output_dir = "../images/output", input_dir = "../images/input",
+                    method = "direct"):
+    reports = []
+    for filename in sorted(os.listdir(output_dir)):
+        match = OUTPUT_PATTERN.match(filename)
+        if match is None or match["kernel"] not in KERNELS:
+            continue
+        input_filename = os.path.join(input_dir, f"{match['image']}.jpg")
+        if not os.path.exists(input_filename):
+            print(f"Missing input {input_filename} of {filename}")
+            continue
+
+        order = int(match["order"])
+        expected = process(loadImage(input_filename), match["kernel"], order, method)
+        actual = loadImage(os.path.join(output_dir, filename))
+        report = {"Output": filename, "KernelName": match["kernel"], "KernelDimension": order,
+                  "ImageDimension": f"{actual.shape[1]}x{actual.shape[0]}"}
+        report.update(compareImages(expected, actual))
+        reports.append(report)
+        print(f"{filename}: max error {report['MaxError']}, mean error {report['MeanError']:.4f}")
+    return pd.DataFrame(reports)
+
+
+# Compare the fast methods with the bit-exact one on an image.
+def compareMethods(image, kernel_name, order, methods = ("separable", "fft")):
+    expected = process(image, kernel_name, order, "direct")
+    reports = []
+    for method in methods:
+        if method == "separable" and kernel_name != "boxBlur":
+            continue
+        report = {"Method": method, "KernelName": kernel_name, "KernelDimension": order}
+        report.update(compareImages(expected, process(image, kernel_name, order, method)))
+        reports.append(report)
+    return pd.DataFrame(reports)
+
+
+### Baseline ###
+
+# Single-thread throughput (Mpix/s) of the reference methods, to be used as
+# a baseline curve next to the OpenMP scaling results.
+#
+# image_filenames   input images (e.g. "../images/input/4K-1.jpg").
+# orders            kernel orders.
+# methods           methods of METHODS to time ("separable" is timed on box blur only).
+# num_reps          repetitions per configuration (the mean time is kept).
+#
+def baselineThroughput(image_filenames, orders = (7, 13, 19, 25), methods = METHODS,
+                       kernel_name = "boxBlur", num_reps = 1):
+    results = []
+    for image_filename in image_filenames:
+        image = loadImage(image_filename)
+        for order in orders:
+            weights = KERNELS[kernel_name](order)
+            extended = extendEdge(image, (order - 1) // 2)
+            for method in methods:
+                if method == "separable" and not isBoxKernel(weights):
+                    continue
+                start = time.perf_counter()
+                for _ in range(num_reps):
+                    convolution(extended, weights, method)
+                elapsed = (time.perf_counter() - start) / num_reps
+                results.append({
+                    "ImageName": os.path.splitext(os.path.basename(image_filename))[0],
+                    "ImageDimension": f"{image.shape[1]}x{image.shape[0]}",
+                    "KernelName": kernel_name,
+                    "KernelDimension": order,
+                    "Method": method,
+                    "TimePerRep_s": elapsed,
+                    "Throughput_Mpix_s": image.shape[0] * image.shape[1] * 1e-6 / elapsed,
+                })
+                print(f"{image_filename} {order}x{order} {method}: "
+                      f"{results[-1]['Throughput_Mpix_s']:.3f} Mpix/s")
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="NumPy reference of the kernel image processing.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    validate = commands.add_parser("validate", help="compare profile.cpp outputs with the reference")
+    validate.add_argument("--output-dir", default="../images/output")
+    validate.add_argument("--input-dir", default="../images/input")
+    validate.add_argument("--method", choices=METHODS + ["auto"], default="direct")
+    validate.add_argument("--report", default=None, help="csv file where to save the errors")
+
+    methods = commands.add_parser("methods", help="compare the fast methods with the direct one")
+    methods.add_argument("image")
+    methods.add_argument("--kernel", choices=list(KERNELS), default="boxBlur")
+    methods.add_argument("--orders", type=int, nargs="+", default=[7, 13, 19, 25])
+
+    baseline = commands.add_parser("baseline", help="measure the reference throughput")
+    baseline.add_argument("images", nargs="+")
+    baseline.add_argument("--orders", type=int, nargs="+", default=[7, 13, 19, 25])
+    baseline.add_argument("--methods", choices=METHODS, nargs="+", default=METHODS)
+    baseline.add_argument("--kernel", choices=list(KERNELS), default="boxBlur")
+    baseline.add_argument("--num-reps", type=int, default=1)
+    baseline.add_argument("-o", "--output", default="reference_baseline.csv")
+    args = parser.parse_args()
+
+    if args.command == "validate":
+        report = validateOutputs(args.output_dir, args.input_dir, args.method)
+        if report.empty:
+            print(f"No output image found in {args.output_dir}")
+        elif args.report is not None:
+            report.to_csv(args.report, index=False)
+    elif args.command == "methods":
+        image = loadImage(args.image)
+        report = pd.concat([compareMethods(image, args.kernel, order) for order in args.orders],
+                           ignore_index=True)
+        print(report.to_string(index=False, float_format="%.6f"))
+    else:
+        results = baselineThroughput(args.images, args.orders, args.methods, args.kernel, args.num_reps)
+        results.to_csv(args.output, index=False)
+        print(f"\nTable saved at {os.path.realpath(args.output)}")
@@ -0,0 +1,213 @@
+import argparse
+import math
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from analysis import karpFlatt, withConfiguration, CONFIG_COLUMNS
+from batch import findScalingCsv
+
+
+KEYS = ["ImageDimension", "KernelDimension"] + CONFIG_COLUMNS + ["NumThreads"]
+
+# metric -> (scaling kinds, +1 if higher is worse / -1 if lower is worse,
+#            whether the threshold is relative to the baseline or absolute)
+METRICS = {
+    "TimePerRep_s": (("strong", "weak"), +1, "relative"),
+    "SpeedUp": (("strong",), -1, "relative"),
+    "KarpFlatt": (("strong",), +1, "absolute"),
+    "WeakEfficiency": (("weak",), -1, "relative"),
+}
+
+
+# Regularized incomplete beta function I_x(a, b), vectorized, by the
+# continued fraction of Numerical Recipes (modified Lentz's method).
+#
+def betainc(a, b, x, iterations = 200, eps = 1e-14):
+    a, b, x = np.broadcast_arrays(np.asarray(a, float), np.asarray(b, float), np.asarray(x, float))
+    # the continued fraction converges fast for x < (a+1)/(a+b+2): use the symmetry otherwise
+    swap = x > (a + 1) / (a + b + 2)
+    a, b, x = np.where(swap, b, a), np.where(swap, a, b), np.where(swap, 1 - x, x)
+
+    lgamma = np.vectorize(math.lgamma, otypes=[float])
+    tiny = 1e-300
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        log_front = (a * np.log(x) + b * np.log1p(-x) - np.log(a)
+                     + lgamma(a + b) - lgamma(a) - lgamma(b))
+        c = np.ones_like(x)
+        d = 1 - (a + b) * x / (a + 1)
+        d = 1 / np.where(np.abs(d) < tiny, tiny, d)
+        result = d.copy()
+        for m in range(1, iterations + 1):
+            for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                              -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+                d = 1 + numerator * d
+                d = 1 / np.where(np.abs(d) < tiny, tiny, d)
+                c = 1 + numerator / c
+                c = np.where(np.abs(c) < tiny, tiny, c)
+                delta = c * d
+                result = result * delta
+            if np.all(np.abs(delta - 1) < eps):
+                break
+        value = np.exp(log_front) * result
+    value = np.where(x <= 0, 0.0, np.where(x >= 1, 1.0, value))
+    return np.where(swap, 1 - value, value)
+
+
+# Paired t-test on the per-image differences, element-wise on arrays of the
+# mean and unbiased variance of the differences and of the number of pairs.
+# Returns t and the two-sided p-value (NaN with a single pair).
+#
+def pairedTest(mean_diff, var_diff, n):
+    se2 = var_diff / n
+    dof = n - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = mean_diff / np.sqrt(se2)
+        p_value = betainc(dof / 2, 0.5, dof / (dof + t ** 2))
+    # the same difference on every image: any difference is significant
+    p_value = np.where(se2 == 0, np.where(mean_diff == 0, 1.0, 0.0), p_value)
+    return t, p_value
+
+
+# Load every scaling csv of a directory tree into one frame per kind
+# ("strong", "weak"), with the Karp–Flatt metric of every single run.
+#
+def loadRuns(data_dir):
+    runs = {}
+    csv_files = findScalingCsv([data_dir])
+    for kind in ["strong", "weak"]:
+        kind_files = [f for f in csv_files if f"{kind}Scaling" in os.path.basename(f)]
+        if not kind_files:
+            continue
+        df = withConfiguration(pd.concat([pd.read_csv(f) for f in kind_files], ignore_index=True))
+        if kind == "strong":
+            df["KarpFlatt"] = karpFlatt(df["SpeedUp"], df["NumThreads"])
+        runs[kind] = df
+    return runs
+
+
+# Per key mean of a metric in the baseline and new runs, and mean, variance
+# and number of the differences between the images of the key measured in
+# both (the runs of an image are averaged first). The images of a key differ
+# in content only, so pairing them removes their spread from the test.
+#
+def _pairedStats(baseline_runs, new_runs, metric):
+    image_keys = KEYS + ["ImageName"]
+    baseline_means = baseline_runs.dropna(subset=[metric]).groupby(image_keys)[metric].mean()
+    new_means = new_runs.dropna(subset=[metric]).groupby(image_keys)[metric].mean()
+    pairs = pd.concat([baseline_means.rename("base"), new_means.rename("new")], axis=1, join="inner")
+    pairs["diff"] = pairs["new"] - pairs["base"]
+    grouped = pairs.groupby(level=KEYS)
+    return pd.DataFrame({
+        "mean_base": grouped["base"].mean(),
+        "mean_new": grouped["new"].mean(),
+        "mean_diff": grouped["diff"].mean(),
+        "var_diff": grouped["diff"].var(),
+        "pairs": grouped["diff"].size(),
+    })
+
+
+# Compare new runs with the baseline ones, keyed by (ImageDimension,
+# KernelDimension, OpenMP configuration, NumThreads), for every metric of METRICS.
+#
+# baseline_dir          directory with the baseline csv files.
+# new_dir               directory with the new csv files.
+# threshold             minimum worsening (fraction of the baseline) of time,
+#                       speedup and weak efficiency to be a regression.
+# karp_flatt_threshold  minimum (absolute) increase of the Karp–Flatt metric.
+# alpha                 significance level of the paired t-test on the differences
+#                       between the baseline and new runs of every image of a key.
+#
+# Returns a frame with one row per (kind, key, metric), including the
+# Significant and Regression flags.
+#
+def compareRuns(baseline_dir, new_dir, threshold = 0.05, karp_flatt_threshold = 0.02,
+                alpha = 0.05):
+    baseline_runs = loadRuns(baseline_dir)
+    new_runs = loadRuns(new_dir)
+    reports = []
+    for kind in sorted(set(baseline_runs) & set(new_runs)):
+        for metric, (kinds, worse_sign, threshold_kind) in METRICS.items():
+            if kind not in kinds:
+                continue
+            joined = _pairedStats(baseline_runs[kind], new_runs[kind], metric)
+            if joined.empty:
+                continue
+
+            _, p_value = pairedTest(joined["mean_diff"].values, joined["var_diff"].values,
+                                    joined["pairs"].values)
+            change = joined["mean_new"] - joined["mean_base"]
+            relative_change = change / joined["mean_base"].abs()
+            worsening = worse_sign * (relative_change if threshold_kind == "relative" else change)
+            limit = threshold if threshold_kind == "relative" else karp_flatt_threshold
+
+            report = joined.reset_index()
+            report.insert(0, "Metric", metric)
+            report.insert(0, "Kind", kind)
+            report["Change"] = change.values
+            report["RelativeChange"] = relative_change.values
+            report["PValue"] = p_value
+            report["Significant"] = p_value < alpha
+            report["Regression"] = report["Significant"] & (worsening.values > limit)
+            reports.append(report)
+
+    if not reports:
+        return pd.DataFrame()
+    return pd.concat(reports, ignore_index=True)
+
+
+# Copy the scaling csv files of new_dir into baseline_dir (keeping the
+# directory structure), so that they become the reference of next comparisons.
+#
+def saveBaseline(new_dir, baseline_dir):
+    for csv_filename in findScalingCsv([new_dir]):
+        destination = os.path.join(baseline_dir, os.path.relpath(csv_filename, os.path.realpath(new_dir)))
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copy2(csv_filename, destination)
+        print(f"Baseline saved at {os.path.realpath(destination)}")
+
+
+def printReport(report):
+    if report.empty:
+        print("No common (ImageDimension, KernelDimension, configuration, NumThreads) between baseline and new runs.")
+        return
+    columns = ["Kind", "Metric"] + KEYS + ["mean_base", "mean_new", "RelativeChange", "PValue"]
+    regressions = report[report["Regression"]]
+    print(f"Compared {report.groupby(['Kind'] + KEYS).ngroups} configurations, "
+          f"{len(regressions)} significant regressions.")
+    if not regressions.empty:
+        print(regressions[columns].to_string(index=False, float_format="%.4f"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Detect performance regressions against a baseline of scaling results.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compare = commands.add_parser("compare", help="compare new runs against the baseline")
+    compare.add_argument("baseline_dir")
+    compare.add_argument("new_dir")
+    compare.add_argument("--threshold", type=float, default=0.05)
+    compare.add_argument("--karp-flatt-threshold", type=float, default=0.02)
+    compare.add_argument("--alpha", type=float, default=0.05,
+                         help="significance level of the paired t-test on the per-image differences "
+                              "(the images of a configuration are the pairs, not repeated runs)")
+    compare.add_argument("--report", default=None, help="csv file where to save the full comparison")
+
+    save = commands.add_parser("save", help="make new runs the baseline")
+    save.add_argument("new_dir")
+    save.add_argument("baseline_dir")
+    args = parser.parse_args()
+
+    if args.command == "save":
+        saveBaseline(args.new_dir, args.baseline_dir)
+        raise SystemExit(0)
+
+    report = compareRuns(args.baseline_dir, args.new_dir, args.threshold,
+                         args.karp_flatt_threshold, args.alpha)
+    printReport(report)
+    if args.report is not None and not report.empty:
+        report.to_csv(args.report, index=False)
+    raise SystemExit(1 if not report.empty and report["Regression"].any() else 0)
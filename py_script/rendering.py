@@ -0,0 +1,214 @@
+import io
+import math
+import os
+
+import numpy as np
+import matplotlib.image as mpimg
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.transforms import offset_copy
+
+
+# Output modes of the figures: (file extension, dpi); vector formats keep the
+# dpi of the figure (it only affects the rasterized artists).
+MODES = {
+    "png": ("png", 150),
+    "preview": ("png", 50),
+    "svg": ("svg", None),
+    "pdf": ("pdf", None),
+}
+# Dashboards of all the figures of a dataset: a multi-page pdf or a single
+# png with the figures tiled in a grid.
+DASHBOARDS = ["pdf", "tiled"]
+# dpi of the figures in the tiled dashboard
+TILE_DPI = 60
+# Maximum number of unflagged value labels (and opposite axis ticks) per
+# series: denser thread grids get a label every few points, the flagged
+# points are always labelled.
+MAX_LABELS = 16
+# Families with more curves are drawn as a single collection with a colorbar
+# instead of one legend entry per curve.
+MAX_LEGEND_CURVES = 8
+
+
+# Draws and saves the figures of the scripts, reusing one figure per size
+# (cleared before every use) instead of creating and destroying a pyplot
+# figure each time.
+#
+# output_dir        directory where the figures and the dashboard are saved.
+# mode              one of MODES ("preview" is a low dpi png).
+# show              whether to open every figure in a blocking window (the
+#                   figures are then pyplot ones and are not reused).
+# dashboard         None, or one of DASHBOARDS: every saved figure is also
+#                   added to the dashboard, written by close().
+# dashboard_name    file name (without extension) of the dashboard.
+# save_figures      whether to save every figure in its own file (it can be
+#                   disabled only with a dashboard).
+#
+class FigureRenderer:
+    def __init__(self, output_dir = ".", mode = "png", show = False, dashboard = None,
+                 dashboard_name = "dashboard", save_figures = True):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode}: expected one of {list(MODES)}")
+        if dashboard is not None and dashboard not in DASHBOARDS:
+            raise ValueError(f"Unknown dashboard {dashboard}: expected one of {DASHBOARDS}")
+        if not save_figures and dashboard is None:
+            raise ValueError("Without a dashboard the figures must be saved.")
+        self.output_dir = output_dir
+        self.mode = mode
+        self.extension, self.dpi = MODES[mode]
+        self.show = show
+        self.dashboard = dashboard
+        self.dashboard_name = dashboard_name
+        self.save_figures = save_figures
+        self.figures = {}
+        self.pages = None
+        self.tiles = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Empty figure of the given size.
+    def figure(self, figsize):
+        if self.show:
+            return plt.figure(figsize=figsize)
+        fig = self.figures.get(figsize)
+        if fig is None:
+            fig = Figure(figsize=figsize)
+            FigureCanvasAgg(fig)
+            self.figures[figsize] = fig
+        else:
+            fig.clear()
+        return fig
+
+    # Save fig as <output_dir>/<name>.<extension> and add it to the dashboard.
+    #
+    # Returns the real path of the file, or None when the figures are not saved.
+    #
+    def save(self, fig, name):
+        filename = None
+        if self.save_figures:
+            filename = os.path.realpath(os.path.join(self.output_dir, f"{name}.{self.extension}"))
+            if self.dpi is None:
+                fig.savefig(filename)
+            else:
+                fig.savefig(filename, dpi=self.dpi)
+            print(f"\nImage saved at {filename}")
+        if self.dashboard == "pdf":
+            if self.pages is None:
+                self.pages = PdfPages(os.path.join(self.output_dir, f"{self.dashboard_name}.pdf"))
+            self.pages.savefig(fig)
+        elif self.dashboard == "tiled":
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format="png", dpi=TILE_DPI)
+            buffer.seek(0)
+            self.tiles.append(mpimg.imread(buffer))
+        if self.show:
+            plt.show()
+            plt.close(fig)
+        return filename
+
+    # Write the dashboard (if any) and release the figures.
+    #
+    # Returns the real path of the dashboard, or None.
+    #
+    def close(self):
+        filename = None
+        if self.pages is not None:
+            filename = os.path.realpath(os.path.join(self.output_dir, f"{self.dashboard_name}.pdf"))
+            self.pages.close()
+            self.pages = None
+        elif self.tiles:
+            filename = os.path.realpath(os.path.join(self.output_dir, f"{self.dashboard_name}.png"))
+            mpimg.imsave(filename, tileImages(self.tiles))
+            self.tiles = []
+        if filename is not None:
+            print(f"\nImage saved at {filename}")
+        self.figures.clear()
+        return filename
+
+
+# Single RGBA image with the images tiled in an almost square grid (row
+# major), each one in a cell as large as the largest image, on white.
+def tileImages(images):
+    columns = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+    height = max(image.shape[0] for image in images)
+    width = max(image.shape[1] for image in images)
+    grid = np.ones((rows * height, columns * width, 4), dtype=np.float32)
+    for i, image in enumerate(images):
+        top, left = (i // columns) * height, (i % columns) * width
+        grid[top:top + image.shape[0], left:left + image.shape[1], :image.shape[2]] = image
+    return grid
+
+
+# Step between the labelled points of a series of n points.
+def labelStride(n, max_labels = MAX_LABELS):
+    return max(1, math.ceil(n / max_labels))
+
+
+# Indices of the labelled points of a series of n points: every flagged
+# point, and at most max_labels of the others (evenly spaced among them).
+def labelIndices(n, flags = None, max_labels = MAX_LABELS):
+    flags = np.zeros(n, dtype=bool) if flags is None else np.asarray(flags, dtype=bool)
+    unflagged = np.flatnonzero(~flags)
+    kept = unflagged[::labelStride(len(unflagged), max_labels)]
+    return np.union1d(np.flatnonzero(flags), kept)
+
+
+# Value labels of a series: every flagged point (in red) and at most
+# max_labels of the others (evenly spaced), as plain text artists sharing a
+# single offset transform.
+#
+# offset    (x, y) offset of the labels from their points, in points.
+# va        vertical alignment of the labels ("top" below the points,
+#           "bottom" above them).
+#
+def valueLabels(ax, x, y, flags = None, offset = (-10, -5), va = "top",
+                max_labels = MAX_LABELS):
+    x, y = np.asarray(x), np.asarray(y)
+    flags = np.zeros(len(y), dtype=bool) if flags is None else np.asarray(flags, dtype=bool)
+    transform = offset_copy(ax.transData, fig=ax.figure, x=offset[0], y=offset[1], units="points")
+    for i in labelIndices(len(y), flags, max_labels):
+        ax.text(x[i], y[i], f"{y[i]:.2f}", transform=transform, ha="center", va=va,
+                fontsize=8, color="red" if flags[i] else "black")
+
+
+# Secondary x axis ticks at positions, labelled with values (rounded to 2
+# decimals): every flagged one (in red) and at most max_labels of the others.
+def valueTicks(ax, positions, values, flags, max_labels = MAX_LABELS):
+    flags = np.asarray(flags, dtype=bool)
+    indices = labelIndices(len(positions), flags, max_labels)
+    ax.set_xticks(np.asarray(positions)[indices])
+    ax.set_xticklabels([round(float(value), 2) for value in np.asarray(values)[indices]])
+    for label, flag in zip(ax.get_xticklabels(), flags[indices]):
+        if flag:
+            label.set_color("red")
+
+
+# Family of curves ys (one row per curve) sharing the abscissae x: up to
+# max_legend_curves curves get their own line and legend entry (labels),
+# the others are drawn as a single line collection colored by values, with
+# a colorbar.
+#
+# values            value of every curve (e.g. its thread count).
+# colorbar_label    label of the colorbar (and of the collection in the legend).
+#
+def curveFamily(ax, x, ys, labels, values, colorbar_label,
+                max_legend_curves = MAX_LEGEND_CURVES):
+    if len(ys) <= max_legend_curves:
+        for y, label in zip(ys, labels):
+            ax.plot(x, y, "-", label=label)
+        return
+    segments = np.stack(np.broadcast_arrays(np.asarray(x)[np.newaxis, :], ys), axis=-1)
+    collection = LineCollection(segments, array=np.asarray(values, dtype=float),
+                                cmap="viridis", linewidths=1, label=colorbar_label)
+    ax.add_collection(collection)
+    ax.autoscale_view()
+    ax.figure.colorbar(collection, ax=ax, label=colorbar_label)
@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from analysis import CONFIG_COLUMNS, megapixels, withConfiguration
+from batch import findScalingCsv
+from hostinfo import physicalCores
+
+
+RGB_CHANNELS = 3
+# bytes of a channel value (uint8) and of a kernel weight (float)
+CHANNEL_BYTES = 1
+WEIGHT_BYTES = 4
+# Basis of the compute roof of the probe: a float32 matrix product run by
+# BLAS on every core, shared evenly among the physical cores (SMT siblings
+# share the floating point units).
+PEAK_BASIS = "sgemm of all the cores, split among the physical cores"
+# Marker of the measured points of every scaling kind
+KIND_MARKERS = {"strong": "o", "weak": "s"}
+
+
+# Floating point operations of ImageProcessing::convolution per output pixel:
+# a multiply and an add for every channel and kernel weight.
+#
+def flopsPerPixel(order):
+    return 2 * RGB_CHANNELS * np.asarray(order, dtype=float) ** 2
+
+
+# Memory traffic (bytes) of one ImageProcessing::convolution call per output
+# pixel, for an output of width x height and a kernel of the given order.
+#
+# Both layouts move the same amount of data: an AoS Pixel is 3 uint8 as the
+# three SoA planes, and both implementations copy the input (getData() or
+# getReds/Greens/Blues()) and the output (Image constructor) once. They only
+# differ in the number of concurrent streams: AoS reads a row of Pixel, SoA
+# three planes (returned in the Streams column of arithmeticIntensity).
+#
+# reuse     "ideal" if every input pixel is loaded from memory once (the
+#           kernel rows stay in cache), "none" if every kernel tap is.
+#
+def bytesPerPixel(width, height, order, reuse = "ideal"):
+    width = np.asarray(width, dtype=float)
+    height = np.asarray(height, dtype=float)
+    order = np.asarray(order, dtype=float)
+    pixel_bytes = RGB_CHANNELS * CHANNEL_BYTES
+    extended_pixels = (width + order - 1) * (height + order - 1)
+    output_pixels = width * height
+
+    # input copy (read + write) and output copy (read + write)
+    copies = 2 * extended_pixels * pixel_bytes + 2 * output_pixels * pixel_bytes
+    if reuse == "ideal":
+        loads = extended_pixels * pixel_bytes
+    elif reuse == "none":
+        loads = output_pixels * order ** 2 * pixel_bytes
+    else:
+        raise ValueError(f"Unknown reuse model: {reuse}")
+    stores = output_pixels * pixel_bytes
+    weights = order ** 2 * WEIGHT_BYTES
+    return (copies + loads + stores + weights) / output_pixels
+
+
+# Arithmetic intensity (FLOP/byte) of the convolution for every row of a
+# frame with the ImageDimension and KernelDimension columns.
+#
+# layout    "AoS" or "SoA".
+#
+def arithmeticIntensity(df, layout = "AoS"):
+    sizes = df["ImageDimension"].str.split("x", expand=True).astype(float)
+    order = df["KernelDimension"].astype(float)
+    flops = flopsPerPixel(order)
+    result = pd.DataFrame({
+        "FlopsPerPixel": flops,
+        "IdealAI": flops / bytesPerPixel(sizes[0], sizes[1], order, "ideal"),
+        "NoReuseAI": flops / bytesPerPixel(sizes[0], sizes[1], order, "none"),
+        "Streams": 1 if layout == "AoS" else RGB_CHANNELS,
+    }, index=df.index)
+    return result
+
+
+### Machine probe ###
+
+def _bestOf(measure, repeats):
+    return min(measure() for _ in range(repeats))
+
+
+# Aggregate memory bandwidth (GB/s) of a STREAM-like triad a = b + s*c run
+# by num_threads threads on private arrays (NumPy releases the GIL).
+#
+# array_bytes   total size of each array, split among the threads: keep it
+#               well above the last level cache.
+#
+def measureBandwidth(num_threads = 1, array_bytes = 128 * 2**20, repeats = 5):
+    n = array_bytes // num_threads // 4
+    arrays = [(np.zeros(n, np.float32), np.ones(n, np.float32), np.ones(n, np.float32))
+              for _ in range(num_threads)]
+
+    def triad(a, b, c):
+        np.multiply(c, np.float32(3), out=a)
+        np.add(a, b, out=a)
+
+    with ThreadPoolExecutor(num_threads) as executor:
+        def run():
+            start = time.perf_counter()
+            list(executor.map(lambda abc: triad(*abc), arrays))
+            return time.perf_counter() - start
+        elapsed = _bestOf(run, repeats)
+    # multiply: read c, write a; add: read a, b, write a
+    return num_threads * 5 * n * 4 / elapsed * 1e-9
+
+
+# Peak floating point rate (GFLOP/s) of a float32 matrix product (BLAS, all cores).
+#
+def measurePeakFlops(size = 2048, repeats = 3):
+    a = np.ones((size, size), np.float32)
+    b = np.ones((size, size), np.float32)
+
+    def run():
+        start = time.perf_counter()
+        a @ b
+        return time.perf_counter() - start
+    return 2 * size ** 3 / _bestOf(run, repeats) * 1e-9
+
+
+# Measure bandwidth and FLOP rate for the given thread counts; the result
+# is stored in probe_filename and reused by the next calls.
+# BLAS uses every core, so the FLOP rate of p threads is the peak scaled by
+# the fraction of the physical cores they can use (see PEAK_BASIS).
+#
+def probeMachine(thread_counts = (1,), probe_filename = None):
+    if probe_filename is not None and os.path.exists(probe_filename):
+        with open(probe_filename) as probe_file:
+            probe = json.load(probe_file)
+        if probe.get("PeakBasis") == PEAK_BASIS and all(str(p) in probe["Bandwidth_GB_s"]
+                                                        for p in thread_counts):
+            return probe
+
+    cores = physicalCores()
+    peak_flops = measurePeakFlops()
+    probe = {"Bandwidth_GB_s": {}, "Flops_GFLOP_s": {}, "PeakFlops_GFLOP_s": peak_flops,
+             "PhysicalCores": cores, "PeakBasis": PEAK_BASIS}
+    for p in thread_counts:
+        probe["Bandwidth_GB_s"][str(p)] = measureBandwidth(p)
+        probe["Flops_GFLOP_s"][str(p)] = peak_flops * min(p, cores) / cores
+        print(f"Probe with {p} threads: {probe['Bandwidth_GB_s'][str(p)]:.1f} GB/s, "
+              f"{probe['Flops_GFLOP_s'][str(p)]:.1f} GFLOP/s")
+    if probe_filename is not None:
+        with open(probe_filename, "w") as probe_file:
+            json.dump(probe, probe_file, indent=2)
+    return probe
+
+
+### Roofline ###
+
+# Mean time and throughput per (Kind, ImageDimension, KernelDimension,
+# NumThreads, OpenMP configuration) of every strong and weak scaling csv of
+# a directory tree: the runs of different kinds or schedules stay apart.
+#
+def loadMeasurements(data_dir):
+    csv_files = findScalingCsv([data_dir])
+    if not csv_files:
+        return pd.DataFrame()
+    frames = []
+    for csv_filename in csv_files:
+        frame = withConfiguration(pd.read_csv(csv_filename))
+        frame["Kind"] = "strong" if "SpeedUp" in frame.columns else "weak"
+        frames.append(frame)
+    df = pd.concat(frames, ignore_index=True)
+    results = (
+        df.groupby(["Kind", "ImageDimension", "KernelDimension", "NumThreads"] + CONFIG_COLUMNS)
+          ["TimePerRep_s"]
+          .mean()
+          .reset_index()
+    )
+    results["Throughput_Mpix_s"] = megapixels(results["ImageDimension"]) / results["TimePerRep_s"]
+    return results
+
+
+# Place every measured (threads, Mpix/s) point on the roofline of its thread
+# count and classify it as memory or compute bound, both with ideal cache
+# reuse (Bound) and without it (NoReuseBound).
+# The probe must come from the machine where the csv files were measured.
+#
+# results   frame returned by loadMeasurements.
+# probe     dict returned by probeMachine (for every thread count of results).
+#
+def rooflinePoints(results, probe, layout = "AoS"):
+    points = results[["Kind", "ImageDimension", "KernelDimension", "NumThreads"] + CONFIG_COLUMNS
+                     + ["Throughput_Mpix_s"]].copy()
+    points = points.join(arithmeticIntensity(points, layout))
+    points["GFLOP_s"] = points["Throughput_Mpix_s"] * 1e6 * points["FlopsPerPixel"] * 1e-9
+    points["Bandwidth_GB_s"] = points["NumThreads"].map(lambda p: probe["Bandwidth_GB_s"][str(p)])
+    points["Flops_GFLOP_s"] = points["NumThreads"].map(lambda p: probe["Flops_GFLOP_s"][str(p)])
+    points["RidgeAI"] = points["Flops_GFLOP_s"] / points["Bandwidth_GB_s"]
+    points["Attainable_GFLOP_s"] = np.minimum(points["Flops_GFLOP_s"],
+                                              points["IdealAI"] * points["Bandwidth_GB_s"])
+    points["Bound"] = np.where(points["IdealAI"] < points["RidgeAI"], "memory", "compute")
+    points["NoReuseBound"] = np.where(points["NoReuseAI"] < points["RidgeAI"], "memory", "compute")
+    points["RooflineFraction"] = points["GFLOP_s"] / points["Attainable_GFLOP_s"]
+    return points
+
+
+# Draw a roofline chart per kernel size with the measured points.
+#
+# data_dir      directory containing strong and/or weak scaling csv files.
+# layout        "AoS" or "SoA" (the implementation that produced the data).
+# probe_filename json file where the machine probe is cached.
+# output_dir    directory where the images and the table are saved.
+# show          whether to open every figure in a blocking window.
+#
+def plotRoofline(data_dir, layout = "AoS", probe_filename = "machine_probe.json",
+                 output_dir = ".", show = True):
+    results = loadMeasurements(data_dir)
+    if results.empty:
+        print(f"No scaling csv found in {data_dir}")
+        return None
+
+    thread_counts = sorted(results["NumThreads"].unique())
+    probe = probeMachine(thread_counts, probe_filename)
+    points = rooflinePoints(results, probe, layout)
+    print(f"\nCompute roof: {probe['PeakFlops_GFLOP_s']:.1f} GFLOP/s ({probe['PeakBasis']}, "
+          f"{probe['PhysicalCores']} physical cores)")
+
+    ai_range = np.logspace(-1, 3, 200)
+    for kernel_dim, kernel_points in points.groupby("KernelDimension"):
+        plt.figure(figsize=(8, 6))
+        colors = plt.cm.viridis(np.linspace(0, 1, len(thread_counts)))
+        for color, p in zip(colors, thread_counts):
+            bandwidth = probe["Bandwidth_GB_s"][str(p)]
+            flops = probe["Flops_GFLOP_s"][str(p)]
+            plt.plot(ai_range, np.minimum(flops, ai_range * bandwidth), "-", color=color,
+                     alpha=0.6, label=f"roofline p={p}")
+            for kind, marker in KIND_MARKERS.items():
+                p_points = kernel_points[(kernel_points["NumThreads"] == p) & (kernel_points["Kind"] == kind)]
+                plt.scatter(p_points["IdealAI"], p_points["GFLOP_s"], color=color, marker=marker,
+                            edgecolors="black", s=60, zorder=3)
+        for kind, marker in KIND_MARKERS.items():
+            if (kernel_points["Kind"] == kind).any():
+                plt.scatter([], [], color="white", marker=marker, edgecolors="black",
+                            label=f"{kind} scaling")
+        ai = kernel_points["IdealAI"].iloc[0]
+        no_reuse_ai = kernel_points["NoReuseAI"].iloc[0]
+        plt.axvline(ai, color="black", linestyle="--", alpha=0.6, label=f"AI with reuse ≈ {ai:.1f}")
+        plt.axvline(no_reuse_ai, color="red", linestyle=":", alpha=0.6,
+                    label=f"AI without reuse ≈ {no_reuse_ai:.1f}")
+        plt.xscale("log")
+        plt.yscale("log")
+        plt.xlabel("Arithmetic intensity (FLOP/byte)")
+        plt.ylabel("Performance (GFLOP/s)")
+        plt.title(f"Roofline ({layout}): {kernel_dim}x{kernel_dim} kernels\n"
+                  f"compute roof: {probe['PeakBasis']}", fontsize=10)
+        plt.legend(loc="best", fontsize=8)
+        plt.grid(True, which="both", linestyle="--", alpha=0.4)
+        plt.tight_layout()
+
+        filename = os.path.join(output_dir, f"roofline_{layout}_{kernel_dim}.png")
+        plt.savefig(filename, dpi=150)
+        print(f"\nImage saved at {os.path.realpath(filename)}")
+        if show:
+            plt.show()
+        plt.close()
+
+    columns = ["Kind", "ImageDimension", "KernelDimension", "NumThreads", "Schedule", "Throughput_Mpix_s",
+               "IdealAI", "GFLOP_s", "Attainable_GFLOP_s", "RooflineFraction", "Bound", "NoReuseBound"]
+    print(points[columns].to_string(index=False, float_format="%.3f"))
+    filename = os.path.join(output_dir, f"roofline_{layout}.csv")
+    points.to_csv(filename, index=False)
+    print(f"\nTable saved at {os.path.realpath(filename)}")
+    return points
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Roofline of the convolution with the measured scaling points.")
+    parser.add_argument("data_dir", help="directory containing strong and/or weak scaling csv files")
+    parser.add_argument("layout", nargs="?", choices=["AoS", "SoA"], default="AoS")
+    parser.add_argument("probe_filename", nargs="?", default="machine_probe.json",
+                        help="json file where the machine probe is cached")
+    parser.add_argument("output_dir", nargs="?", default=".")
+    args = parser.parse_args()
+
+    plotRoofline(args.data_dir, args.layout, args.probe_filename, args.output_dir)
@@ -0,0 +1,190 @@
+import argparse
+import os
+import re
+import time
+
+import pandas as pd
+
+# pyarrow is optional: only the results store needs it
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from amdahl import plotStrongScaling
+from analysis import withConfiguration
+from batch import findScalingCsv
+from gustafson import plotWeakScaling
+from hostinfo import dataPhysicalCores
+
+
+# Hive partitions of the store, e.g.
+# <root>/Kind=strong/Layout=AoS/ImageQuality=4/KernelOrder=7/RunId=run1/part-<digest>-0.parquet
+# Kind comes first: strong and weak rows have different columns, so every
+# query opens the dataset of a single kind.
+PARTITIONING = ["Kind", "Layout", "ImageQuality", "KernelOrder", "RunId"]
+KINDS = ["strong", "weak"]
+LAYOUTS = ["AoS", "SoA"]
+
+
+def _requirePyarrow():
+    if pa is None:
+        raise ImportError("The results store needs pyarrow: pip install pyarrow")
+
+
+# "4K-1" -> 4
+def imageQuality(image_name):
+    return int(str(image_name).split("K")[0])
+
+
+# Append-only store of scaling results as a partitioned Parquet dataset.
+# The files of an append are named after a digest of its rows: appending the
+# same rows again (e.g. re-importing a csv) overwrites them instead of
+# duplicating them, and the other files are never rewritten.
+#
+# root      directory of the dataset.
+#
+class ResultStore:
+    def __init__(self, root):
+        _requirePyarrow()
+        self.root = root
+        # memory-mapped reads of the local Parquet files
+        self.filesystem = pafs.LocalFileSystem(use_mmap=True)
+
+    # Append the rows of a single run (as written by a scaling executable).
+    #
+    # df        raw strong or weak scaling rows.
+    # layout    "AoS" or "SoA".
+    # kind      "strong" or "weak".
+    # run_id    identifier of the run (default: a timestamp).
+    #
+    def append(self, df, layout, kind, run_id = None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown scaling kind: {kind}")
+        run_id = run_id or time.strftime("run%Y%m%d_%H%M%S")
+        rows = withConfiguration(df)
+        rows["Layout"] = layout
+        rows["ImageQuality"] = rows["ImageName"].map(imageQuality)
+        rows["KernelOrder"] = rows["KernelDimension"]
+        rows["RunId"] = run_id
+        digest = f"{pd.util.hash_pandas_object(rows, index=False).sum():016x}"
+        table = pa.Table.from_pandas(rows, preserve_index=False)
+        pq.write_to_dataset(table, os.path.join(self.root, f"Kind={kind}"),
+                            partition_cols=PARTITIONING[1:], filesystem=self.filesystem,
+                            basename_template=f"part-{digest}-{{i}}.parquet",
+                            existing_data_behavior="overwrite_or_ignore")
+        return run_id
+
+    # Import a scaling csv file: layout, kind and run id are deduced from the
+    # path when not given (e.g. .../AoS/data/strong_scaling/#1/...csv).
+    #
+    def importCsv(self, csv_filename, layout = None, kind = None, run_id = None):
+        parts = os.path.realpath(csv_filename).split(os.sep)
+        if layout is None:
+            layout = next((part for part in reversed(parts) if part in LAYOUTS), "AoS")
+        if kind is None:
+            kind = "strong" if "strongScaling" in parts[-1] else "weak"
+        if run_id is None:
+            run_id = "run" + re.sub(r"[^A-Za-z0-9_-]", "", parts[-2])
+        return self.append(pd.read_csv(csv_filename), layout, kind, run_id)
+
+    def importDataDirs(self, data_dirs, layout = None):
+        csv_files = findScalingCsv(data_dirs)
+        for csv_filename in csv_files:
+            run_id = self.importCsv(csv_filename, layout)
+            print(f"Imported {csv_filename} as {run_id}")
+        return len(csv_files)
+
+    def _dataset(self, kind):
+        return ds.dataset(os.path.join(self.root, f"Kind={kind}"), format="parquet",
+                          partitioning="hive", filesystem=self.filesystem)
+
+    # Rows of a scaling kind matching all the given partition values (a value
+    # or a list of values per key); filters are pushed down to the files so
+    # only the matching partitions and columns are read.
+    #
+    # kind      "strong" or "weak".
+    # columns   columns to read (None means all).
+    # filters   e.g. Layout="AoS", ImageQuality=[4, 5], KernelOrder=7.
+    #
+    def query(self, kind = "strong", columns = None, **filters):
+        if not os.path.isdir(os.path.join(self.root, f"Kind={kind}")):
+            return pd.DataFrame()
+        expression = None
+        for name, value in filters.items():
+            if value is None:
+                continue
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            condition = ds.field(name).isin(list(values))
+            expression = condition if expression is None else expression & condition
+        table = self._dataset(kind).to_table(columns=columns, filter=expression)
+        return table.to_pandas()
+
+    # Distinct partition values (Layout, ImageQuality, KernelOrder, RunId) of a kind.
+    def partitions(self, kind = "strong"):
+        return self.query(kind, columns=PARTITIONING[1:]).drop_duplicates().reset_index(drop=True)
+
+
+# Draw the amdahl/gustafson figures of every (layout, quality, order) of
+# the store, reading only the needed partitions.
+#
+# run_ids       runs to draw (None means all: their rows are averaged together).
+# phys_cores    number of physical cores of the machine of the results
+#               (required: the store does not record it).
+# filters       further partition values, as in ResultStore.query.
+#
+def plotStore(root, kind = "strong", output_dir = ".", run_ids = None, phys_cores = None, **filters):
+    phys_cores = dataPhysicalCores(None, phys_cores)
+    os.makedirs(output_dir, exist_ok=True)
+    store = ResultStore(root)
+    filters["RunId"] = run_ids
+    partitions = store.query(kind, columns=PARTITIONING[1:], **filters)
+    if partitions.empty:
+        print(f"No {kind} scaling results in {root} matching {filters}")
+        return
+    for (layout, quality, order), _ in partitions.groupby(["Layout", "ImageQuality", "KernelOrder"]):
+        df = store.query(kind, **{**filters, "Layout": layout, "ImageQuality": quality,
+                                  "KernelOrder": order})
+        # the name only identifies the cache file of the group
+        name = f"{layout}_{kind}Scaling_{quality}K_{order}.csv"
+        if kind == "strong":
+            plotStrongScaling(name, phys_cores, output_dir=output_dir, show=False, df=df)
+        else:
+            plotWeakScaling(name, phys_cores, output_dir=output_dir, show=False, df=df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Partitioned Parquet store of the scaling results.")
+    parser.add_argument("root", help="directory of the store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="import scaling csv files")
+    import_parser.add_argument("data_dirs", nargs="+")
+    import_parser.add_argument("--layout", choices=LAYOUTS, default=None,
+                               help="layout of the data (default: deduced from the path)")
+
+    list_parser = commands.add_parser("list", help="list the stored partitions")
+
+    plot_parser = commands.add_parser("plot", help="draw the figures of the stored results")
+    plot_parser.add_argument("--kind", choices=KINDS, default="strong")
+    plot_parser.add_argument("--layout", choices=LAYOUTS, default=None)
+    plot_parser.add_argument("--run-ids", nargs="+", default=None)
+    plot_parser.add_argument("--phys-cores", type=int, required=True,
+                             help="number of physical cores of the machine of the results")
+    plot_parser.add_argument("-o", "--output-dir", default=".")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        count = ResultStore(args.root).importDataDirs(args.data_dirs, args.layout)
+        print(f"\nImported {count} csv files into {os.path.realpath(args.root)}")
+    elif args.command == "list":
+        store = ResultStore(args.root)
+        for kind in KINDS:
+            print(f"\n{kind} scaling:")
+            print(store.partitions(kind).to_string(index=False))
+    else:
+        plotStore(args.root, args.kind, args.output_dir, args.run_ids, args.phys_cores,
+                  Layout=args.layout)
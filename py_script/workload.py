@@ -0,0 +1,144 @@
+import argparse
+import os
+import struct
+
+import numpy as np
+
+from reference import loadImage
+
+
+# Raw workload file (little endian), read by workload::loadExpandedRawImage:
+#   magic "KIPR" | version uint16 | layout uint8 | channels uint8 |
+#   width uint32 | height uint32 | 16 reserved bytes | data
+# data is height x width x channels (LAYOUT_AOS, interleaved as Pixel) or
+# channels x height x width (LAYOUT_SOA, one plane per channel).
+MAGIC = b"KIPR"
+VERSION = 1
+HEADER = struct.Struct("<4sHBBII16x")
+LAYOUT_AOS = 0
+LAYOUT_SOA = 1
+LAYOUTS = {"AoS": LAYOUT_AOS, "SoA": LAYOUT_SOA}
+RGB_CHANNELS = 3
+EXTENSION = ".kip"
+
+PATTERNS = ["noise", "gradient", "checker"]
+# rows generated at once: bounds the memory used for any image size
+BLOCK_ROWS = 256
+
+
+# Header of a workload file as a dict (layout, channels, width, height).
+def readHeader(filename):
+    with open(filename, "rb") as workload_file:
+        raw = workload_file.read(HEADER.size)
+    if len(raw) < HEADER.size:
+        raise ValueError(f"{filename} is not a workload file (too short)")
+    magic, version, layout, channels, width, height = HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError(f"{filename} is not a workload file (bad magic)")
+    if version != VERSION:
+        raise ValueError(f"Unsupported workload version {version} of {filename}")
+    return {"layout": layout, "channels": channels, "width": width, "height": height}
+
+
+def _shape(layout, width, height, channels = RGB_CHANNELS):
+    return (height, width, channels) if layout == LAYOUT_AOS else (channels, height, width)
+
+
+# Memory-map a workload file without reading it: (height, width, 3) for
+# AoS files, (3, height, width) for SoA ones.
+#
+def openWorkload(filename, mode = "r"):
+    header = readHeader(filename)
+    shape = _shape(header["layout"], header["width"], header["height"], header["channels"])
+    return np.memmap(filename, dtype=np.uint8, mode=mode, offset=HEADER.size, shape=shape)
+
+
+# Rows [start, stop) of a procedural (height x width x 3) image.
+def _patternRows(pattern, start, stop, width, height, rng):
+    y = np.arange(start, stop)[:, np.newaxis]
+    x = np.arange(width)[np.newaxis, :]
+    if pattern == "noise":
+        return rng.integers(0, 256, (stop - start, width, RGB_CHANNELS), dtype=np.uint8)
+    if pattern == "gradient":
+        red = (x * 255 // max(width - 1, 1)).repeat(stop - start, axis=0)
+        green = (y * 255 // max(height - 1, 1)).repeat(width, axis=1)
+        blue = (red + green) // 2
+        return np.stack([red, green, blue], axis=-1).astype(np.uint8)
+    if pattern == "checker":
+        cells = ((y // 64 + x // 64) % 2 * 255).astype(np.uint8)
+        return np.repeat(cells[..., np.newaxis], RGB_CHANNELS, axis=-1)
+    raise ValueError(f"Unknown pattern: {pattern}")
+
+
+# Write a width x height workload, tiling a source image or generating a
+# pattern, block of rows by block of rows through a memory map.
+#
+# filename  output file (EXTENSION is the convention).
+# layout    "AoS" (interleaved) or "SoA" (planar).
+# source    image to tile (e.g. "../images/input/4K-1.jpg"), None for a pattern.
+# pattern   one of PATTERNS, used without source.
+# seed      seed of the "noise" pattern.
+#
+def writeWorkload(filename, width, height, layout = "AoS", source = None,
+                  pattern = "noise", seed = 0):
+    layout_id = LAYOUTS[layout]
+    with open(filename, "wb") as workload_file:
+        workload_file.write(HEADER.pack(MAGIC, VERSION, layout_id, RGB_CHANNELS, width, height))
+        workload_file.truncate(HEADER.size + width * height * RGB_CHANNELS)
+    data = openWorkload(filename, mode="r+")
+
+    tile = None
+    if source is not None:
+        tile = loadImage(source)
+        columns = np.arange(width) % tile.shape[1]
+    rng = np.random.default_rng(seed)
+    for start in range(0, height, BLOCK_ROWS):
+        stop = min(start + BLOCK_ROWS, height)
+        if tile is not None:
+            rows = tile[np.arange(start, stop) % tile.shape[0]][:, columns]
+        else:
+            rows = _patternRows(pattern, start, stop, width, height, rng)
+        if layout_id == LAYOUT_AOS:
+            data[start:stop] = rows
+        else:
+            data[:, start:stop] = np.moveaxis(rows, -1, 0)
+    data.flush()
+    del data
+    print(f"Workload {width}x{height} ({layout}) saved at {os.path.realpath(filename)}")
+    return filename
+
+
+# Write the base workloads (W0) of a weak scaling experiment, named as the
+# images the executables look for (<quality>K-<n>.kip): weak_scaling then
+# stacks them p times without decoding any JPEG.
+#
+# output_dir    directory of the workloads (argv[6] of weak_scaling).
+# quality       image quality of the names, e.g. 5 for 5K-1, 5K-2, 5K-3.
+# sources       images to tile (one per workload), None for patterns.
+#
+def writeImageSet(output_dir, quality, width, height, layout = "AoS", num_images = 3,
+                  sources = None, pattern = "noise"):
+    os.makedirs(output_dir, exist_ok=True)
+    filenames = []
+    for image_num in range(1, num_images + 1):
+        source = sources[(image_num - 1) % len(sources)] if sources else None
+        filename = os.path.join(output_dir, f"{quality}K-{image_num}{EXTENSION}")
+        filenames.append(writeWorkload(filename, width, height, layout, source, pattern, seed=image_num))
+    return filenames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate raw RGB workloads for the scaling executables.")
+    parser.add_argument("output_dir")
+    parser.add_argument("quality", type=int, help="quality of the image names (e.g. 5 for 5K-1)")
+    parser.add_argument("width", type=int)
+    parser.add_argument("height", type=int)
+    parser.add_argument("--layout", choices=list(LAYOUTS), default="AoS")
+    parser.add_argument("--num-images", type=int, default=3)
+    parser.add_argument("--sources", nargs="+", default=None, help="images to tile")
+    parser.add_argument("--pattern", choices=PATTERNS, default="noise")
+    args = parser.parse_args()
+
+    writeImageSet(args.output_dir, args.quality, args.width, args.height, args.layout,
+                  args.num_images, args.sources, args.pattern)